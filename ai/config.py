@@ -15,6 +15,10 @@ DEFAULT_CURUPIRA_RISK_THRESHOLD = 0.4
 DEFAULT_SUPERVISOR_ENABLED = True
 DEFAULT_CURUPIRA_ENABLED = True
 DEFAULT_AUTONOMY_REACTIVE_ENABLED = False
+DEFAULT_INTENT_QUEUE_BACKEND = "json"
+
+_ALLOWED_INTENT_QUEUE_BACKENDS = {"json", "sqlite"}
+_KEYLESS_AI_PROVIDERS = {"none", "disabled", "off", "local"}
 
 
 @dataclass(frozen=True)
@@ -29,6 +33,7 @@ class AppConfig:
     supervisor_enabled: bool
     curupira_enabled: bool
     autonomy_reactive_enabled: bool
+    intent_queue_backend: str = DEFAULT_INTENT_QUEUE_BACKEND
 
 
 def _read_float(name: str, default: float) -> float:
@@ -81,6 +86,10 @@ def load_config() -> AppConfig:
             "AUTONOMY_REACTIVE_ENABLED",
             DEFAULT_AUTONOMY_REACTIVE_ENABLED
         ),
+
+        intent_queue_backend=(
+            os.getenv("INTENT_QUEUE_BACKEND") or DEFAULT_INTENT_QUEUE_BACKEND
+        ).strip().lower(),
     )
 
 
@@ -109,11 +118,21 @@ def validate_config(config: AppConfig) -> tuple[List[str], List[str]]:
             "CURUPIRA_RISK_THRESHOLD inválido: esperado valor entre 0.0 e 1.0"
         )
 
-    if config.ai_provider in {"none", "", "disabled", "off"}:
+    if config.intent_queue_backend not in _ALLOWED_INTENT_QUEUE_BACKENDS:
+        errors.append(
+            f"INTENT_QUEUE_BACKEND inválido: {config.intent_queue_backend} (esperado json ou sqlite)"
+        )
+
+    # AI_PROVIDER pode ser lista ("openai,local"); "local" nao usa chave
+    providers = [name.strip() for name in config.ai_provider.split(",") if name.strip()]
+    remote = [name for name in providers if name not in _KEYLESS_AI_PROVIDERS]
+
+    if all(name in {"none", "disabled", "off"} for name in providers):
         warnings.append("IA: DESATIVADA (AI_PROVIDER não configurado)")
-    elif not config.ai_api_key:
+    elif remote and not config.ai_api_key:
+        status = "PARCIAL" if len(remote) < len(providers) else "DESATIVADA"
         warnings.append(
-            f"IA: DESATIVADA (AI_API_KEY ausente para provider '{config.ai_provider}')"
+            f"IA: {status} (AI_API_KEY ausente para provider '{','.join(remote)}')"
         )
 
     if not config.telegram_token:
@@ -131,7 +150,8 @@ def config_summary(config: AppConfig) -> str:
         f"AI_API_KEY={mask_secret(config.ai_api_key)}, "
         f"TELEGRAM_TOKEN={mask_secret(config.telegram_token)}, "
         f"CURUPIRA_RISK_THRESHOLD={config.curupira_risk_threshold}, "
-        f"LOG_DIR={config.log_dir}, DATA_DIR={config.data_dir}"
+        f"LOG_DIR={config.log_dir}, DATA_DIR={config.data_dir}, "
+        f"INTENT_QUEUE_BACKEND={config.intent_queue_backend}"
     )
 
 
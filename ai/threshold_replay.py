@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""Replay "what-if" de thresholds sobre o historico de decisoes.
+
+Le os risk_score historicos (logs/decisions.log e ai/results/*_result.json)
+e reavalia supervisor e Curupira para uma varredura de thresholds, sem
+passar pelo pipeline ao vivo. Cada grupo de scores e ordenado uma unica vez;
+a contagem para todos os thresholds sai de buscas binarias (NumPy
+searchsorted quando disponivel, bisect caso contrario).
+"""
+from __future__ import annotations
+
+import argparse
+import bisect
+import json
+import math
+import re
+from pathlib import Path
+
+from ai.config import load_config
+from core.risk_batch import extract_risk_scores
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy e opcional
+    np = None
+
+
+DECISIONS_LOG = Path("logs/decisions.log")
+RESULTS_DIR = Path("ai/results")
+
+# Mesmo ajuste de CurupiraEvaluator
+CURUPIRA_FACTOR = 0.8
+
+# Caminho rapido para registros planos gravados por log_decision (json.dumps
+# com separadores padrao); o resto cai no json.loads
+_COMPONENT_RE = re.compile(rb'"component": "(supervisor|curupira)"')
+_RISK_NUMBER_RE = re.compile(rb'"risk_score": (-?[0-9][0-9.eE+-]*|null)[,}]')
+_ALLOWED_RE = re.compile(rb'"allowed": (true|false)[,}]')
+
+
+class _ScoreGroup:
+    """Scores validos (risk/10) separados pelo resultado historico."""
+
+    def __init__(self):
+        self.values = {True: [], False: [], None: []}
+        self.always_blocked = {True: 0, False: 0, None: 0}   # ausente/invalido
+        self.always_allowed = {True: 0, False: 0, None: 0}   # NaN nunca e > threshold
+
+    def add(self, records: list[dict], history: list[bool | None]) -> None:
+        values, missing, invalid = extract_risk_scores(records)
+        for value, is_missing, is_invalid, allowed in zip(values, missing, invalid, history):
+            self.add_value(None if is_missing or is_invalid else value, allowed)
+
+    def add_value(self, value: float | None, allowed: bool | None) -> None:
+        if value is None:
+            self.always_blocked[allowed] += 1
+        elif math.isnan(value):
+            self.always_allowed[allowed] += 1
+        else:
+            self.values[allowed].append(value)
+
+    def total(self) -> int:
+        return (
+            sum(len(v) for v in self.values.values())
+            + sum(self.always_blocked.values())
+            + sum(self.always_allowed.values())
+        )
+
+    def allowed_counts(self, limits: list[float]) -> dict:
+        """Para cada limite, quantos scores permitidos por resultado historico."""
+        return {
+            key: [n + self.always_allowed[key] for n in _count_at_most(values, limits)]
+            for key, values in self.values.items()
+        }
+
+
+def _count_at_most(values: list[float], limits: list[float]) -> list[int]:
+    # evaluate() bloqueia quando value > limit: permitidos sao value <= limit
+    if np is not None:
+        ordered = np.sort(np.asarray(values, dtype=np.float64))
+        return np.searchsorted(ordered, np.asarray(limits, dtype=np.float64), side="right").tolist()
+
+    ordered = sorted(values)
+    return [bisect.bisect_right(ordered, limit) for limit in limits]
+
+
+def load_history(
+    decisions_log: Path = DECISIONS_LOG,
+    results_dir: Path = RESULTS_DIR,
+    batch_size: int = 65536,
+) -> dict[str, _ScoreGroup]:
+    """
+    Agrupa os scores por origem: registros "supervisor"/"curupira" do log
+    (com o resultado historico) e relatorios de execuao (sem historico).
+    """
+    groups = {"supervisor": _ScoreGroup(), "curupira": _ScoreGroup(), "results": _ScoreGroup()}
+    pending = {"supervisor": ([], []), "curupira": ([], [])}
+
+    def _flush(component: str) -> None:
+        records, history = pending[component]
+        groups[component].add(records, history)
+        records.clear()
+        history.clear()
+
+    if decisions_log.exists():
+        with open(decisions_log, "rb") as f:
+            for raw in f:
+                # Filtro barato antes do json.loads
+                if b'"risk_score"' not in raw:
+                    continue
+
+                fast = _parse_flat_record(raw)
+                if fast is not None:
+                    component, value, allowed = fast
+                    if component:
+                        groups[component].add_value(value, allowed)
+                    continue
+
+                try:
+                    record = json.loads(raw)
+                except ValueError:
+                    continue
+
+                component = record.get("component")
+                if component not in pending:
+                    continue
+
+                records, history = pending[component]
+                records.append(record)
+                allowed = record.get("allowed")
+                history.append(allowed if isinstance(allowed, bool) else None)
+                if len(records) >= batch_size:
+                    _flush(component)
+
+    for component in pending:
+        _flush(component)
+
+    if results_dir.exists():
+        reports = []
+        for path in sorted(results_dir.glob("*_result.json")):
+            try:
+                reports.append(json.loads(path.read_text(encoding="utf-8")))
+            except ValueError:
+                continue
+        groups["results"].add(reports, [None] * len(reports))
+
+    return groups
+
+
+def _parse_flat_record(raw: bytes) -> tuple[str, float | None, bool | None] | None:
+    """
+    (componente, risk/10, allowed) sem json.loads; componente "" para
+    registros que nao interessam e None se o registro nao e simples.
+    """
+    if raw.count(b"{") != 1:
+        return None
+
+    component = _COMPONENT_RE.search(raw)
+    if component is None:
+        # Registro plano de outro componente: nada a reavaliar
+        return ("", None, None)
+
+    risk = _RISK_NUMBER_RE.search(raw)
+    if risk is None:
+        return None
+
+    allowed = _ALLOWED_RE.search(raw)
+    token = risk.group(1)
+    try:
+        value = None if token == b"null" else float(token) / 10.0
+    except ValueError:
+        return None
+
+    return (
+        component.group(1).decode("ascii"),
+        value,
+        (allowed.group(1) == b"true") if allowed is not None else None,
+    )
+
+
+def replay(groups: dict[str, _ScoreGroup], thresholds: list[float]) -> list[dict]:
+    supervisor_limits = list(thresholds)
+    curupira_limits = [t * CURUPIRA_FACTOR for t in thresholds]
+    # Pipeline reativo: permitido so se as duas camadas permitirem
+    pipeline_limits = [min(s, c) for s, c in zip(supervisor_limits, curupira_limits)]
+
+    rows = [{"threshold": t} for t in thresholds]
+
+    for name, limits in (
+        ("supervisor", supervisor_limits),
+        ("curupira", curupira_limits),
+        ("results", pipeline_limits),
+    ):
+        group = groups[name]
+        total = group.total()
+        allowed = group.allowed_counts(limits)
+
+        previously_allowed = len(group.values[True]) + group.always_allowed[True] + group.always_blocked[True]
+
+        for idx, row in enumerate(rows):
+            now_allowed = allowed[True][idx] + allowed[False][idx] + allowed[None][idx]
+            summary = {"allowed": now_allowed, "blocked": total - now_allowed}
+            if name != "results":
+                # Mudanas em relaao ao que foi decidido na epoca
+                summary["newly_allowed"] = allowed[False][idx]
+                summary["newly_blocked"] = previously_allowed - allowed[True][idx]
+            row[name] = summary
+
+    return rows
+
+
+def parse_thresholds(raw: str) -> list[float]:
+    """"0.2,0.4" ou "inicio:fim:passo" (fim incluso)."""
+    if ":" in raw:
+        start, stop, step = (float(part) for part in raw.split(":"))
+        if step <= 0:
+            raise ValueError("step must be positive")
+        count = int(math.floor((stop - start) / step + 1e-9)) + 1
+        return [round(start + i * step, 10) for i in range(count)]
+    return [float(part) for part in raw.split(",") if part.strip()]
+
+
+def format_table(rows: list[dict], baseline: float) -> str:
+    lines = [
+        f"{'threshold':>9}  {'sup allow':>9} {'sup block':>9} {'+allow':>7} {'+block':>7}"
+        f"  {'cur allow':>9} {'cur block':>9} {'+allow':>7} {'+block':>7}"
+        f"  {'res allow':>9} {'res block':>9}"
+    ]
+    for row in rows:
+        sup, cur, res = row["supervisor"], row["curupira"], row["results"]
+        marker = " *" if math.isclose(row["threshold"], baseline) else ""
+        lines.append(
+            f"{row['threshold']:>9.3f}  {sup['allowed']:>9} {sup['blocked']:>9}"
+            f" {sup['newly_allowed']:>7} {sup['newly_blocked']:>7}"
+            f"  {cur['allowed']:>9} {cur['blocked']:>9}"
+            f" {cur['newly_allowed']:>7} {cur['newly_blocked']:>7}"
+            f"  {res['allowed']:>9} {res['blocked']:>9}{marker}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Replay de thresholds sobre o historico de decisoes")
+    parser.add_argument("--thresholds", default="0:1:0.05", help='Lista "0.2,0.4" ou faixa "inicio:fim:passo"')
+    parser.add_argument("--decisions-log", type=Path, default=DECISIONS_LOG)
+    parser.add_argument("--results-dir", type=Path, default=RESULTS_DIR)
+    parser.add_argument("--json", action="store_true", help="Saida em JSON")
+    args = parser.parse_args()
+
+    thresholds = parse_thresholds(args.thresholds)
+    groups = load_history(args.decisions_log, args.results_dir)
+    rows = replay(groups, thresholds)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+
+    baseline = load_config().curupira_risk_threshold
+    print(
+        f"Historico: supervisor={groups['supervisor'].total()} "
+        f"curupira={groups['curupira'].total()} resultados={groups['results'].total()}"
+    )
+    print(f"Threshold atual: {baseline} (*)  +allow/+block = mudanas vs decisao historica\n")
+    print(format_table(rows, baseline))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
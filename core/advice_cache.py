@@ -0,0 +1,97 @@
+import atexit
+import os
+import threading
+import time
+from pathlib import Path
+
+from core.decision_cache import DecisionCache
+
+
+ADVICE_CACHE_FILE = Path("data/ai_advice_cache.json")
+DEFAULT_ADVICE_CACHE_SIZE = 256
+DEFAULT_ADVICE_CACHE_TTL_SECONDS = 3600.0
+
+
+def read_advice_cache_size() -> int:
+    raw = (os.getenv("AI_CACHE_SIZE") or "").strip()
+    if not raw:
+        return DEFAULT_ADVICE_CACHE_SIZE
+    try:
+        return max(0, int(raw))
+    except ValueError:
+        return DEFAULT_ADVICE_CACHE_SIZE
+
+
+def read_advice_cache_ttl_seconds() -> float:
+    raw = (os.getenv("AI_CACHE_TTL_SECONDS") or "").strip()
+    if not raw:
+        return DEFAULT_ADVICE_CACHE_TTL_SECONDS
+    try:
+        return max(0.0, float(raw))
+    except ValueError:
+        return DEFAULT_ADVICE_CACHE_TTL_SECONDS
+
+
+def advice_cache_key(input_hash: str, provider: str, model: str) -> str:
+    return f"{input_hash}:{provider}:{model}"
+
+
+class AdviceCache(DecisionCache):
+    """
+    Recomendaoes do AIAdvisor por hash de entrada, provider e modelo.
+
+    Mesmo LRU persistido de DecisionCache, com TTL: a recomendaao de um
+    modelo externo pode mudar, entao entradas vencidas contam como miss.
+    """
+
+    metric_prefix = "ai_advice_cache"
+
+    def __init__(
+        self,
+        path: Path | None = None,
+        max_entries: int | None = None,
+        ttl_seconds: float | None = None,
+    ):
+        self.ttl_seconds = read_advice_cache_ttl_seconds() if ttl_seconds is None else ttl_seconds
+        if max_entries is None:
+            max_entries = read_advice_cache_size()
+        if self.ttl_seconds <= 0:
+            max_entries = 0
+        super().__init__(path or ADVICE_CACHE_FILE, max_entries=max_entries)
+
+    def get(self, key: str) -> dict | None:
+        entry = self.get_entry(key)
+        return entry["recommendation"] if entry is not None else None
+
+    def get_entry(self, key: str) -> dict | None:
+        """Entrada completa: recommendation, stored_at e input_hash de origem."""
+        return super().get(key)
+
+    def put(self, key: str, value: dict, input_hash: str | None = None) -> None:
+        super().put(key, {"stored_at": time.time(), "recommendation": value, "input_hash": input_hash})
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _is_fresh(self, value: dict) -> bool:
+        stored_at = value.get("stored_at")
+        if not isinstance(stored_at, (int, float)):
+            return False
+        return time.time() - stored_at < self.ttl_seconds
+
+
+_ADVICE_CACHE: AdviceCache | None = None
+_ADVICE_CACHE_LOCK = threading.Lock()
+
+
+def get_advice_cache() -> AdviceCache:
+    global _ADVICE_CACHE
+
+    if _ADVICE_CACHE is None:
+        with _ADVICE_CACHE_LOCK:
+            if _ADVICE_CACHE is None:
+                _ADVICE_CACHE = AdviceCache()
+                atexit.register(_ADVICE_CACHE.close)
+
+    return _ADVICE_CACHE
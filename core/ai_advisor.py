@@ -8,12 +8,25 @@ from dataclasses import asdict, dataclass
 from datetime import UTC, datetime
 
 from ai.config import AppConfig
-from core.ai_providers import NullProvider, OpenAIProvider
+from core.advice_cache import AdviceCache, advice_cache_key, get_advice_cache
+from core.ai_providers import CompositeProvider, LocalProvider, NullProvider, OpenAIProvider
+from core.ai_providers.composite_provider import DEFAULT_HEDGE_DELAY_SECONDS, DEFAULT_HEDGE_PERCENTILE
+from core.ai_providers.openai_provider import DEFAULT_BASE_URL, DEFAULT_POOL_SIZE
+from core.circuit_breaker import CircuitBreaker
 from core.observability import load_last_decisions, load_metrics, log_decision
 
 _ALLOWED_ACTIONS = {"dry_run", "block", "review", "proceed"}
 _ALLOWED_RISK_LEVELS = {"low", "medium", "high"}
 
+DEFAULT_BATCH_MAX_PLANS = 8
+DEFAULT_BATCH_MAX_BYTES = 8192
+
+# Mudam a cada decisao: na chave do cache entram so como faixa de bloqueio
+# e sinal de anomalia (_health_bucket), nao pelo valor exato
+_VOLATILE_CONTEXT_KEYS = {"last_decisions", "metrics"}
+_VOLATILE_EXTRA_KEYS = {"intent_id"}
+_BLOCK_RATE_BANDS = 4
+
 
 @dataclass(frozen=True)
 class AIRecommendation:
@@ -27,30 +40,51 @@ class AIRecommendation:
 
 
 class AIAdvisor:
-    def __init__(self, provider) -> None:
+    def __init__(
+        self,
+        provider,
+        cache: AdviceCache | None = None,
+        breaker: CircuitBreaker | None = None,
+    ) -> None:
         self.provider = provider
+        self.cache = cache
+        self.breaker = breaker
 
     @classmethod
     def from_config(cls, config: AppConfig) -> "AIAdvisor":
-        provider_name = (config.ai_provider or "none").strip().lower()
-
-        if provider_name == "openai":
-            model = (os.getenv("AI_MODEL") or "gpt-4o-mini").strip()
-            timeout = _read_timeout_seconds()
-            return cls(
-                OpenAIProvider(
-                    api_key=config.ai_api_key,
-                    model=model,
-                    timeout_seconds=timeout,
-                )
-            )
+        # AI_PROVIDER aceita lista ("openai,openclaw"): ordem de fallback
+        names = [
+            name.strip()
+            for name in (config.ai_provider or "none").lower().split(",")
+            if name.strip()
+        ]
+        providers = [
+            provider
+            for provider in (_build_provider(name, config) for name in names)
+            if provider is not None
+        ]
 
-        elif provider_name == "openclaw":
-            from core.ai_providers.openclaw_provider import OpenClawProvider
-            return cls(OpenClawProvider(config))
-        elif provider_name == "none":
+        if not providers:
             return cls(NullProvider())
 
+        if len(providers) == 1 and isinstance(providers[0], LocalProvider):
+            # Responde em microssegundos: cache e circuit breaker so custariam
+            return cls(providers[0])
+
+        if len(providers) == 1 and not _read_bool("AI_HEDGE", False):
+            provider = providers[0]
+        else:
+            provider = CompositeProvider(
+                providers,
+                hedge_percentile=_read_float("AI_HEDGE_PERCENTILE", DEFAULT_HEDGE_PERCENTILE, 0.5, 0.999),
+                hedge_delay_seconds=_read_float("AI_HEDGE_DELAY_SECONDS", DEFAULT_HEDGE_DELAY_SECONDS, 0.05, 30.0),
+            )
+
+        return cls(
+            provider,
+            cache=get_advice_cache(),
+            breaker=CircuitBreaker(f"{provider.provider_name}:{provider.model_name}"),
+        )
 
     def analyze(self, plan: dict, context: dict) -> dict | None:
         started = time.perf_counter()
@@ -58,32 +92,182 @@ class AIAdvisor:
         if self.provider.provider_name == "none":
             return None
 
+        # Falha antes da consulta ao cache conta como miss
+        cache_status = "miss"
         try:
             sanitized_plan = _sanitize_plan(plan)
             sanitized_context = _sanitize_context(context)
-            raw = self.provider.recommend(sanitized_plan, sanitized_context)
 
-            if raw is None:
-                self._log("no_recommendation", plan, started)
+            input_hash = _input_hash(sanitized_plan, sanitized_context)
+            cache_key, cached = self._cached(sanitized_plan, sanitized_context)
+            if cached is not None:
+                self._log_hit(plan, started, cached, cache_key, input_hash)
+                return cached["recommendation"]
+            cache_status = _cache_status(cache_key)
+
+            if self.breaker is not None and not self.breaker.allow():
+                # Provider fora do ar: nao espera o timeout a cada intent
+                self._log("circuit_open", plan, started, cache=cache_status)
                 return None
 
-            recommendation = _normalize(raw, self.provider.provider_name, self.provider.model_name)
-            payload = asdict(recommendation)
+            raw = self._recommend(self.provider.recommend, sanitized_plan, sanitized_context)
 
-            self._log(
-                "success",
-                plan,
-                started,
-                payload,
-                input_hash=_stable_hash({"plan": sanitized_plan, "context": sanitized_context}),
-                output_hash=_stable_hash(payload),
-            )
+            if raw is None:
+                self._log("no_recommendation", plan, started, cache=cache_status)
+                return None
 
+            payload = self._payload(raw, cache_key, input_hash)
+            self._log_success(plan, started, payload, cache_status, input_hash)
             return payload
         except Exception as exc:
-            self._log("error", plan, started, error=str(exc))
+            self._log("error", plan, started, cache=cache_status, error=str(exc))
             return None
 
+    def analyze_batch(self, plans: list[dict], context: dict) -> list[dict | None]:
+        """
+        Recomendaoes para varios planos com contexto compartilhado.
+
+        Os planos sem cache vao ao provider em lotes limitados por
+        AI_BATCH_MAX_PLANS/AI_BATCH_MAX_BYTES (uma requisiao por lote).
+        Resultado alinhado com `plans`; cada plano e logado separadamente.
+        """
+        if self.provider.provider_name == "none":
+            return [None] * len(plans)
+
+        if not hasattr(self.provider, "recommend_batch"):
+            return [self.analyze(plan, context) for plan in plans]
+
+        started = time.perf_counter()
+        results: list[dict | None] = [None] * len(plans)
+        sanitized_context = _sanitize_context(context)
+        pending = []
+
+        for index, plan in enumerate(plans):
+            sanitized_plan = _sanitize_plan(plan)
+            input_hash = _input_hash(sanitized_plan, sanitized_context)
+            try:
+                cache_key, cached = self._cached(sanitized_plan, sanitized_context)
+            except Exception:
+                cache_key, cached = None, None
+
+            if cached is not None:
+                self._log_hit(plan, started, cached, cache_key, input_hash)
+                results[index] = cached["recommendation"]
+            else:
+                pending.append((index, sanitized_plan, cache_key, input_hash))
+
+        for chunk in _chunk_by_budget(pending, _read_batch_max_plans(), _read_batch_max_bytes()):
+            batch = {"batch_size": len(chunk)}
+
+            if self.breaker is not None and not self.breaker.allow():
+                for index, _, cache_key, _ in chunk:
+                    self._log("circuit_open", plans[index], started, cache=_cache_status(cache_key), **batch)
+                continue
+
+            try:
+                raws = self._recommend(
+                    self.provider.recommend_batch,
+                    [sanitized_plan for _, sanitized_plan, _, _ in chunk],
+                    sanitized_context,
+                    adaptive_timeout=False,
+                )
+            except Exception as exc:
+                for index, _, cache_key, _ in chunk:
+                    self._log("error", plans[index], started, cache=_cache_status(cache_key), error=str(exc), **batch)
+                continue
+
+            for (index, _, cache_key, input_hash), raw in zip(chunk, raws):
+                plan = plans[index]
+                try:
+                    if raw is None:
+                        self._log("no_recommendation", plan, started, cache=_cache_status(cache_key), **batch)
+                        continue
+
+                    payload = self._payload(raw, cache_key, input_hash)
+                    self._log_success(plan, started, payload, _cache_status(cache_key), input_hash, **batch)
+                    results[index] = payload
+                except Exception as exc:
+                    self._log("error", plan, started, cache=_cache_status(cache_key), error=str(exc), **batch)
+
+        return results
+
+    def _cached(self, sanitized_plan: dict, sanitized_context: dict) -> tuple[str | None, dict | None]:
+        """(chave, entrada do cache com recommendation e input_hash de origem)."""
+        if self.cache is None or not self.cache.enabled:
+            return None, None
+
+        cache_key = advice_cache_key(
+            _stable_hash({"plan": sanitized_plan, "context": _cacheable_context(sanitized_context)}),
+            self.provider.provider_name,
+            self.provider.model_name,
+        )
+        return cache_key, self.cache.get_entry(cache_key)
+
+    def _payload(self, raw: dict, cache_key: str | None, input_hash: str) -> dict:
+        recommendation = _normalize(raw, self.provider.provider_name, self.provider.model_name)
+        payload = asdict(recommendation)
+
+        if cache_key is not None:
+            self.cache.put(cache_key, payload, input_hash=input_hash)
+        return payload
+
+    def _recommend(self, call, plans, context: dict, adaptive_timeout: bool = True):
+        if self.breaker is None:
+            return call(plans, context)
+
+        kwargs = {}
+        default_timeout = getattr(self.provider, "timeout_seconds", None)
+        if default_timeout is not None:
+            # Lotes demoram mais que chamadas unitarias: timeout cheio
+            kwargs["timeout_seconds"] = (
+                self.breaker.timeout(default_timeout) if adaptive_timeout else default_timeout
+            )
+
+        started = time.perf_counter()
+        try:
+            raw = call(plans, context, **kwargs)
+        except Exception:
+            self.breaker.record_failure()
+            raise
+
+        # Resposta vazia (ex.: sem API key) e lotes nao entram no historico
+        # de latencia
+        latency = time.perf_counter() - started if raw is not None and adaptive_timeout else None
+        self.breaker.record_success(latency)
+        return raw
+
+    def _log_success(
+        self,
+        plan: dict,
+        started: float,
+        payload: dict,
+        cache_status: str,
+        input_hash: str,
+        **extra,
+    ) -> None:
+        self._log(
+            "success",
+            plan,
+            started,
+            payload,
+            cache=cache_status,
+            input_hash=input_hash,
+            output_hash=_stable_hash(payload),
+            **extra,
+        )
+
+    def _log_hit(self, plan: dict, started: float, entry: dict, cache_key: str, input_hash: str) -> None:
+        # A resposta reaproveitada foi produzida para outra entrada completa
+        self._log_success(
+            plan,
+            started,
+            entry["recommendation"],
+            "hit",
+            input_hash,
+            cache_key=cache_key,
+            cached_input_hash=entry.get("input_hash"),
+        )
+
     def _log(self, status: str, plan: dict, started: float, recommendation: dict | None = None, **extra) -> None:
         event = {
             "component": "ai_advisor",
@@ -101,12 +285,44 @@ class AIAdvisor:
         log_decision(event)
 
 
+def _build_provider(name: str, config: AppConfig):
+    if name == "openai":
+        return OpenAIProvider(
+            api_key=config.ai_api_key,
+            model=(os.getenv("AI_MODEL") or "gpt-4o-mini").strip(),
+            timeout_seconds=_read_timeout_seconds(),
+            base_url=(os.getenv("AI_BASE_URL") or DEFAULT_BASE_URL).strip(),
+            pool_size=_read_pool_size(),
+        )
+
+    if name == "local":
+        return LocalProvider(risk_threshold=config.curupira_risk_threshold)
+
+    if name == "openclaw":
+        try:
+            from core.ai_providers.openclaw_provider import OpenClawProvider
+        except ImportError:
+            # Provider ainda nao incluido neste build
+            return None
+        return OpenClawProvider(config)
+
+    # "none" e nomes desconhecidos: sem provider (consultivo, nunca bloqueia)
+    return None
+
+
 def build_ai_context(plan: dict, extra_context: dict | None = None) -> dict:
-    context = {
+    return {
         "plan_id": plan.get("id"),
         "risk_score": plan.get("risk_score"),
         "source": plan.get("source"),
         "commands_count": len(plan.get("commands", [])) if isinstance(plan.get("commands"), list) else 0,
+        **build_shared_context(extra_context),
+    }
+
+
+def build_shared_context(extra_context: dict | None = None) -> dict:
+    """Parte do contexto que nao depende do plano (usada em analyze_batch)."""
+    context = {
         "last_decisions": load_last_decisions(3),
         "metrics": load_metrics(),
     }
@@ -117,6 +333,31 @@ def build_ai_context(plan: dict, extra_context: dict | None = None) -> dict:
     return context
 
 
+def _chunk_by_budget(items: list, max_plans: int, max_bytes: int) -> list[list]:
+    # item = (indice, plano sanitizado, chave de cache); o contexto vai uma
+    # vez por lote e nao entra no orcamento
+    chunks = []
+    current = []
+    size = 0
+
+    for item in items:
+        item_size = len(json.dumps(item[1]))
+        if current and (len(current) >= max_plans or size + item_size > max_bytes):
+            chunks.append(current)
+            current = []
+            size = 0
+        current.append(item)
+        size += item_size
+
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _cache_status(cache_key: str | None) -> str:
+    return "off" if cache_key is None else "miss"
+
+
 def _sanitize_plan(plan: dict) -> dict:
     return {
         "id": plan.get("id"),
@@ -142,6 +383,53 @@ def _sanitize_context(context: dict) -> dict:
     return safe
 
 
+def _input_hash(sanitized_plan: dict, sanitized_context: dict) -> str:
+    return _stable_hash({"plan": sanitized_plan, "context": sanitized_context})
+
+
+def _cacheable_context(context: dict) -> dict:
+    stable = {key: value for key, value in context.items() if key not in _VOLATILE_CONTEXT_KEYS}
+    if isinstance(stable.get("extra"), dict):
+        stable["extra"] = {
+            key: value for key, value in stable["extra"].items() if key not in _VOLATILE_EXTRA_KEYS
+        }
+    stable["health"] = _health_bucket(context)
+    return stable
+
+
+def _health_bucket(context: dict) -> dict:
+    """
+    Resumo grosso de last_decisions/metrics para a chave do cache.
+
+    Uma mudana de faixa de bloqueio ou uma anomalia recente invalida a
+    recomendaao em cache; contadores que so crescem nao.
+    """
+    recent = [d for d in context.get("last_decisions") or [] if isinstance(d, dict)]
+    judged = [d for d in recent if isinstance(d.get("allowed"), bool)]
+    recent_blocked = sum(1 for d in judged if not d["allowed"])
+
+    metrics = context.get("metrics") if isinstance(context.get("metrics"), dict) else {}
+    blocked = _metric_count(metrics, "intents_blocked")
+    approved = _metric_count(metrics, "intents_dry_run")
+
+    return {
+        "recent_block_band": _block_rate_band(recent_blocked, len(judged)),
+        "block_band": _block_rate_band(blocked, blocked + approved),
+        "anomaly": any(d.get("component") == "anomaly" for d in recent),
+    }
+
+
+def _block_rate_band(blocked: int, total: int) -> int | None:
+    if total == 0:
+        return None
+    return min(_BLOCK_RATE_BANDS - 1, blocked * _BLOCK_RATE_BANDS // total)
+
+
+def _metric_count(metrics: dict, name: str) -> int:
+    value = metrics.get(name)
+    return value if isinstance(value, int) and not isinstance(value, bool) else 0
+
+
 def _normalize(raw: dict, provider: str, model: str) -> AIRecommendation:
     action = str(raw.get("suggested_action") or "review").strip().lower()
     if action not in _ALLOWED_ACTIONS:
@@ -198,3 +486,45 @@ def _read_timeout_seconds() -> float:
     except ValueError:
         return 5.0
     return max(0.5, min(30.0, timeout))
+
+
+def _read_pool_size() -> int:
+    raw = (os.getenv("AI_POOL_SIZE") or "").strip()
+    try:
+        return max(0, int(raw)) if raw else DEFAULT_POOL_SIZE
+    except ValueError:
+        return DEFAULT_POOL_SIZE
+
+
+def _read_bool(name: str, default: bool) -> bool:
+    raw = (os.getenv(name) or "").strip().lower()
+    if raw in {"1", "true", "yes", "on"}:
+        return True
+    if raw in {"0", "false", "no", "off"}:
+        return False
+    return default
+
+
+def _read_float(name: str, default: float, minimum: float, maximum: float) -> float:
+    raw = (os.getenv(name) or "").strip()
+    try:
+        value = float(raw) if raw else default
+    except ValueError:
+        return default
+    return max(minimum, min(maximum, value))
+
+
+def _read_batch_max_plans() -> int:
+    raw = (os.getenv("AI_BATCH_MAX_PLANS") or "").strip()
+    try:
+        return max(1, int(raw)) if raw else DEFAULT_BATCH_MAX_PLANS
+    except ValueError:
+        return DEFAULT_BATCH_MAX_PLANS
+
+
+def _read_batch_max_bytes() -> int:
+    raw = (os.getenv("AI_BATCH_MAX_BYTES") or "").strip()
+    try:
+        return max(1, int(raw)) if raw else DEFAULT_BATCH_MAX_BYTES
+    except ValueError:
+        return DEFAULT_BATCH_MAX_BYTES
@@ -1,5 +1,7 @@
 from core.ai_providers.base import AIProvider
+from core.ai_providers.composite_provider import CompositeProvider
+from core.ai_providers.local_provider import LocalProvider
 from core.ai_providers.null_provider import NullProvider
 from core.ai_providers.openai_provider import OpenAIProvider
 
-__all__ = ["AIProvider", "NullProvider", "OpenAIProvider"]
+__all__ = ["AIProvider", "CompositeProvider", "LocalProvider", "NullProvider", "OpenAIProvider"]
@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import asyncio
+import threading
+from concurrent.futures import Future
 from typing import Protocol
 
 
@@ -9,3 +12,36 @@ class AIProvider(Protocol):
 
     def recommend(self, plan: dict, context: dict) -> dict | None:
         ...
+
+    async def arecommend(self, plan: dict, context: dict) -> dict | None:
+        ...
+
+
+async def arecommend(provider, plan: dict, context: dict) -> dict | None:
+    """arecommend nativo quando existe; senao recommend numa thread."""
+    native = getattr(provider, "arecommend", None)
+    if native is not None:
+        return await native(plan, context)
+    return await asyncio.wrap_future(run_in_daemon_thread(provider.recommend, plan, context))
+
+
+def run_in_daemon_thread(fn, *args) -> Future:
+    """
+    Executa fn numa thread daemon e devolve um Future.
+
+    Diferente de asyncio.to_thread/ThreadPoolExecutor, ninguem espera por
+    essa thread: uma requisiao perdedora (hedge) ou atrasada nao segura o
+    encerramento do event loop nem do interpretador.
+    """
+    future: Future = Future()
+
+    def _run() -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except BaseException as exc:
+            future.set_exception(exc)
+
+    threading.Thread(target=_run, name="ai-provider-call", daemon=True).start()
+    return future
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+from core.ai_providers.base import arecommend, run_in_daemon_thread
+from core.stats import P2Quantile
+
+DEFAULT_HEDGE_PERCENTILE = 0.95
+DEFAULT_HEDGE_DELAY_SECONDS = 1.0
+MIN_HEDGE_SAMPLES = 20
+MIN_HEDGE_DELAY_SECONDS = 0.05
+
+
+class CompositeProvider:
+    """
+    Encadeia providers com hedge e fallback.
+
+    A primeira requisiao vai ao primeiro provider. Se ela passar do
+    percentil de latencia observado (ou falhar), a proxima tentativa sai
+    sem cancelar a anterior: o proximo provider da lista, ou uma segunda
+    requisiao ao mesmo quando ha um so. Vale a primeira resposta valida.
+    """
+
+    provider_name = "composite"
+
+    def __init__(
+        self,
+        providers: list,
+        hedge_percentile: float = DEFAULT_HEDGE_PERCENTILE,
+        hedge_delay_seconds: float = DEFAULT_HEDGE_DELAY_SECONDS,
+    ):
+        if not providers:
+            raise ValueError("at least one provider is required")
+
+        self.providers = list(providers)
+        self.model_name = ",".join(f"{p.provider_name}:{p.model_name}" for p in self.providers)
+        self.hedge_delay_seconds = hedge_delay_seconds
+        self._latency = P2Quantile(hedge_percentile)
+        self._samples = 0
+        self._lock = threading.Lock()
+
+    @property
+    def timeout_seconds(self) -> float | None:
+        # O AIAdvisor deriva o timeout adaptativo do timeout do primario
+        return getattr(self.providers[0], "timeout_seconds", None)
+
+    def recommend(self, plan: dict, context: dict, timeout_seconds: float | None = None) -> dict | None:
+        # Caminho usado pelo AIAdvisor. Sem event loop: asyncio.run esperaria
+        # as threads das tentativas perdedoras ao encerrar. Cada tentativa
+        # roda numa thread daemon e as perdedoras sao simplesmente abandonadas.
+        attempts = self._attempts()
+        pending: set[Future] = set()
+        launched = 0
+        last_error: Exception | None = None
+
+        def launch() -> None:
+            nonlocal launched
+            provider = attempts[launched]
+            pending.add(run_in_daemon_thread(self._timed_recommend, provider, plan, context, timeout_seconds))
+            launched += 1
+
+        launch()
+        while pending:
+            timeout = self.hedge_delay() if launched < len(attempts) else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                launch()
+                continue
+
+            for future in done:
+                pending.discard(future)
+                try:
+                    result = future.result()
+                except Exception as exc:
+                    last_error = exc
+                    continue
+                if isinstance(result, dict):
+                    return result
+
+            if launched < len(attempts):
+                launch()
+
+        if last_error is not None:
+            raise last_error
+        return None
+
+    def recommend_batch(
+        self,
+        plans: list[dict],
+        context: dict,
+        timeout_seconds: float | None = None,
+    ) -> list[dict | None]:
+        """
+        Lote delegado ao primario quando ele aceita lotes, sem hedge (dobraria
+        o custo do lote inteiro). Se o primario nao aceita lotes ou falha,
+        cada plano vira uma chamada `recommend`, em paralelo e com hedge.
+        """
+        primary = self.providers[0]
+        if hasattr(primary, "recommend_batch"):
+            try:
+                return primary.recommend_batch(plans, context, **_timeout_kwargs(primary, timeout_seconds))
+            except Exception:
+                if len(self.providers) == 1:
+                    raise
+
+        futures = [run_in_daemon_thread(self.recommend, plan, context, timeout_seconds) for plan in plans]
+        results: list[dict | None] = []
+        last_error: Exception | None = None
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as exc:
+                last_error = exc
+                results.append(None)
+
+        # Todas as chamadas falharam: o AIAdvisor registra o lote como erro
+        if last_error is not None and all(result is None for result in results):
+            raise last_error
+        return results
+
+    async def arecommend(self, plan: dict, context: dict) -> dict | None:
+        attempts = self._attempts()
+        pending: set[asyncio.Task] = set()
+        launched = 0
+        last_error: Exception | None = None
+
+        def launch() -> None:
+            nonlocal launched
+            pending.add(asyncio.create_task(self._attempt(attempts[launched], plan, context)))
+            launched += 1
+
+        launch()
+        try:
+            while pending:
+                timeout = self.hedge_delay() if launched < len(attempts) else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # Passou do percentil: hedge/fallback sem esperar a primeira
+                    launch()
+                    continue
+
+                for task in done:
+                    pending.discard(task)
+                    try:
+                        result = task.result()
+                    except Exception as exc:
+                        last_error = exc
+                        continue
+                    if isinstance(result, dict):
+                        return result
+
+                # Falha ou resposta vazia: fallback imediato
+                if launched < len(attempts):
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if last_error is not None:
+            raise last_error
+        return None
+
+    def hedge_delay(self) -> float:
+        with self._lock:
+            if self._samples < MIN_HEDGE_SAMPLES:
+                return self.hedge_delay_seconds
+            return max(MIN_HEDGE_DELAY_SECONDS, self._latency.value())
+
+    def close(self) -> None:
+        for provider in self.providers:
+            close = getattr(provider, "close", None)
+            if close is not None:
+                close()
+
+    def _attempts(self) -> list:
+        # Um unico provider: o hedge e uma segunda requisiao ao mesmo
+        return self.providers if len(self.providers) > 1 else self.providers * 2
+
+    async def _attempt(self, provider, plan: dict, context: dict) -> dict | None:
+        started = time.perf_counter()
+        result = await arecommend(provider, plan, context)
+        self._observe(result, started)
+        return result
+
+    def _timed_recommend(
+        self,
+        provider,
+        plan: dict,
+        context: dict,
+        timeout_seconds: float | None = None,
+    ) -> dict | None:
+        started = time.perf_counter()
+        result = provider.recommend(plan, context, **_timeout_kwargs(provider, timeout_seconds))
+        self._observe(result, started)
+        return result
+
+    def _observe(self, result, started: float) -> None:
+        if isinstance(result, dict):
+            with self._lock:
+                self._latency.update(time.perf_counter() - started)
+                self._samples += 1
+
+
+def _timeout_kwargs(provider, timeout_seconds: float | None) -> dict:
+    # Mesmo criterio do AIAdvisor: so providers com timeout_seconds aceitam
+    if timeout_seconds is None or getattr(provider, "timeout_seconds", None) is None:
+        return {}
+    return {"timeout_seconds": timeout_seconds}
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import http.client
+import queue
+import socket
+import time
+from urllib.parse import urlsplit
+
+_READ_CHUNK_SIZE = 64 * 1024
+
+# Falhas tipicas de socket keep-alive fechado pelo servidor enquanto ocioso
+_STALE_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    BrokenPipeError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+)
+
+
+class HTTPStatusError(RuntimeError):
+    def __init__(self, status: int, reason: str, body: bytes):
+        super().__init__(f"HTTP {status} {reason}")
+        self.status = status
+        self.body = body
+
+
+class HTTPConnectionPool:
+    """
+    Conexoes HTTP(S) persistentes para um unico host.
+
+    Guarda ate max_idle conexoes ociosas (LIFO: a mais recente tem menos
+    chance de ter sido fechada pelo servidor). Requisioes concorrentes alem
+    disso abrem conexoes extras, fechadas ao final.
+    """
+
+    def __init__(self, base_url: str, max_idle: int = 2):
+        parts = urlsplit(base_url)
+        if parts.scheme not in {"http", "https"} or not parts.hostname:
+            raise ValueError(f"invalid base URL: {base_url!r}")
+
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip("/")
+        self.max_idle = max(0, max_idle)
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self.connections_opened = 0
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        body: bytes | None = None,
+        headers: dict | None = None,
+        timeout: float = 5.0,
+    ) -> bytes:
+        """
+        Corpo da resposta 2xx; HTTPStatusError para os demais status.
+
+        timeout e o prazo total da requisiao (conexao, envio e leitura),
+        incluindo a nova tentativa quando a conexao reaproveitada estava morta.
+        """
+        deadline = time.monotonic() + timeout
+        url = self.base_path + path
+
+        while True:
+            conn, reused = self._checkout()
+            try:
+                _set_timeout(conn, deadline)
+                conn.request(method, url, body=body, headers=headers or {})
+                # getresponse pode soltar conn.sock (will_close): a leitura
+                # do corpo usa a referencia guardada aqui
+                sock = conn.sock
+                _set_timeout(conn, deadline)
+                response = conn.getresponse()
+                data = _read_body(response, sock, deadline)
+            except _STALE_ERRORS:
+                conn.close()
+                # So repete se a conexao era reaproveitada: falha numa
+                # conexao nova e problema real do servidor
+                if reused and deadline - time.monotonic() > 0:
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+
+            if response.will_close:
+                conn.close()
+            else:
+                self._checkin(conn)
+
+            if not 200 <= response.status < 300:
+                raise HTTPStatusError(response.status, response.reason, data)
+            return data
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _checkout(self) -> tuple[http.client.HTTPConnection, bool]:
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            pass
+
+        self.connections_opened += 1
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port), False
+        return http.client.HTTPConnection(self.host, self.port), False
+
+    def _checkin(self, conn: http.client.HTTPConnection) -> None:
+        if self._idle.qsize() >= self.max_idle:
+            conn.close()
+            return
+        self._idle.put(conn)
+
+
+def _read_body(response: http.client.HTTPResponse, sock: socket.socket | None, deadline: float) -> bytes:
+    # Um unico read() aplicaria o timeout a cada recv: um corpo pingado
+    # byte a byte estouraria o prazo total. Le em blocos, reduzindo o
+    # timeout do socket ao que resta antes de cada um.
+    chunks = []
+    while True:
+        remaining = _remaining(deadline)
+        if sock is not None:
+            sock.settimeout(remaining)
+        chunk = response.read1(_READ_CHUNK_SIZE)
+        if not chunk:
+            # read1 nao marca a resposta como consumida ao zerar o
+            # Content-Length; read() fecha e libera a conexao para reuso
+            chunks.append(response.read())
+            return b"".join(chunks)
+        chunks.append(chunk)
+
+
+def _set_timeout(conn: http.client.HTTPConnection, deadline: float) -> None:
+    remaining = _remaining(deadline)
+
+    # Antes do connect vale conn.timeout; depois, o timeout do socket
+    conn.timeout = remaining
+    if conn.sock is not None:
+        conn.sock.settimeout(remaining)
+
+
+def _remaining(deadline: float) -> float:
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise socket.timeout("request deadline exceeded")
+    return remaining
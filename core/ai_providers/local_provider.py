@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import math
+
+from ai.config import DEFAULT_CURUPIRA_RISK_THRESHOLD
+
+# Escala de risk_score dos planos (0-10), como nos avaliadores
+_RISK_SCALE = 10.0
+_MANY_COMMANDS = 20
+
+
+def _features(plan: dict, context: dict, threshold: float) -> dict:
+    try:
+        risk = float(plan.get("risk_score")) / _RISK_SCALE
+    except (TypeError, ValueError):
+        risk = None
+    if risk is not None and not math.isfinite(risk):
+        risk = None
+
+    recent = [d for d in context.get("last_decisions") or [] if isinstance(d, dict)]
+    judged = [d for d in recent if isinstance(d.get("allowed"), bool)]
+    recent_block_rate = (
+        sum(1 for d in judged if not d["allowed"]) / len(judged) if judged else 0.0
+    )
+
+    metrics = context.get("metrics") or {}
+    blocked = _count(metrics, "intents_blocked")
+    approved = _count(metrics, "intents_dry_run")
+    block_rate = blocked / (blocked + approved) if blocked + approved else 0.0
+
+    return {
+        "threshold": threshold,
+        "risk": risk,
+        "commands": plan.get("commands_count") or 0,
+        "recent_decisions": len(judged),
+        "recent_block_rate": recent_block_rate,
+        "block_rate": block_rate,
+        "anomalies": _count(metrics, "anomaly_detected"),
+    }
+
+
+def _count(metrics: dict, name: str) -> int:
+    value = metrics.get(name)
+    return value if isinstance(value, int) and not isinstance(value, bool) else 0
+
+
+# (predicado, aao, nivel, confiana base, explicaao); vale a primeira regra
+# que casar. Tupla de funoes: avaliaao sem parsing nem alocaao por regra.
+_RULES = (
+    (lambda f: f["risk"] is None, "review", "high", 0.9,
+     "Missing or invalid risk_score"),
+    (lambda f: f["risk"] >= 0.8, "block", "high", 0.9,
+     "Risk score far above autonomy threshold"),
+    (lambda f: f["commands"] == 0, "review", "medium", 0.7,
+     "Plan has no commands"),
+    (lambda f: f["risk"] > f["threshold"], "review", "medium", 0.7,
+     "Risk score above autonomy threshold"),
+    (lambda f: f["recent_block_rate"] >= 0.5 and f["risk"] >= 0.2, "review", "medium", 0.6,
+     "Many recent decisions were blocked"),
+    (lambda f: f["commands"] > _MANY_COMMANDS, "review", "medium", 0.6,
+     "Plan has an unusually large number of commands"),
+    (lambda f: True, "dry_run", "low", 0.8,
+     "Low risk plan; dry-run is safe"),
+)
+
+
+class LocalProvider:
+    """
+    Provider offline e deterministico: tabela de regras sobre o plano
+    sanitizado e estatisticas simples das decisoes/metricas recentes.
+    Responde no mesmo formato esperado por _normalize, em microssegundos.
+    """
+
+    provider_name = "local"
+    model_name = "heuristic-v1"
+
+    def __init__(self, risk_threshold: float = DEFAULT_CURUPIRA_RISK_THRESHOLD):
+        self.risk_threshold = risk_threshold
+
+    def recommend(self, plan: dict, context: dict) -> dict | None:
+        features = _features(plan, context, self.risk_threshold)
+
+        for predicate, action, level, confidence, explanation in _RULES:
+            if predicate(features):
+                break
+
+        risk = features["risk"]
+        score = 1.0 if risk is None else max(0.0, min(1.0, risk))
+        # Ambiente instavel (muitos bloqueios/anomalias) puxa o risco para cima
+        score = min(1.0, score + 0.1 * features["block_rate"] + (0.05 if features["anomalies"] else 0.0))
+
+        # Pouco historico recente: menos confiana na leitura do contexto
+        confidence *= 0.75 + 0.25 * min(1.0, features["recent_decisions"] / 3)
+
+        return {
+            "suggested_action": action,
+            "risk_assessment": {"level": level, "score": round(score, 3)},
+            "confidence": round(confidence, 3),
+            "explanation": explanation,
+        }
+
+    async def arecommend(self, plan: dict, context: dict) -> dict | None:
+        return self.recommend(plan, context)
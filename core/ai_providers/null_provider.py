@@ -9,3 +9,6 @@ class NullProvider:
         del plan
         del context
         return None
+
+    async def arecommend(self, plan: dict, context: dict) -> dict | None:
+        return self.recommend(plan, context)
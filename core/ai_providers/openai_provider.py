@@ -1,21 +1,72 @@
 from __future__ import annotations
 
+import asyncio
 import json
-from urllib import request
+
+from core.ai_providers.base import run_in_daemon_thread
+from core.ai_providers.http_pool import HTTPConnectionPool
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+DEFAULT_POOL_SIZE = 2
 
 
 class OpenAIProvider:
     provider_name = "openai"
 
-    def __init__(self, api_key: str, model: str, timeout_seconds: float = 5.0):
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        timeout_seconds: float = 5.0,
+        base_url: str = DEFAULT_BASE_URL,
+        pool_size: int = DEFAULT_POOL_SIZE,
+    ):
         self.api_key = api_key
         self.model_name = model
         self.timeout_seconds = timeout_seconds
+        # Conexoes keep-alive: evita DNS/TCP/TLS a cada recomendaao
+        self._pool = HTTPConnectionPool(base_url, max_idle=pool_size)
+
+    def close(self) -> None:
+        self._pool.close()
 
-    def recommend(self, plan: dict, context: dict) -> dict | None:
+    async def arecommend(self, plan: dict, context: dict) -> dict | None:
+        # O pool e bloqueante e thread-safe: roda fora do event loop, numa
+        # thread que ninguem precisa esperar se a chamada for abandonada
+        return await asyncio.wrap_future(run_in_daemon_thread(self.recommend, plan, context))
+
+    def recommend(self, plan: dict, context: dict, timeout_seconds: float | None = None) -> dict | None:
         if not self.api_key:
             return None
 
+        return self._respond(
+            _SYSTEM_PROMPT,
+            {"plan": plan, "context": context},
+            timeout_seconds,
+        )
+
+    def recommend_batch(
+        self,
+        plans: list[dict],
+        context: dict,
+        timeout_seconds: float | None = None,
+    ) -> list[dict | None]:
+        """Uma requisiao para varios planos; resposta alinhada com `plans`."""
+        if not self.api_key or not plans:
+            return [None] * len(plans)
+
+        data = self._respond(
+            _BATCH_SYSTEM_PROMPT,
+            {"plans": plans, "context": context},
+            timeout_seconds,
+        )
+        items = data.get("recommendations") if data is not None else None
+        if not isinstance(items, list):
+            return [None] * len(plans)
+
+        return _demultiplex(plans, items)
+
+    def _respond(self, system_prompt: str, user_payload: dict, timeout_seconds: float | None) -> dict | None:
         payload = {
             "model": self.model_name,
             "input": [
@@ -24,12 +75,7 @@ class OpenAIProvider:
                     "content": [
                         {
                             "type": "input_text",
-                            "text": (
-                                "You are a consultative safety advisor. "
-                                "Never suggest direct execution commands. "
-                                "Respond only in JSON with keys: suggested_action, "
-                                "risk_assessment, confidence, explanation."
-                            ),
+                            "text": system_prompt,
                         }
                     ],
                 },
@@ -38,25 +84,24 @@ class OpenAIProvider:
                     "content": [
                         {
                             "type": "input_text",
-                            "text": json.dumps({"plan": plan, "context": context}),
+                            "text": json.dumps(user_payload),
                         }
                     ],
                 },
             ],
         }
 
-        req = request.Request(
-            "https://api.openai.com/v1/responses",
-            data=json.dumps(payload).encode("utf-8"),
+        raw = self._pool.request(
+            "POST",
+            "/responses",
+            body=json.dumps(payload).encode("utf-8"),
             headers={
                 "Authorization": f"Bearer {self.api_key}",
                 "Content-Type": "application/json",
             },
-            method="POST",
+            timeout=self.timeout_seconds if timeout_seconds is None else timeout_seconds,
         )
-
-        with request.urlopen(req, timeout=self.timeout_seconds) as response:
-            body = json.loads(response.read().decode("utf-8"))
+        body = json.loads(raw.decode("utf-8"))
 
         for item in body.get("output", []):
             for content in item.get("content", []):
@@ -71,3 +116,39 @@ class OpenAIProvider:
                     return data
 
         return None
+
+
+_SYSTEM_PROMPT = (
+    "You are a consultative safety advisor. "
+    "Never suggest direct execution commands. "
+    "Respond only in JSON with keys: suggested_action, "
+    "risk_assessment, confidence, explanation."
+)
+
+_BATCH_SYSTEM_PROMPT = (
+    "You are a consultative safety advisor. "
+    "Never suggest direct execution commands. "
+    "Evaluate each plan independently. Respond only in JSON with key "
+    "recommendations: a list with one object per plan, in the same order, "
+    "each with keys: plan_id, suggested_action, risk_assessment, "
+    "confidence, explanation."
+)
+
+
+def _demultiplex(plans: list[dict], items: list) -> list[dict | None]:
+    # Por plan_id quando os ids sao unicos; senao pela posiao
+    ids = [plan.get("id") for plan in plans]
+    by_id = {}
+    if None not in ids and len(set(ids)) == len(ids):
+        by_id = {
+            item.get("plan_id"): item
+            for item in items
+            if isinstance(item, dict) and item.get("plan_id") in ids
+        }
+
+    if by_id:
+        return [by_id.get(plan_id) for plan_id in ids]
+
+    if len(items) != len(plans):
+        return [None] * len(plans)
+    return [item if isinstance(item, dict) else None for item in items]
@@ -0,0 +1,290 @@
+import json
+import math
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from core.stats import P2Quantile
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - plataformas sem fcntl
+    fcntl = None
+
+
+ANOMALY_STATE_FILE = Path("data/anomaly_state.json")
+
+DEFAULT_Z_THRESHOLD = 4.5
+DEFAULT_WARMUP_EVENTS = 200
+DEFAULT_COOLDOWN_EVENTS = 200
+# Observaoes entre gravaoes do estado (alem do atexit)
+STATE_SAVE_EVERY_EVENTS = 100
+
+FAST_ALPHA = 0.05     # janela recente (~20 eventos)
+SLOW_ALPHA = 0.002    # baseline (~500 eventos)
+
+_ERROR_EVENTS = {"invalid_plan", "invalid_intent"}
+
+# (nome, variaao minima relevante, acompanha quantil)
+_METRICS = {
+    "block_rate": (0.2, False),
+    "error_rate": (0.2, False),
+    "risk_score": (1.0, True),
+    "latency_ms": (100.0, True),
+}
+
+
+class ShiftMonitor:
+    """
+    Compara uma EWMA rapida (recente) com uma EWMA lenta (baseline).
+
+    O desvio e significativo quando passa de z_threshold desvios-padrao da
+    EWMA rapida sob o baseline (sigma² * a / (2 - a)) e de min_delta.
+    """
+
+    def __init__(self, min_delta: float, track_quantile: bool = False):
+        self.min_delta = min_delta
+        self.count = 0
+        self.recent = 0.0
+        self.baseline = 0.0
+        self.variance = 0.0
+        self.quantile = P2Quantile(0.95) if track_quantile else None
+
+    def to_state(self) -> dict:
+        return {
+            "count": self.count,
+            "recent": self.recent,
+            "baseline": self.baseline,
+            "variance": self.variance,
+            "quantile": self.quantile.to_state() if self.quantile is not None else None,
+        }
+
+    @classmethod
+    def from_state(cls, min_delta: float, track_quantile: bool, state: dict) -> "ShiftMonitor":
+        monitor = cls(min_delta, track_quantile)
+        monitor.count = int(state["count"])
+        monitor.recent = float(state["recent"])
+        monitor.baseline = float(state["baseline"])
+        monitor.variance = float(state["variance"])
+        if track_quantile and state.get("quantile") is not None:
+            monitor.quantile = P2Quantile.from_state(0.95, state["quantile"])
+        return monitor
+
+    def update(self, x: float, z_threshold: float, warmup: int) -> float | None:
+        """Atualiza com x; devolve o z-score se houve desvio significativo."""
+        self.count += 1
+        if self.quantile is not None:
+            self.quantile.update(x)
+
+        if self.count == 1:
+            self.recent = self.baseline = x
+            return None
+
+        # No inicio, media cumulativa: o baseline nao parte de um unico ponto
+        self.recent += max(FAST_ALPHA, 1.0 / self.count) * (x - self.recent)
+
+        z = None
+        if self.count > warmup:
+            delta = self.recent - self.baseline
+            sd = math.sqrt(self.variance * FAST_ALPHA / (2 - FAST_ALPHA))
+            if abs(delta) >= self.min_delta and abs(delta) > z_threshold * sd:
+                z = delta / sd if sd > 0 else math.copysign(math.inf, delta)
+
+        # Baseline depois do teste: a mudana nao se auto-absorve
+        alpha = max(SLOW_ALPHA, 1.0 / self.count)
+        diff = x - self.baseline
+        increment = alpha * diff
+        self.baseline += increment
+        self.variance = (1 - alpha) * (self.variance + diff * increment)
+        return z
+
+
+class AnomalyDetector:
+    """
+    Detector online sobre o fluxo de decisoes.
+
+    Por componente acompanha taxa de bloqueio, taxa de erro, distribuiao
+    de risco e latencia do AI advisor, em memoria constante (EWMA + P²).
+    observe() devolve os eventos "anomaly" a registrar.
+
+    Com state_path, o estado e carregado na criaao e gravado (JSON sob
+    flock) a cada STATE_SAVE_EVERY_EVENTS observaoes e no save(): execuoes
+    curtas de CLI somam observaoes e completam o warmup entre si.
+    """
+
+    def __init__(
+        self,
+        z_threshold: float = DEFAULT_Z_THRESHOLD,
+        warmup: int = DEFAULT_WARMUP_EVENTS,
+        cooldown: int = DEFAULT_COOLDOWN_EVENTS,
+        state_path: Path | None = None,
+    ):
+        self.z_threshold = z_threshold
+        self.warmup = warmup
+        self.cooldown = cooldown
+        self.state_path = state_path
+        self._monitors: dict[tuple[str, str], ShiftMonitor] = {}
+        self._quiet_until: dict[tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self._unsaved = 0
+
+        if state_path is not None and state_path.exists():
+            try:
+                with _state_file_lock(state_path):
+                    self._adopt(_read_state(state_path))
+            except OSError:
+                pass
+
+    def observe(self, event: dict) -> list[dict]:
+        component = event.get("component")
+        if not component or component == "anomaly":
+            return []
+
+        samples = []
+
+        allowed = event.get("allowed")
+        if isinstance(allowed, bool):
+            samples.append(("block_rate", 0.0 if allowed else 1.0))
+
+        risk = event.get("risk_score")
+        if _is_number(risk):
+            samples.append(("risk_score", float(risk)))
+
+        latency = event.get("latency_ms")
+        if _is_number(latency):
+            samples.append(("latency_ms", float(latency)))
+
+        if "event" in event or "status" in event:
+            failed = event.get("status") == "error" or event.get("event") in _ERROR_EVENTS
+            samples.append(("error_rate", 1.0 if failed else 0.0))
+
+        if not samples:
+            return []
+
+        anomalies = []
+        with self._lock:
+            for metric, value in samples:
+                anomaly = self._update(component, metric, value)
+                if anomaly is not None:
+                    anomalies.append(anomaly)
+
+            self._unsaved += 1
+            if self.state_path is not None and self._unsaved >= STATE_SAVE_EVERY_EVENTS:
+                self._save_locked()
+        return anomalies
+
+    def save(self) -> None:
+        with self._lock:
+            self._save_locked()
+
+    def _save_locked(self) -> None:
+        if self.state_path is None or not self._unsaved:
+            return
+        try:
+            with _state_file_lock(self.state_path):
+                # Outro processo pode ter gravado antes: por chave vale o
+                # estado com mais observaoes, adotado tambem em memoria
+                self._adopt(_read_state(self.state_path))
+                records = [
+                    {
+                        "component": component,
+                        "metric": metric,
+                        "quiet_until": self._quiet_until.get((component, metric), 0),
+                        **monitor.to_state(),
+                    }
+                    for (component, metric), monitor in self._monitors.items()
+                ]
+                tmp_path = self.state_path.with_name(f".{self.state_path.name}.{os.getpid()}.tmp")
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(records, f)
+                os.replace(tmp_path, self.state_path)
+            self._unsaved = 0
+        except OSError:
+            pass
+
+    def _adopt(self, records: list[dict]) -> None:
+        for record in records:
+            try:
+                key = (record["component"], record["metric"])
+                min_delta, track_quantile = _METRICS[key[1]]
+                current = self._monitors.get(key)
+                if current is not None and current.count >= record["count"]:
+                    continue
+                self._monitors[key] = ShiftMonitor.from_state(min_delta, track_quantile, record)
+                self._quiet_until[key] = int(record.get("quiet_until", 0))
+            except (KeyError, TypeError, ValueError):
+                # Registro invalido: a chave recomea do zero
+                continue
+
+    def _update(self, component: str, metric: str, value: float) -> dict | None:
+        key = (component, metric)
+        monitor = self._monitors.get(key)
+        if monitor is None:
+            min_delta, track_quantile = _METRICS[metric]
+            monitor = self._monitors[key] = ShiftMonitor(min_delta, track_quantile)
+
+        z = monitor.update(value, self.z_threshold, self.warmup)
+        if z is None or monitor.count < self._quiet_until.get(key, 0):
+            return None
+
+        self._quiet_until[key] = monitor.count + self.cooldown
+
+        anomaly = {
+            "component": "anomaly",
+            "type": "statistical_shift",
+            "source_component": component,
+            "metric": metric,
+            "recent": round(monitor.recent, 4),
+            "baseline": round(monitor.baseline, 4),
+            "z_score": round(z, 2) if math.isfinite(z) else None,
+            "events": monitor.count,
+        }
+        if monitor.quantile is not None:
+            anomaly["p95"] = monitor.quantile.value()
+        return anomaly
+
+
+@contextmanager
+def _state_file_lock(path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_suffix(".lock"), "a+", encoding="utf-8") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _read_state(path: Path) -> list[dict]:
+    try:
+        records = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return []
+    return [record for record in records if isinstance(record, dict)] if isinstance(records, list) else []
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _read_float(name: str, default: float) -> float:
+    raw = (os.getenv(name) or "").strip()
+    if not raw:
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        return default
+
+
+def detector_from_env() -> AnomalyDetector | None:
+    raw = (os.getenv("ANOMALY_DETECTION") or "").strip().lower()
+    if raw in {"0", "false", "no", "off"}:
+        return None
+    return AnomalyDetector(
+        z_threshold=_read_float("ANOMALY_Z_THRESHOLD", DEFAULT_Z_THRESHOLD),
+        state_path=ANOMALY_STATE_FILE,
+    )
@@ -1,9 +1,124 @@
-from core.intent_queue import IntentQueue
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from functools import partial
+
+from core.intent_queue import create_intent_queue, make_lease_owner, read_lease_seconds
 from core.autonomy_supervisor import AutonomySupervisor
-from core.plan_validator import load_plan
+from core.plan_validator import load_plan_with_digest
+from core.decision_cache import get_decision_cache
 from core.curupira_evaluator import CurupiraEvaluator
 from core.observability import log_decision, increment_metric
-from core.ai_advisor import AIAdvisor, build_ai_context
+from core.ai_advisor import AIAdvisor, build_ai_context, build_shared_context
+
+DEFAULT_INTENT_DEADLINE_SECONDS = 5.0
+DEFAULT_AI_ADVISOR_POOL_SIZE = 4
+DEFAULT_AI_BATCH_WINDOW_MS = 20.0
+DEFAULT_DRAIN_SUMMARY_MIN_INTENTS = 10
+
+
+def read_intent_deadline_seconds() -> float:
+    raw = (os.getenv("INTENT_DEADLINE_SECONDS") or "").strip()
+    if not raw:
+        return DEFAULT_INTENT_DEADLINE_SECONDS
+    try:
+        deadline = float(raw)
+    except ValueError:
+        return DEFAULT_INTENT_DEADLINE_SECONDS
+    return max(0.0, deadline)
+
+
+def read_ai_advisor_pool_size(workers: int = 1) -> int:
+    """AI_ADVISOR_POOL_SIZE; sem ela, uma thread por intent worker (minimo 4)."""
+    raw = (os.getenv("AI_ADVISOR_POOL_SIZE") or "").strip()
+    if raw:
+        try:
+            return max(1, int(raw))
+        except ValueError:
+            pass
+    return max(DEFAULT_AI_ADVISOR_POOL_SIZE, workers)
+
+
+def read_drain_summary_min_intents() -> int:
+    raw = (os.getenv("DRAIN_SUMMARY_MIN_INTENTS") or "").strip()
+    if not raw:
+        return DEFAULT_DRAIN_SUMMARY_MIN_INTENTS
+    try:
+        return max(0, int(raw))
+    except ValueError:
+        return DEFAULT_DRAIN_SUMMARY_MIN_INTENTS
+
+
+def read_ai_batch_window_seconds() -> float:
+    raw = (os.getenv("AI_BATCH_WINDOW_MS") or "").strip()
+    if not raw:
+        return DEFAULT_AI_BATCH_WINDOW_MS / 1000.0
+    try:
+        window_ms = float(raw)
+    except ValueError:
+        return DEFAULT_AI_BATCH_WINDOW_MS / 1000.0
+    return max(0.0, window_ms) / 1000.0
+
+
+class _AdviceBatcher:
+    """
+    Junta os pedidos de recomendaao de workers concorrentes num unico
+    analyze_batch: dispara ao juntar max_plans pedidos ou ao fim da janela.
+
+    O pool vem de `get_pool` a cada lote: o dono pode troca-lo (ou fecha-lo)
+    sem deixar o batcher preso a um pool antigo.
+    """
+
+    def __init__(self, advisor: AIAdvisor, get_pool, window: float, max_plans: int):
+        self.advisor = advisor
+        self.get_pool = get_pool
+        self.window = window
+        self.max_plans = max_plans
+        self._pending: list[tuple[dict, Future]] = []
+        self._lock = threading.Lock()
+
+    def submit(self, plan: dict) -> Future:
+        future = Future()
+        items = None
+
+        with self._lock:
+            self._pending.append((plan, future))
+            if len(self._pending) >= self.max_plans:
+                items = self._take()
+            elif len(self._pending) == 1:
+                timer = threading.Timer(self.window, self._flush)
+                timer.daemon = True
+                timer.start()
+
+        if items:
+            self.get_pool().submit(self._run, items)
+        return future
+
+    def _flush(self) -> None:
+        with self._lock:
+            items = self._take()
+        if items:
+            self.get_pool().submit(self._run, items)
+
+    def _take(self) -> list:
+        items = self._pending
+        self._pending = []
+        return items
+
+    def _run(self, items: list) -> None:
+        try:
+            results = self.advisor.analyze_batch(
+                [plan for plan, _ in items],
+                build_shared_context({"entrypoint": "autonomy_reactive"}),
+            )
+        except Exception:
+            results = [None] * len(items)
+
+        for (_, future), result in zip(items, results):
+            future.set_result(result)
+
 
 def detect_anomaly(plan: dict, decisions: list[dict]) -> bool:
     try:
@@ -20,11 +135,15 @@ def detect_anomaly(plan: dict, decisions: list[dict]) -> bool:
 
 class ReactiveAutonomy:
     def __init__(self, config):
-        self.queue = IntentQueue()
+        self.queue = create_intent_queue(config)
+        decision_cache = get_decision_cache()
+        self.lease_owner = make_lease_owner()
+        self.lease_seconds = read_lease_seconds()
 
         self.supervisor = (
             AutonomySupervisor(
-                risk_threshold=config.curupira_risk_threshold
+                risk_threshold=config.curupira_risk_threshold,
+                cache=decision_cache,
             )
             if config.supervisor_enabled
             else None
@@ -32,21 +151,30 @@ class ReactiveAutonomy:
 
         self.curupira = (
             CurupiraEvaluator(
-                threshold=config.curupira_risk_threshold
+                threshold=config.curupira_risk_threshold,
+                cache=decision_cache,
             )
             if config.curupira_enabled
             else None
         )
 
         self.ai_advisor = AIAdvisor.from_config(config)
+        self.intent_deadline_seconds = read_intent_deadline_seconds()
+        self._advice_pool: ThreadPoolExecutor | None = None
+        self._advice_pool_size = 0
+        self._advice_workers = 1
+        self._advice_pool_lock = threading.Lock()
+        self._advice_batcher: _AdviceBatcher | None = None
 
     def process_next_intent(self):
-        intents = self.queue.load()
-
-        # Selecionar maior prioridade pendente
-        pending = [i for i in intents if i.get("status") == "pending"]
+        # Maior prioridade pendente (FIFO no empate), ja marcada "processing"
+        # e com lease deste consumidor
+        intent = self.queue.dequeue(
+            lease_owner=self.lease_owner,
+            lease_seconds=self.lease_seconds,
+        )
 
-        if not pending:
+        if intent is None:
             increment_metric("reactive_empty")
             log_decision({
                 "component": "reactive",
@@ -54,16 +182,11 @@ class ReactiveAutonomy:
             })
             return {"status": "empty"}
 
-        # Ordenado ja na enqueue, pegar primeiro
-        intent = pending[0]
-        intent["status"] = "processing"
-        self.queue.save(intents)
-
         plan_path = intent.get("plan_path")
 
         if not plan_path:
-            intent["status"] = "error"
-            self.queue.save(intents)
+            if not self._finish(intent, "error"):
+                return self._lease_lost(intent)
 
             increment_metric("reactive_invalid_intent")
             log_decision({
@@ -75,28 +198,18 @@ class ReactiveAutonomy:
 
             return {"status": "invalid_intent"}
 
+        started = time.monotonic()
+
         try:
-            plan = load_plan(plan_path)
+            # Digest do conteudo: planos repetidos reaproveitam as decisoes
+            plan, plan_sha256 = load_plan_with_digest(plan_path)
             increment_metric("intents_processed")
 
             decisions_log = []
 
-            # AI consultiva (não altera decisão oficial)
-            self.ai_advisor.analyze(
-                plan,
-                build_ai_context(
-                    plan,
-                    {
-                        "entrypoint": "autonomy_reactive",
-                        "intent_id": intent.get("intent_id"),
-                        "plan_path": plan_path,
-                    },
-                ),
-            )
-
         except Exception as e:
-            intent["status"] = "error"
-            self.queue.save(intents)
+            if not self._finish(intent, "error"):
+                return self._lease_lost(intent)
 
             increment_metric("reactive_invalid_plan")
             log_decision({
@@ -112,11 +225,15 @@ class ReactiveAutonomy:
                 "reason": f"Invalid plan: {e}"
             }
 
+        # AI consultiva (não altera decisão oficial): roda em paralelo aos
+        # avaliadores deterministicos e e coletada ate o prazo da intent
+        advice = self._submit_advice(plan, intent, plan_path)
+
         # Supervisor (se habilitado)
         supervisor_decision = None
 
         if self.supervisor:
-            supervisor_decision = self.supervisor.evaluate(plan)
+            supervisor_decision = self.supervisor.evaluate(plan, plan_sha256)
 
             decisions_log.append({
                 "component": "supervisor",
@@ -124,8 +241,8 @@ class ReactiveAutonomy:
             })
 
         if supervisor_decision and not supervisor_decision.allowed:
-            intent["status"] = "blocked"
-            self.queue.save(intents)
+            if not self._finish(intent, "blocked"):
+                return self._lease_lost(intent)
 
             increment_metric("intents_blocked")
             increment_metric("reactive_blocked")
@@ -137,6 +254,7 @@ class ReactiveAutonomy:
                 "risk_score": plan.get("risk_score"),
                 "allowed": False,
                 "reason": f"Supervisor: {supervisor_decision.reason}",
+                **self._collect_advice(advice, started, intent, plan),
             })
 
             if detect_anomaly(plan, decisions_log):
@@ -156,7 +274,7 @@ class ReactiveAutonomy:
         curupira_decision = None
 
         if self.curupira:
-            curupira_decision = self.curupira.evaluate(plan)
+            curupira_decision = self.curupira.evaluate(plan, plan_sha256)
 
             decisions_log.append({
                 "component": "curupira",
@@ -164,8 +282,8 @@ class ReactiveAutonomy:
             })
 
         if curupira_decision and not curupira_decision.allowed:
-            intent["status"] = "blocked"
-            self.queue.save(intents)
+            if not self._finish(intent, "blocked"):
+                return self._lease_lost(intent)
 
             increment_metric("intents_blocked")
             increment_metric("reactive_blocked")
@@ -177,6 +295,7 @@ class ReactiveAutonomy:
                 "risk_score": plan.get("risk_score"),
                 "allowed": False,
                 "reason": f"Curupira: {curupira_decision.reason}",
+                **self._collect_advice(advice, started, intent, plan),
             })
 
             if detect_anomaly(plan, decisions_log):
@@ -193,8 +312,8 @@ class ReactiveAutonomy:
             }
 
         # Se chegou aqui, passou nas duas camadas
-        intent["status"] = "approved_for_dry_run"
-        self.queue.save(intents)
+        if not self._finish(intent, "approved_for_dry_run"):
+            return self._lease_lost(intent)
 
         increment_metric("intents_dry_run")
         increment_metric("reactive_approved")
@@ -206,6 +325,7 @@ class ReactiveAutonomy:
             "risk_score": plan.get("risk_score"),
             "allowed": True,
             "reason": "Approved for dry-run",
+            **self._collect_advice(advice, started, intent, plan),
         })
 
         if detect_anomaly(plan, decisions_log):
@@ -220,3 +340,201 @@ class ReactiveAutonomy:
             "status": "ready_for_dry_run",
             "plan_path": plan_path,
         }
+
+    def drain(
+        self,
+        max_intents: int | None = None,
+        deadline_seconds: float | None = None,
+        workers: int = 1,
+        on_ready=None,
+        should_continue=None,
+        summary_min_intents: int = 0,
+    ) -> dict:
+        """
+        Processa intents ate a fila esvaziar, atingir max_intents ou o prazo.
+
+        `workers` threads consomem a fila em paralelo (cada claim tem lease);
+        on_ready(result) recebe as intents aprovadas (ex.: DRY-RUN) e pode
+        devolver um novo status para a contagem. should_continue() permite
+        parar por sinal sem interromper uma intent em andamento. O registro
+        drain_summary so e gravado a partir de summary_min_intents intents.
+        """
+        started = time.monotonic()
+        deadline = started + deadline_seconds if deadline_seconds else None
+
+        lock = threading.Lock()
+        counts = Counter()
+        claimed = 0
+        stop = threading.Event()
+
+        def _reserve() -> bool:
+            nonlocal claimed
+            with lock:
+                if stop.is_set():
+                    return False
+                if should_continue is not None and not should_continue():
+                    return False
+                if deadline is not None and time.monotonic() >= deadline:
+                    return False
+                if max_intents is not None and claimed >= max_intents:
+                    return False
+                claimed += 1
+                return True
+
+        def _worker() -> None:
+            while _reserve():
+                result = self.process_next_intent()
+                status = result["status"]
+
+                if status == "empty":
+                    stop.set()
+                    return
+
+                if status == "ready_for_dry_run" and on_ready is not None:
+                    status = on_ready(result) or status
+
+                with lock:
+                    counts[status] += 1
+
+        self._advice_workers = max(1, workers)
+        # Com varios workers, as recomendaoes em voo viram um unico lote
+        self._advice_batcher = self._make_advice_batcher(workers)
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="intent-worker") as pool:
+                for future in [pool.submit(_worker) for _ in range(max(1, workers))]:
+                    future.result()
+        finally:
+            self._advice_batcher = None
+
+        elapsed = time.monotonic() - started
+        processed = sum(counts.values())
+
+        summary = {
+            "processed": processed,
+            "statuses": dict(counts),
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput_per_second": round(processed / elapsed, 3) if elapsed > 0 else 0.0,
+            "queue_empty": stop.is_set(),
+        }
+
+        if processed >= summary_min_intents:
+            log_decision({
+                "component": "reactive",
+                "event": "drain_summary",
+                **summary,
+            })
+        return summary
+
+    def _submit_advice(self, plan: dict, intent: dict, plan_path: str):
+        advisor = self.ai_advisor
+        if advisor is None or advisor.provider.provider_name == "none":
+            return None
+
+        batcher = self._advice_batcher
+        if batcher is not None:
+            return batcher.submit(plan)
+
+        context_extra = {
+            "entrypoint": "autonomy_reactive",
+            "intent_id": intent.get("intent_id"),
+            "plan_path": plan_path,
+        }
+
+        return self._get_advice_pool().submit(
+            lambda: advisor.analyze(plan, build_ai_context(plan, context_extra))
+        )
+
+    def _get_advice_pool(self) -> ThreadPoolExecutor:
+        size = read_ai_advisor_pool_size(self._advice_workers)
+        with self._advice_pool_lock:
+            if self._advice_pool is None or size > self._advice_pool_size:
+                # Mais intent workers que threads de advice: recomendaoes
+                # enfileiradas estourariam o prazo de cada intent
+                previous = self._advice_pool
+                self._advice_pool = ThreadPoolExecutor(
+                    max_workers=size,
+                    thread_name_prefix="ai-advisor",
+                )
+                self._advice_pool_size = size
+                if previous is not None:
+                    previous.shutdown(wait=False)
+            return self._advice_pool
+
+    def close(self) -> None:
+        """
+        Encerra o pool de recomendaoes sem esperar chamadas em voo.
+
+        Pedidos ainda na fila sao cancelados; o proximo uso recria o pool.
+        """
+        with self._advice_pool_lock:
+            pool = self._advice_pool
+            self._advice_pool = None
+            self._advice_pool_size = 0
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _make_advice_batcher(self, workers: int) -> _AdviceBatcher | None:
+        advisor = self.ai_advisor
+        window = read_ai_batch_window_seconds()
+        if (
+            workers <= 1
+            or window <= 0
+            or advisor is None
+            or not hasattr(advisor.provider, "recommend_batch")
+        ):
+            return None
+        return _AdviceBatcher(advisor, self._get_advice_pool, window, max_plans=workers)
+
+    def _collect_advice(self, future, started: float, intent: dict, plan: dict) -> dict:
+        """Campos ai_* do registro de decisao, esperando no maximo ate o prazo."""
+        if future is None:
+            return {}
+
+        remaining = self.intent_deadline_seconds - (time.monotonic() - started)
+
+        try:
+            recommendation = future.result(timeout=max(0.0, remaining))
+        except FutureTimeout:
+            increment_metric("reactive_ai_late")
+            future.add_done_callback(partial(self._log_late_advice, intent, plan, started))
+            return {"ai_status": "late"}
+        except Exception:
+            recommendation = None
+
+        if recommendation is None:
+            increment_metric("reactive_ai_absent")
+            return {"ai_status": "absent"}
+
+        return {"ai_status": "ok", "ai_recommendation": recommendation}
+
+    def _log_late_advice(self, intent: dict, plan: dict, started: float, future) -> None:
+        try:
+            recommendation = future.result()
+        except Exception:
+            recommendation = None
+
+        log_decision({
+            "component": "reactive",
+            "event": "ai_advice_late",
+            "intent_id": intent["id"],
+            "plan_id": plan.get("id"),
+            "ai_status": "ok" if recommendation is not None else "absent",
+            "ai_recommendation": recommendation,
+            "latency_ms": int((time.monotonic() - started) * 1000),
+        })
+
+    def _finish(self, intent: dict, status: str) -> bool:
+        return self.queue.finish(intent["id"], self.lease_owner, status=status)
+
+    def _lease_lost(self, intent: dict) -> dict:
+        # Lease venceu durante o processamento: a intent ja voltou para a fila
+        # (ou foi reivindicada por outro consumidor) e este resultado e descartado
+        increment_metric("reactive_lease_lost")
+        log_decision({
+            "component": "reactive",
+            "event": "lease_lost",
+            "intent_id": intent["id"],
+            "plan_path": intent.get("plan_path"),
+            "lease_owner": self.lease_owner,
+        })
+        return {"status": "lease_lost"}
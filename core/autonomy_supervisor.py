@@ -1,5 +1,13 @@
-from dataclasses import dataclass
-from core.observability import log_decision, increment_metric
+from dataclasses import asdict, dataclass
+from core.decision_cache import DecisionCache, decision_cache_key
+from core.observability import log_decision, log_decisions, increment_metric
+from core.risk_batch import (
+    RISK_ABOVE_THRESHOLD,
+    RISK_ALLOWED,
+    RISK_INVALID,
+    RISK_MISSING,
+    classify_risk,
+)
 
 @dataclass
 class AutonomyDecision:
@@ -8,11 +16,77 @@ class AutonomyDecision:
     max_mode: str  # "none", "dry-run"
 
 
+_BATCH_OUTCOMES = {
+    RISK_MISSING: (False, "Missing risk_score field", "none"),
+    RISK_INVALID: (False, "Invalid risk_score format", "none"),
+    RISK_ABOVE_THRESHOLD: (False, "Risk above autonomy threshold", "none"),
+    RISK_ALLOWED: (True, "Risk within autonomy threshold", "dry-run"),
+}
+
+
 class AutonomySupervisor:
-    def __init__(self, risk_threshold: float):
+    # Incrementar ao mudar a logica de avaliaao (invalida o cache)
+    VERSION = "1"
+
+    def __init__(self, risk_threshold: float, cache: DecisionCache | None = None):
         self.risk_threshold = risk_threshold
+        self.cache = cache
+
+    def evaluate(self, plan: dict, plan_sha256: str | None = None) -> AutonomyDecision:
+        key = None
+        if self.cache is not None and plan_sha256 is not None:
+            key = decision_cache_key(plan_sha256, "supervisor", self.risk_threshold, self.VERSION)
+            cached = self.cache.get(key)
+            if cached is not None:
+                decision = AutonomyDecision(**cached)
+                increment_metric("supervisor_allowed" if decision.allowed else "supervisor_blocked")
+                log_decision({
+                    "component": "supervisor",
+                    "plan_id": plan.get("id"),
+                    "risk_score": plan.get("risk_score"),
+                    "allowed": decision.allowed,
+                    "reason": decision.reason,
+                    "cached": True,
+                })
+                return decision
+
+        decision = self._evaluate(plan)
+        if key is not None:
+            self.cache.put(key, asdict(decision))
+        return decision
+
+    def evaluate_batch(self, plans: list[dict]) -> list[AutonomyDecision]:
+        """
+        Avalia varios planos de uma vez (mesmas regras de evaluate).
+
+        O threshold e aplicado de forma vetorizada (NumPy quando disponivel)
+        e os registros saem numa unica escrita no log de decisoes.
+        """
+        decisions = []
+        events = []
+        allowed_count = 0
+
+        for plan, code in zip(plans, classify_risk(plans, self.risk_threshold)):
+            allowed, reason, max_mode = _BATCH_OUTCOMES[code]
+            decisions.append(AutonomyDecision(allowed=allowed, reason=reason, max_mode=max_mode))
+            allowed_count += int(allowed)
+            events.append({
+                "component": "supervisor",
+                "plan_id": plan.get("id"),
+                "risk_score": plan.get("risk_score"),
+                "allowed": allowed,
+                "reason": reason,
+            })
+
+        log_decisions(events)
+        if allowed_count:
+            increment_metric("supervisor_allowed", allowed_count)
+        if len(decisions) - allowed_count:
+            increment_metric("supervisor_blocked", len(decisions) - allowed_count)
+
+        return decisions
 
-    def evaluate(self, plan: dict) -> AutonomyDecision:
+    def _evaluate(self, plan: dict) -> AutonomyDecision:
         if "risk_score" not in plan:
             decision = AutonomyDecision(
                 allowed=False,
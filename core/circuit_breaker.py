@@ -0,0 +1,177 @@
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - plataformas sem fcntl
+    fcntl = None
+
+
+CIRCUIT_STATE_FILE = Path("data/ai_circuit_state.json")
+
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_OPEN_SECONDS = 30.0
+LATENCY_WINDOW = 50
+MIN_LATENCY_SAMPLES = 10
+# Timeout adaptativo = p99 das latencias recentes * folga
+TIMEOUT_PERCENTILE = 0.99
+TIMEOUT_HEADROOM = 2.0
+MIN_TIMEOUT_SECONDS = 0.5
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_LOCK = threading.Lock()
+
+
+def _read_positive(name: str, default: float) -> float:
+    raw = (os.getenv(name) or "").strip()
+    if not raw:
+        return default
+    try:
+        value = float(raw)
+    except ValueError:
+        return default
+    return value if value > 0 else default
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker do AI advisor, com estado compartilhado entre processos.
+
+    closed -> open apos failure_threshold falhas seguidas (erro ou timeout);
+    open rejeita chamadas ate open_seconds, depois libera uma unica sonda
+    (half_open). Sucesso da sonda fecha o circuito; falha reabre.
+
+    Tambem guarda as latencias recentes de sucesso, de onde sai o timeout
+    adaptativo.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        path: Path | None = None,
+        failure_threshold: int | None = None,
+        open_seconds: float | None = None,
+    ):
+        self.key = key
+        self.path = path or CIRCUIT_STATE_FILE
+        self.failure_threshold = int(
+            failure_threshold
+            if failure_threshold is not None
+            else _read_positive("AI_CIRCUIT_FAILURES", DEFAULT_FAILURE_THRESHOLD)
+        )
+        self.open_seconds = (
+            open_seconds
+            if open_seconds is not None
+            else _read_positive("AI_CIRCUIT_OPEN_SECONDS", DEFAULT_OPEN_SECONDS)
+        )
+
+    def allow(self) -> bool:
+        """True se a chamada pode seguir (inclusive como sonda)."""
+        with self._state() as state:
+            now = time.time()
+
+            if state["state"] == CLOSED:
+                return True
+
+            if state["state"] == OPEN and now - state["opened_at"] < self.open_seconds:
+                return False
+
+            # Uma sonda por vez; sonda abandonada (processo morto) expira
+            if state["state"] == HALF_OPEN and now - state["probe_started_at"] < self.open_seconds:
+                return False
+
+            state["state"] = HALF_OPEN
+            state["probe_started_at"] = now
+            return True
+
+    def record_success(self, latency_seconds: float | None = None) -> None:
+        with self._state() as state:
+            state["state"] = CLOSED
+            state["failures"] = 0
+            if latency_seconds is not None:
+                state["latencies"] = (state["latencies"] + [round(latency_seconds, 4)])[-LATENCY_WINDOW:]
+
+    def record_failure(self) -> None:
+        with self._state() as state:
+            state["failures"] += 1
+            if state["state"] == HALF_OPEN or state["failures"] >= self.failure_threshold:
+                state["state"] = OPEN
+                state["opened_at"] = time.time()
+
+    def timeout(self, maximum: float) -> float:
+        """Timeout para a proxima chamada, nunca acima de maximum."""
+        with self._state() as state:
+            latencies = sorted(state["latencies"])
+            degraded = state["state"] != CLOSED or state["failures"] > 0
+
+        # Depois de uma falha (ou na sonda) usa o timeout cheio: um provider
+        # mais lento, mas saudavel, volta a alimentar a janela
+        if degraded or len(latencies) < MIN_LATENCY_SAMPLES:
+            return maximum
+
+        index = min(len(latencies) - 1, math.ceil(TIMEOUT_PERCENTILE * len(latencies)) - 1)
+        adaptive = latencies[index] * TIMEOUT_HEADROOM
+        return max(min(MIN_TIMEOUT_SECONDS, maximum), min(maximum, adaptive))
+
+    def snapshot(self) -> dict:
+        with self._state() as state:
+            return dict(state)
+
+    @contextmanager
+    def _state(self):
+        # Leitura-modificaao-escrita sob lock: CLIs concorrentes
+        # compartilham o mesmo estado
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        with _STATE_LOCK, open(self.path.with_suffix(".lock"), "a+", encoding="utf-8") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                states = _load_states(self.path)
+                state = {**_initial_state(), **states.get(self.key, {})}
+                before = dict(state)
+
+                yield state
+
+                if state != before:
+                    states[self.key] = state
+                    _save_states(self.path, states)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _initial_state() -> dict:
+    return {
+        "state": CLOSED,
+        "failures": 0,
+        "opened_at": 0.0,
+        "probe_started_at": 0.0,
+        "latencies": [],
+    }
+
+
+def _load_states(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        # Fail-safe: estado corrompido volta a closed
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _save_states(path: Path, states: dict) -> None:
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(states, f)
+    os.replace(tmp_path, path)
@@ -1,5 +1,13 @@
-from dataclasses import dataclass
-from core.observability import log_decision, increment_metric
+from dataclasses import asdict, dataclass
+from core.decision_cache import DecisionCache, decision_cache_key
+from core.observability import log_decision, log_decisions, increment_metric
+from core.risk_batch import (
+    RISK_ABOVE_THRESHOLD,
+    RISK_ALLOWED,
+    RISK_INVALID,
+    RISK_MISSING,
+    classify_risk,
+)
 
 
 @dataclass
@@ -8,16 +16,77 @@ class CurupiraDecision:
     reason: str
 
 
+_BATCH_OUTCOMES = {
+    RISK_MISSING: (False, "Missing risk_score field"),
+    RISK_INVALID: (False, "Invalid risk score format"),
+    RISK_ABOVE_THRESHOLD: (False, "Curupira flagged elevated risk"),
+    RISK_ALLOWED: (True, "Curupira cleared plan"),
+}
+
+
 class CurupiraEvaluator:
     """
     Segunda camada de avaliaao de risco.
     Atua como avaliador independente.
     """
 
-    def __init__(self, threshold: float):
+    # Incrementar ao mudar a logica de avaliaao (invalida o cache)
+    VERSION = "1"
+
+    def __init__(self, threshold: float, cache: DecisionCache | None = None):
         self.threshold = threshold
+        self.cache = cache
+
+    def evaluate(self, plan: dict, plan_sha256: str | None = None) -> CurupiraDecision:
+        key = None
+        if self.cache is not None and plan_sha256 is not None:
+            key = decision_cache_key(plan_sha256, "curupira", self.threshold, self.VERSION)
+            cached = self.cache.get(key)
+            if cached is not None:
+                decision = CurupiraDecision(**cached)
+                increment_metric("curupira_allowed" if decision.allowed else "curupira_blocked")
+                log_decision({
+                    "component": "curupira",
+                    "plan_id": plan.get("id"),
+                    "risk_score": plan.get("risk_score"),
+                    "allowed": decision.allowed,
+                    "reason": decision.reason,
+                    "cached": True,
+                })
+                return decision
+
+        decision = self._evaluate(plan)
+        if key is not None:
+            self.cache.put(key, asdict(decision))
+        return decision
+
+    def evaluate_batch(self, plans: list[dict]) -> list[CurupiraDecision]:
+        """Versao em lote de evaluate: threshold ajustado (x0.8) vetorizado, log em uma escrita."""
+        decisions = []
+        events = []
+        allowed_count = 0
+
+        for plan, code in zip(plans, classify_risk(plans, self.threshold * 0.8)):
+            allowed, reason = _BATCH_OUTCOMES[code]
+            decisions.append(CurupiraDecision(allowed=allowed, reason=reason))
+            allowed_count += int(allowed)
+            events.append({
+                "component": "curupira",
+                "plan_id": plan.get("id"),
+                "risk_score": plan.get("risk_score"),
+                "allowed": allowed,
+                "reason": reason,
+            })
+
+        log_decisions(events)
+        if allowed_count:
+            increment_metric("curupira_allowed", allowed_count)
+        if len(decisions) - allowed_count:
+            increment_metric("curupira_blocked", len(decisions) - allowed_count)
+
+        return decisions
 
-    def evaluate(self, plan: dict) -> CurupiraDecision:
+    def _evaluate(self, plan: dict) -> CurupiraDecision:
         if "risk_score" not in plan:
             decision = CurupiraDecision(
                 allowed=False,
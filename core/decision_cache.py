@@ -0,0 +1,222 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from core.observability import increment_metric
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - plataformas sem fcntl
+    fcntl = None
+
+
+DECISION_CACHE_FILE = Path("data/decision_cache.json")
+DEFAULT_DECISION_CACHE_SIZE = 1024
+DEFAULT_DECISION_CACHE_FLUSH_SECONDS = 5.0
+
+
+def read_decision_cache_size() -> int:
+    raw = (os.getenv("DECISION_CACHE_SIZE") or "").strip()
+    if not raw:
+        return DEFAULT_DECISION_CACHE_SIZE
+    try:
+        return max(0, int(raw))
+    except ValueError:
+        return DEFAULT_DECISION_CACHE_SIZE
+
+
+def read_decision_cache_flush_seconds() -> float:
+    raw = (os.getenv("DECISION_CACHE_FLUSH_SECONDS") or "").strip()
+    if not raw:
+        return DEFAULT_DECISION_CACHE_FLUSH_SECONDS
+    try:
+        return max(0.0, float(raw))
+    except ValueError:
+        return DEFAULT_DECISION_CACHE_FLUSH_SECONDS
+
+
+def decision_cache_key(plan_sha256: str, evaluator: str, threshold: float, version: str) -> str:
+    # threshold/versao fazem parte da chave: mudar a config invalida as
+    # entradas antigas, que saem pelo LRU
+    return f"{plan_sha256}:{evaluator}:{threshold!r}:{version}"
+
+
+class DecisionCache:
+    """
+    Cache LRU de decisoes dos avaliadores deterministicos.
+
+    Persistido em DECISION_CACHE_FILE no maximo a cada flush_interval
+    segundos (DECISION_CACHE_FLUSH_SECONDS) e no close/atexit. O flush
+    mescla sob flock com o que outros processos gravaram, em vez de
+    sobrescrever o arquivo com a visao deste processo.
+
+    So put marca o cache como alterado: a reordenaao LRU de um get vai
+    para o disco junto com o proximo flush, sem provocar um. A gravaao
+    roda fora de self._lock, com uma copia das entradas.
+    """
+
+    metric_prefix = "decision_cache"
+
+    def __init__(
+        self,
+        path: Path | None = None,
+        max_entries: int | None = None,
+        flush_interval: float | None = None,
+    ):
+        self.path = path or DECISION_CACHE_FILE
+        self.max_entries = read_decision_cache_size() if max_entries is None else max_entries
+        self.flush_interval = (
+            read_decision_cache_flush_seconds() if flush_interval is None else flush_interval
+        )
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        # Serializa gravaoes deste processo (o flock cobre os demais)
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        self._load()
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None and not self._is_fresh(value):
+                # Entradas vencidas no disco sao descartadas no merge
+                del self._entries[key]
+                value = None
+            elif value is not None:
+                self._entries.move_to_end(key)
+
+        increment_metric(f"{self.metric_prefix}_{'hit' if value is not None else 'miss'}")
+        return dict(value) if value is not None else None
+
+    def put(self, key: str, value: dict) -> None:
+        if self.max_entries <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = dict(value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+
+        if due:
+            # Quem chega com outra gravaao em andamento nao espera por ela
+            self._save(wait=False)
+
+    def _is_fresh(self, value: dict) -> bool:
+        # Decisoes deterministicas nao expiram
+        return True
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def flush(self) -> None:
+        self._save()
+
+    def close(self) -> None:
+        self.flush()
+
+    def _load(self) -> None:
+        if self.max_entries <= 0:
+            return
+        for key, value in _read_items(self.path)[-self.max_entries:]:
+            self._entries[key] = value
+
+    def _save(self, wait: bool = True) -> None:
+        # Chamar sem self._lock
+        if not self._save_lock.acquire(blocking=wait):
+            return
+        try:
+            with self._lock:
+                if not self._dirty:
+                    return
+                snapshot = OrderedDict(self._entries)
+                self._dirty = False
+                self._last_flush = time.monotonic()
+
+            try:
+                merged = self._write_merged(snapshot)
+            except OSError:
+                with self._lock:
+                    self._dirty = True
+                return
+
+            with self._lock:
+                # Puts feitos durante a gravaao ficam por cima do merge
+                for key, value in self._entries.items():
+                    if snapshot.get(key) is not value:
+                        merged.pop(key, None)
+                        merged[key] = value
+                while len(merged) > self.max_entries:
+                    merged.popitem(last=False)
+                self._entries = merged
+        finally:
+            self._save_lock.release()
+
+    def _write_merged(self, entries: OrderedDict) -> OrderedDict:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_suffix(".lock"), "a+", encoding="utf-8") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                merged = self._merged(_read_items(self.path), entries)
+                tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(list(merged.items()), f)
+                os.replace(tmp_path, self.path)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+        return merged
+
+    def _merged(self, on_disk: list[tuple[str, dict]], entries: OrderedDict) -> OrderedDict:
+        # Entradas de outros processos ficam como as menos recentes; as
+        # deste processo mantem a ordem LRU local por cima delas
+        merged = OrderedDict((key, value) for key, value in on_disk if self._is_fresh(value))
+        for key, value in entries.items():
+            merged.pop(key, None)
+            merged[key] = value
+        while len(merged) > self.max_entries:
+            merged.popitem(last=False)
+        return merged
+
+
+def _read_items(path: Path) -> list[tuple[str, dict]]:
+    """Pares (chave, valor) do arquivo; formato inesperado conta como vazio."""
+    if not path.exists():
+        return []
+    try:
+        items = json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        # Fail-safe: cache corrompido e descartado
+        return []
+    if not isinstance(items, list):
+        return []
+    return [
+        (item[0], item[1])
+        for item in items
+        if isinstance(item, list) and len(item) == 2 and isinstance(item[0], str) and isinstance(item[1], dict)
+    ]
+
+
+_DECISION_CACHE: DecisionCache | None = None
+_DECISION_CACHE_LOCK = threading.Lock()
+
+
+def get_decision_cache() -> DecisionCache:
+    global _DECISION_CACHE
+
+    if _DECISION_CACHE is None:
+        with _DECISION_CACHE_LOCK:
+            if _DECISION_CACHE is None:
+                _DECISION_CACHE = DecisionCache()
+                atexit.register(_DECISION_CACHE.close)
+
+    return _DECISION_CACHE
@@ -0,0 +1,251 @@
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+
+BACKPRESSURE_BLOCK = "block"
+BACKPRESSURE_DROP_OLDEST = "drop_oldest"
+BACKPRESSURE_SPILL = "spill"
+
+_BACKPRESSURE_MODES = {BACKPRESSURE_BLOCK, BACKPRESSURE_DROP_OLDEST, BACKPRESSURE_SPILL}
+
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_FLUSH_TIMEOUT_SECONDS = 2.0
+_WRITE_RETRIES = 3
+
+
+class DecisionLogWriter:
+    """
+    Sink assincrono para o log de decisoes.
+
+    As linhas entram numa fila limitada em memoria e uma thread escritora
+    grava cada lote com um unico write (e fsync opcional). Quando a fila
+    enche, o comportamento segue `backpressure`:
+
+    - block: quem loga espera espaco na fila;
+    - drop_oldest: descarta a linha mais antiga ainda nao gravada;
+    - spill: grava a linha direto num arquivo de transbordo, que a thread
+      escritora anexa ao log principal quando a fila esvazia.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_queue: int = DEFAULT_QUEUE_SIZE,
+        backpressure: str = BACKPRESSURE_BLOCK,
+        fsync: bool = False,
+    ):
+        if backpressure not in _BACKPRESSURE_MODES:
+            raise ValueError(f"Unsupported decision log backpressure: {backpressure}")
+
+        self.path = path
+        self.spill_path = f"{path}.spill"
+        self.max_queue = max(1, max_queue)
+        self.backpressure = backpressure
+        self.fsync = fsync
+
+        self.dropped = 0
+        self.failed = 0
+
+        self._buffer: deque = deque()
+        # Lote retirado da fila e ainda em gravaao pela thread escritora
+        self._inflight: list = []
+        self._cond = threading.Condition()
+        self._spill_lock = threading.Lock()
+        self._spill_pending = False
+        self._closing = False
+        self._thread: threading.Thread | None = None
+
+        # Contadores monotonicos; _done so e alterado pela thread escritora,
+        # o que permite flush sem locks.
+        self._accepted = 0
+        self._done = 0
+
+    def write(self, line: str) -> None:
+        if not line.endswith("\n"):
+            line += "\n"
+
+        if self._thread is None:
+            self._start()
+
+        with self._cond:
+            if self._closing:
+                self._write_direct(line)
+                return
+
+            if len(self._buffer) >= self.max_queue:
+                if self.backpressure == BACKPRESSURE_SPILL:
+                    self._spill(line)
+                    self._cond.notify_all()
+                    return
+
+                if self.backpressure == BACKPRESSURE_DROP_OLDEST:
+                    self._buffer.popleft()
+                    self.dropped += 1
+                else:
+                    while len(self._buffer) >= self.max_queue and not self._closing:
+                        self._cond.wait(0.5)
+
+                    if self._closing:
+                        self._write_direct(line)
+                        return
+
+            self._buffer.append(line)
+            self._accepted += 1
+            self._cond.notify_all()
+
+    def flush(self, timeout: float | None = DEFAULT_FLUSH_TIMEOUT_SECONDS) -> bool:
+        """
+        Espera ate que tudo aceito ate agora esteja no disco.
+
+        Nao adquire locks: pode ser chamado de um signal handler mesmo que a
+        thread principal tenha sido interrompida dentro de write().
+        """
+        target = self._accepted
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while self._done + self.dropped < target or self._spill_pending:
+            if self._thread is None or not self._thread.is_alive():
+                return False
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+
+        return True
+
+    def pending_lines(self, limit: int) -> list[str]:
+        """
+        Ate `limit` linhas aceitas e ainda nao gravadas, mais antigas primeiro.
+
+        Nao espera a thread escritora: permite ler decisoes recentes sem flush.
+        """
+        tail = []
+        with self._cond:
+            for lines in (self._buffer, self._inflight):
+                for line in reversed(lines):
+                    if len(tail) >= limit:
+                        return tail[::-1]
+                    tail.append(line)
+        return tail[::-1]
+
+    def close(self, timeout: float | None = None) -> bool:
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+
+    def _start(self) -> None:
+        with self._cond:
+            if self._thread is not None:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._thread = threading.Thread(
+                target=self._run,
+                name="decision-log-writer",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._buffer and not self._spill_pending and not self._closing:
+                    self._cond.wait(0.5)
+
+                batch = list(self._buffer)
+                self._buffer.clear()
+                self._inflight = batch
+                closing = self._closing
+                self._cond.notify_all()
+
+            if batch:
+                self._write_batch("".join(batch))
+                self._done += len(batch)
+                self._inflight = []
+
+            if self._spill_pending:
+                self._merge_spill()
+
+            if closing:
+                with self._cond:
+                    if not self._buffer:
+                        return
+
+    def _write_batch(self, payload: str) -> None:
+        for attempt in range(_WRITE_RETRIES):
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(payload)
+                    if self.fsync:
+                        f.flush()
+                        os.fsync(f.fileno())
+                return
+            except Exception as exc:
+                if attempt == _WRITE_RETRIES - 1:
+                    self.failed += payload.count("\n")
+                    print(f"[WARN] Falha ao gravar log de decisoes: {exc}", file=sys.stderr)
+                    return
+                time.sleep(0.1)
+
+    def _write_direct(self, line: str) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def _spill(self, line: str) -> None:
+        with self._spill_lock:
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self._spill_pending = True
+
+    def _merge_spill(self) -> None:
+        draining_path = f"{self.spill_path}.draining"
+
+        with self._spill_lock:
+            if not os.path.exists(self.spill_path):
+                self._spill_pending = False
+                return
+            os.replace(self.spill_path, draining_path)
+
+        with open(draining_path, "r", encoding="utf-8") as f:
+            payload = f.read()
+
+        if payload:
+            self._write_batch(payload)
+
+        os.remove(draining_path)
+
+        with self._spill_lock:
+            self._spill_pending = os.path.exists(self.spill_path)
+
+
+def writer_from_env(path: str) -> DecisionLogWriter:
+    backpressure = (os.getenv("DECISION_LOG_BACKPRESSURE") or BACKPRESSURE_BLOCK).strip().lower()
+    if backpressure not in _BACKPRESSURE_MODES:
+        backpressure = BACKPRESSURE_BLOCK
+
+    raw_size = (os.getenv("DECISION_LOG_QUEUE_SIZE") or "").strip()
+    try:
+        max_queue = int(raw_size) if raw_size else DEFAULT_QUEUE_SIZE
+    except ValueError:
+        max_queue = DEFAULT_QUEUE_SIZE
+
+    fsync = (os.getenv("DECISION_LOG_FSYNC") or "").strip().lower() in {"1", "true", "yes", "on"}
+
+    return DecisionLogWriter(
+        path,
+        max_queue=max_queue,
+        backpressure=backpressure,
+        fsync=fsync,
+    )
@@ -1,17 +1,43 @@
 import hashlib
 import json
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
 from core.plan_validator import validate_plan, PlanValidationError
 from core.safe_runner import run_command, CommandExecutionError
 from core.command_policy import is_command_allowed, compute_policy_sha256, load_policy
 from core.observability import log_decision, increment_metric
+from core.ledger_head import read_ledger_head, write_ledger_head
+from core.ledger_merkle import sync_merkle_index
+from core.ledger_segments import finish_pending_seal, maybe_seal_segment, segment_base_hash
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - plataformas sem fcntl
+    fcntl = None
 
 RESULTS_DIR = Path("ai/results")
 APPROVALS_DIR = Path("ai/approvals")
 HISTORY_FILE = Path("ai/history/execution_history.log")
 
+_HISTORY_LOCK = threading.Lock()
+
+
+@contextmanager
+def history_lock():
+    """Serializa appends ao ledger entre threads e entre processos."""
+    HISTORY_FILE.parent.mkdir(parents=True, exist_ok=True)
+
+    with _HISTORY_LOCK, open(HISTORY_FILE.with_suffix(".lock"), "a+", encoding="utf-8") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
 
 def is_plan_approved(plan_id: str) -> bool:
     approval_file = APPROVALS_DIR / f"{plan_id}.approved"
@@ -38,9 +64,22 @@ class PlanExecutionError(Exception):
     pass
 
 def append_history(report: dict) -> None:
-    HISTORY_FILE.parent.mkdir(parents=True, exist_ok=True)
+    # head -> append -> sidecars precisa ser atomico: workers concorrentes
+    # encadeariam duas entradas no mesmo previous_hash
+    with history_lock():
+        entries = _append_history_locked(report)
+
+    # Rotaciona o segmento ativo ao atingir o tamanho maximo; so o rename
+    # roda sob o lock, verificaao e compressao ficam fora dele
+    maybe_seal_segment(HISTORY_FILE, entries, history_lock)
+
 
-    previous_hash = get_last_history_hash()
+def _append_history_locked(report: dict) -> int:
+    # Um selo interrompido deixaria o novo elo encadeado no segmento errado
+    finish_pending_seal(HISTORY_FILE)
+
+    head = read_ledger_head(HISTORY_FILE)
+    previous_hash = head["entry_hash"] if head else segment_base_hash(HISTORY_FILE)
 
     entry_core = {
         "timestamp": datetime.utcnow().isoformat() + "Z",
@@ -60,21 +99,30 @@ def append_history(report: dict) -> None:
 
     entry_core["entry_hash"] = entry_hash
 
-    with open(HISTORY_FILE, "a", encoding="utf-8") as f:
-        f.write(json.dumps(entry_core) + "\n")
-
-def get_last_history_hash() -> str | None:
-    if not HISTORY_FILE.exists():
-        return None
+    with open(HISTORY_FILE, "ab") as f:
+        f.seek(0, 2)
+        offset = f.tell()
+        f.write((json.dumps(entry_core) + "\n").encode("utf-8"))
+        size = f.tell()
+
+    # Indice de cabeca: evita reler o ledger inteiro no proximo append
+    write_ledger_head(HISTORY_FILE, {
+        "offset": offset,
+        "size": size,
+        "entry_hash": entry_hash,
+        "entries": (head["entries"] if head else 0) + 1,
+    })
 
-    with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-        lines = f.readlines()
+    # Arvore de Merkle para provas de inclusao sem varrer o ledger
+    entries_before = head["entries"] if head else 0
+    sync_merkle_index(HISTORY_FILE, entry_hash, offset, entries_before, report["plan_id"])
+    return entries_before + 1
 
-    if not lines:
+def get_last_history_hash() -> str | None:
+    head = read_ledger_head(HISTORY_FILE)
+    if head is None:
         return None
-
-    last_entry = json.loads(lines[-1])
-    return last_entry.get("entry_hash")
+    return head.get("entry_hash")
 
 def execute_plan(plan_path: str, apply: bool = False) -> dict:
     """
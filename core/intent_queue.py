@@ -1,51 +1,499 @@
+import copy
+import heapq
 import json
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
 from pathlib import Path
 from typing import List, Dict
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - plataformas sem fcntl
+    fcntl = None
+
 
 INTENT_QUEUE_FILE = Path("data/intents_queue.json")
+INTENT_JOURNAL_FILE = Path("data/intents_queue.journal")
+INTENT_LOCK_FILE = Path("data/intents_queue.lock")
+
+# Compacta quando a maior parte do journal ja foi superada por registros novos
+# e o journal ja passou de COMPACT_JOURNAL_RATIO vezes o tamanho do snapshot:
+# o custo de regravar o snapshot fica amortizado pelo crescimento do journal.
+COMPACT_DEAD_RATIO = 0.5
+COMPACT_MIN_RECORDS = 64
+COMPACT_JOURNAL_RATIO = 2.0
+
+DEFAULT_LEASE_SECONDS = 300.0
+
+
+def read_lease_seconds() -> float:
+    raw = (os.getenv("INTENT_LEASE_SECONDS") or "").strip()
+    if not raw:
+        return DEFAULT_LEASE_SECONDS
+    try:
+        value = float(raw)
+    except ValueError:
+        return DEFAULT_LEASE_SECONDS
+    return value if value > 0 else DEFAULT_LEASE_SECONDS
+
+
+def make_lease_owner() -> str:
+    """Identificador unico do consumidor: host:pid:aleatorio."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+@contextmanager
+def queue_file_lock():
+    """Lock exclusivo entre processos para escrita na fila."""
+    INTENT_LOCK_FILE.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(INTENT_LOCK_FILE, "a+", encoding="utf-8") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
 
 
 class IntentQueue:
+    """
+    Fila de intents com journal append-only.
+
+    O snapshot (INTENT_QUEUE_FILE) mantem o formato de lista original; cada
+    enqueue/mudana de status vira um registro pequeno no journal. O estado
+    em memoria e reconstruido por replay (snapshot + journal) e so a cauda
+    nova do journal e lida a cada operaao. Registros sao idempotentes
+    (put substitui por id, update define campos), o que permite leitura sem
+    lock mesmo durante uma compactaao.
+    """
+
     def __init__(self):
         INTENT_QUEUE_FILE.parent.mkdir(parents=True, exist_ok=True)
 
+        self._lock = threading.RLock()
+        self._intents: Dict[str, Dict] = {}
+        self._snapshot_key = None
+        self._journal_ino = None
+        self._journal_offset = 0
+        self._journal_records = 0
+        self._journal_ids: set = set()
+        # Linhas do journal que nao puderam ser decodificadas
+        self.corrupt_records = 0
+        self._compactor: threading.Thread | None = None
+
+        # Indice de prioridade: heap de (-priority, seq, id) so com pendentes.
+        # Entradas obsoletas sao descartadas de forma preguiosa.
+        self._seq: Dict[str, int] = {}
+        self._next_seq = 0
+        self._pending_heap: list = []
+        self._pending_count = 0
+
+        # Leases ativos: id -> lease_expires_at (so intents em "processing")
+        self._leases: Dict[str, float] = {}
+
+    # ---------- API publica ----------
     def load(self) -> List[Dict]:
-        if not INTENT_QUEUE_FILE.exists():
-            return []
-        return json.loads(INTENT_QUEUE_FILE.read_text(encoding="utf-8"))
+        with self._lock:
+            self._refresh()
+            return copy.deepcopy(self._ordered())
 
     def save(self, intents: List[Dict]):
-        INTENT_QUEUE_FILE.write_text(
-            json.dumps(intents, indent=2),
-            encoding="utf-8"
-        )
+        with self._lock, queue_file_lock():
+            self._refresh()
+
+            records = []
+            seen = set()
+
+            for intent in intents:
+                intent_id = intent.get("id")
+                seen.add(intent_id)
+                current = self._intents.get(intent_id)
+
+                if current is None:
+                    records.append({"op": "put", "intent": intent})
+                    continue
+
+                changed = {k: v for k, v in intent.items() if current.get(k) != v or k not in current}
+                removed = [k for k in current if k not in intent]
+
+                if removed:
+                    records.append({"op": "put", "intent": intent})
+                elif changed:
+                    records.append({"op": "update", "id": intent_id, "fields": changed})
+
+            for intent_id in list(self._intents):
+                if intent_id not in seen:
+                    records.append({"op": "delete", "id": intent_id})
+
+            self._append(records)
 
     def enqueue(self, intent: Dict):
-        intents = self.load()
+        with self._lock, queue_file_lock():
+            self._refresh()
+
+            # Garantir campos minimos
+            intent.setdefault("id", self._next_id())
+            intent.setdefault("priority", 1)
+            intent.setdefault("status", "pending")
+
+            self._append([{"op": "put", "intent": intent}])
+
+    def dequeue(self, lease_owner: str | None = None, lease_seconds: float | None = None) -> Dict | None:
+        """
+        Reivindica a proxima intent pendente sob o lock entre processos.
+
+        Com lease_owner, a intent recebe lease_owner/lease_expires_at; leases
+        vencidos voltam para "pending" antes da escolha.
+        """
+        with self._lock, queue_file_lock():
+            self._refresh()
+
+            now = time.time()
+            self._append(self._expired_lease_records(now))
+
+            intent_id = self._peek_pending()
+            if intent_id is None:
+                return None
+
+            fields = {"status": "processing"}
+            if lease_owner is not None:
+                fields["lease_owner"] = lease_owner
+                fields["lease_expires_at"] = now + (lease_seconds or read_lease_seconds())
+
+            self._append([{"op": "update", "id": intent_id, "fields": fields}])
+            return copy.deepcopy(self._intents[intent_id])
+
+    def renew_lease(self, intent_id: str, lease_owner: str, lease_seconds: float | None = None) -> bool:
+        with self._lock, queue_file_lock():
+            self._refresh()
+            if not self._holds_lease(intent_id, lease_owner):
+                return False
 
-        # Garantir campos minimos
-        intent.setdefault("id", f"intent_{len(intents)+1}")
-        intent.setdefault("priority", 1)
-        intent.setdefault("status", "pending")
+            expires = time.time() + (lease_seconds or read_lease_seconds())
+            self._append([{"op": "update", "id": intent_id, "fields": {"lease_expires_at": expires}}])
+            return True
 
-        intents.append(intent)
+    def finish(self, intent_id: str, lease_owner: str, **fields) -> bool:
+        """
+        Atualiza a intent somente se lease_owner ainda detem o lease.
 
-        # Ordenar por prioridade (maior primeiro)
-        intents.sort(key=lambda x: x.get("priority", 1), reverse=True)
+        Retorna False se o lease venceu e a intent foi devolvida/reivindicada
+        por outro consumidor (o resultado deste consumidor e descartado).
+        """
+        with self._lock, queue_file_lock():
+            self._refresh()
+            if not self._holds_lease(intent_id, lease_owner):
+                return False
 
-        self.save(intents)
+            fields["lease_expires_at"] = None
+            self._append([{"op": "update", "id": intent_id, "fields": fields}])
+            return True
 
+    def requeue_expired(self) -> int:
+        """Devolve para "pending" as intents com lease vencido."""
+        with self._lock, queue_file_lock():
+            self._refresh()
+            records = self._expired_lease_records(time.time())
+            self._append(records)
+            return len(records)
 
-    def dequeue(self) -> Dict | None:
-        intents = self.load()
-        if not intents:
-            return None
+    def peek(self) -> Dict | None:
+        """Proxima intent pendente (maior prioridade, FIFO) sem reivindica-la."""
+        with self._lock:
+            self._refresh()
+            intent_id = self._peek_pending()
+            return copy.deepcopy(self._intents[intent_id]) if intent_id is not None else None
+
+    def pending_count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return self._pending_count
+
+    def update(self, intent_id: str, **fields) -> None:
+        with self._lock, queue_file_lock():
+            self._refresh()
+            self._append([{"op": "update", "id": intent_id, "fields": fields}])
+
+    def watch_paths(self) -> List[Path]:
+        """Arquivos cuja mudana indica possivel nova intent."""
+        return [INTENT_JOURNAL_FILE, INTENT_QUEUE_FILE]
+
+    def compact(self) -> None:
+        """Regrava o snapshot com o estado atual e zera o journal."""
+        with self._lock, queue_file_lock():
+            self._refresh()
+
+            tmp_snapshot = INTENT_QUEUE_FILE.with_name(f".{INTENT_QUEUE_FILE.name}.{os.getpid()}.tmp")
+            tmp_snapshot.write_text(json.dumps(self._ordered(), separators=(",", ":")), encoding="utf-8")
+            os.replace(tmp_snapshot, INTENT_QUEUE_FILE)
+
+            # Snapshot antes do journal: um leitor pode ver snapshot novo com
+            # journal antigo (replay idempotente), nunca o contrario.
+            tmp_journal = INTENT_JOURNAL_FILE.with_name(f".{INTENT_JOURNAL_FILE.name}.{os.getpid()}.tmp")
+            tmp_journal.write_bytes(b"")
+            os.replace(tmp_journal, INTENT_JOURNAL_FILE)
+
+            self._snapshot_key = None
+            self._refresh()
+
+    def wait_for_compaction(self, timeout: float | None = None) -> None:
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join(timeout)
+
+    # ---------- Leases ----------
+    def _holds_lease(self, intent_id: str, lease_owner: str) -> bool:
+        intent = self._intents.get(intent_id)
+        return (
+            intent is not None
+            and intent.get("status") == "processing"
+            and intent.get("lease_owner") == lease_owner
+        )
 
-        for intent in intents:
-            if intent.get("status") == "pending":
-                intent["status"] = "processing"
-                self.save(intents)
-                return intent
+    def _expired_lease_records(self, now: float) -> List[Dict]:
+        records = []
+        for intent_id, expires in self._leases.items():
+            if expires <= now:
+                intent = self._intents[intent_id]
+                records.append({
+                    "op": "update",
+                    "id": intent_id,
+                    "fields": {
+                        "status": "pending",
+                        "lease_owner": None,
+                        "lease_expires_at": None,
+                        "lease_expirations": intent.get("lease_expirations", 0) + 1,
+                    },
+                })
+        return records
 
+    # ---------- Replay ----------
+    def _ordered(self) -> List[Dict]:
+        # Maior prioridade primeiro, estavel pela ordem de inserao
+        return sorted(self._intents.values(), key=lambda x: x.get("priority", 1), reverse=True)
+
+    def _next_id(self) -> str:
+        n = len(self._intents) + 1
+        while f"intent_{n}" in self._intents:
+            n += 1
+        return f"intent_{n}"
+
+    def _refresh(self) -> None:
+        while True:
+            journal = open(INTENT_JOURNAL_FILE, "rb") if INTENT_JOURNAL_FILE.exists() else None
+            try:
+                journal_ino = _file_key(journal)[0]
+                snapshot_key = _path_key(INTENT_QUEUE_FILE)
+
+                if snapshot_key == self._snapshot_key and journal_ino == self._journal_ino:
+                    if journal is not None:
+                        self._replay(journal)
+                    return
+
+                intents = (
+                    json.loads(INTENT_QUEUE_FILE.read_text(encoding="utf-8"))
+                    if INTENT_QUEUE_FILE.exists()
+                    else []
+                )
+
+                # Journal trocado durante a leitura do snapshot: tenta de novo
+                if _path_key(INTENT_JOURNAL_FILE)[0] != journal_ino:
+                    continue
+
+                self._intents = {}
+                self._seq = {}
+                self._next_seq = 0
+                for intent in intents:
+                    self._intents[intent.get("id")] = intent
+                    self._seq.setdefault(intent.get("id"), self._take_seq())
+                self._rebuild_pending_index()
+
+                self._snapshot_key = snapshot_key
+                self._journal_ino = journal_ino
+                self._journal_offset = 0
+                self._journal_records = 0
+                self._journal_ids = set()
+
+                if journal is not None:
+                    self._replay(journal)
+                return
+            finally:
+                if journal is not None:
+                    journal.close()
+
+    def _replay(self, journal) -> None:
+        journal.seek(self._journal_offset)
+        data = journal.read()
+
+        # So consome linhas completas
+        end = data.rfind(b"\n") + 1
+        for raw in data[:end].splitlines():
+            if not raw.strip():
+                continue
+            try:
+                record = json.loads(raw.decode("utf-8"))
+            except ValueError:
+                # Registro truncado por queda no meio de uma escrita
+                self.corrupt_records += 1
+                continue
+            self._apply(record)
+
+        self._journal_offset += end
+
+    def _apply(self, record: Dict) -> None:
+        op = record.get("op")
+
+        if op == "put":
+            intent = record["intent"]
+            intent_id = intent.get("id")
+            previous = self._intents.get(intent_id)
+            self._intents[intent_id] = intent
+            if previous is None:
+                self._seq[intent_id] = self._take_seq()
+            self._index_change(intent_id, previous, intent)
+        elif op == "update":
+            intent_id = record["id"]
+            current = self._intents.get(intent_id)
+            if current is not None:
+                previous = dict(current)
+                current.update(record["fields"])
+                self._index_change(intent_id, previous, current)
+        elif op == "delete":
+            intent_id = record["id"]
+            previous = self._intents.pop(intent_id, None)
+            self._seq.pop(intent_id, None)
+            if previous is not None:
+                self._index_change(intent_id, previous, None)
+        else:
+            return
+
+        self._journal_records += 1
+        self._journal_ids.add(intent_id)
+
+    # ---------- Indice de pendentes ----------
+    def _take_seq(self) -> int:
+        seq = self._next_seq
+        self._next_seq += 1
+        return seq
+
+    def _heap_key(self, intent_id: str) -> tuple:
+        return (-self._intents[intent_id].get("priority", 1), self._seq[intent_id], intent_id)
+
+    def _rebuild_pending_index(self) -> None:
+        self._pending_heap = [
+            self._heap_key(intent_id)
+            for intent_id, intent in self._intents.items()
+            if intent.get("status") == "pending"
+        ]
+        heapq.heapify(self._pending_heap)
+        self._pending_count = len(self._pending_heap)
+
+        self._leases = {}
+        for intent_id, intent in self._intents.items():
+            self._index_lease(intent_id, intent)
+
+    def _index_change(self, intent_id: str, previous: Dict | None, current: Dict | None) -> None:
+        was_pending = previous is not None and previous.get("status") == "pending"
+        is_pending = current is not None and current.get("status") == "pending"
+
+        self._pending_count += int(is_pending) - int(was_pending)
+
+        if is_pending and (not was_pending or previous.get("priority", 1) != current.get("priority", 1)):
+            heapq.heappush(self._pending_heap, self._heap_key(intent_id))
+
+        self._leases.pop(intent_id, None)
+        if current is not None:
+            self._index_lease(intent_id, current)
+
+        # Evita que entradas obsoletas dominem o heap
+        if len(self._pending_heap) > 2 * self._pending_count + 64:
+            self._rebuild_pending_index()
+
+    def _index_lease(self, intent_id: str, intent: Dict) -> None:
+        expires = intent.get("lease_expires_at")
+        if intent.get("status") == "processing" and expires is not None:
+            self._leases[intent_id] = expires
+
+    def _peek_pending(self) -> str | None:
+        heap = self._pending_heap
+        while heap:
+            _, seq, intent_id = heap[0]
+            intent = self._intents.get(intent_id)
+            if (
+                intent is not None
+                and intent.get("status") == "pending"
+                and self._seq.get(intent_id) == seq
+                and heap[0] == self._heap_key(intent_id)
+            ):
+                return intent_id
+            heapq.heappop(heap)
         return None
+
+    def _append(self, records: List[Dict]) -> None:
+        if not records:
+            return
+
+        payload = "".join(json.dumps(record) + "\n" for record in records)
+        with open(INTENT_JOURNAL_FILE, "ab") as f:
+            # Escrita anterior interrompida deixou linha sem "\n": isola o
+            # fragmento numa linha propria (ignorada no replay) em vez de
+            # colar o registro novo nele. Chamado sob queue_file_lock.
+            if f.tell() > 0 and not _ends_with_newline(INTENT_JOURNAL_FILE):
+                payload = "\n" + payload
+            f.write(payload.encode("utf-8"))
+
+        self._refresh()
+        self._maybe_compact()
+
+    def _maybe_compact(self) -> None:
+        if self._journal_records < COMPACT_MIN_RECORDS:
+            return
+
+        dead = self._journal_records - len(self._journal_ids)
+        if dead / self._journal_records < COMPACT_DEAD_RATIO:
+            return
+
+        snapshot_bytes = (self._snapshot_key or (None, None, None))[2] or 0
+        if self._journal_offset < COMPACT_JOURNAL_RATIO * snapshot_bytes:
+            return
+
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+
+        self._compactor = threading.Thread(target=self.compact, name="intent-queue-compactor")
+        self._compactor.start()
+
+
+def _path_key(path: Path):
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return (None, None, None)
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _ends_with_newline(path: Path) -> bool:
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def _file_key(handle):
+    if handle is None:
+        return (None, None, None)
+    st = os.fstat(handle.fileno())
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def create_intent_queue(config):
+    """Instancia o backend de fila configurado em AppConfig."""
+    if config.intent_queue_backend == "sqlite":
+        from core.intent_queue_sqlite import SQLiteIntentQueue
+        return SQLiteIntentQueue()
+    return IntentQueue()
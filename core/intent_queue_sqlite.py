@@ -0,0 +1,329 @@
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from core.intent_queue import read_lease_seconds
+
+INTENT_DB_FILE = Path("data/intents_queue.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS intents (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    status TEXT NOT NULL,
+    priority NUMERIC NOT NULL,
+    payload TEXT NOT NULL,
+    lease_owner TEXT,
+    lease_expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_intents_claim ON intents (status, priority DESC, seq);
+"""
+
+_LEASE_INDEX = "CREATE INDEX IF NOT EXISTS idx_intents_lease ON intents (status, lease_expires_at)"
+
+# UPDATE ... RETURNING existe a partir do SQLite 3.35
+_SUPPORTS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+_NEXT_PENDING = """
+SELECT seq FROM intents
+WHERE status = 'pending'
+ORDER BY priority DESC, seq
+LIMIT 1
+"""
+
+_CLAIM = """
+status = 'processing',
+payload = json_set(payload, '$.status', 'processing')
+"""
+
+_CLAIM_WITH_LEASE = """
+status = 'processing',
+lease_owner = :owner,
+lease_expires_at = :expires,
+payload = json_set(
+    payload,
+    '$.status', 'processing',
+    '$.lease_owner', :owner,
+    '$.lease_expires_at', :expires
+)
+"""
+
+
+class SQLiteIntentQueue:
+    """
+    Backend SQLite (WAL) com a mesma API de IntentQueue.
+
+    status/priority ficam em colunas indexadas para a reivindicaao; a
+    intent completa fica em `payload` (JSON). Em WAL, leitores nao bloqueiam
+    o escritor.
+    """
+
+    def __init__(self, db_path: Path | None = None):
+        self.db_path = db_path or INTENT_DB_FILE
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.db_path),
+            timeout=30,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._migrate_schema()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # ---------- API compativel ----------
+    def load(self) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT payload FROM intents ORDER BY priority DESC, seq"
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def save(self, intents: List[Dict]):
+        with self._lock, self._transaction():
+            ids = []
+            for intent in intents:
+                ids.append(intent.get("id"))
+                self._upsert(intent)
+
+            # Os ids vao como um unico parametro JSON: um placeholder por id
+            # estouraria o limite de variaveis do SQLite em filas grandes
+            self._conn.execute(
+                """
+                DELETE FROM intents
+                WHERE id NOT IN (SELECT value FROM json_each(?) WHERE value IS NOT NULL)
+                """,
+                (json.dumps(ids),),
+            )
+
+    def enqueue(self, intent: Dict):
+        with self._lock, self._transaction():
+            if "id" not in intent:
+                # MAX(seq) sai do fim da arvore do rowid; COUNT(*) varreria a tabela
+                (last_seq,) = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM intents").fetchone()
+                n = last_seq + 1
+                while self._conn.execute("SELECT 1 FROM intents WHERE id = ?", (f"intent_{n}",)).fetchone():
+                    n += 1
+                intent["id"] = f"intent_{n}"
+
+            # Garantir campos minimos
+            intent.setdefault("priority", 1)
+            intent.setdefault("status", "pending")
+
+            self._upsert(intent)
+
+    def dequeue(self, lease_owner: str | None = None, lease_seconds: float | None = None) -> Dict | None:
+        now = time.time()
+        expires = now + (lease_seconds or read_lease_seconds()) if lease_owner is not None else None
+
+        with self._lock, self._transaction():
+            self._requeue_expired(now)
+
+            return self._claim_next(lease_owner, expires)
+
+    def renew_lease(self, intent_id: str, lease_owner: str, lease_seconds: float | None = None) -> bool:
+        expires = time.time() + (lease_seconds or read_lease_seconds())
+        with self._lock:
+            cursor = self._conn.execute(
+                """
+                UPDATE intents
+                SET lease_expires_at = :expires,
+                    payload = json_set(payload, '$.lease_expires_at', :expires)
+                WHERE id = :id AND status = 'processing' AND lease_owner = :owner
+                """,
+                {"id": intent_id, "owner": lease_owner, "expires": expires},
+            )
+        return cursor.rowcount == 1
+
+    def finish(self, intent_id: str, lease_owner: str, **fields) -> bool:
+        with self._lock, self._transaction():
+            row = self._conn.execute(
+                "SELECT payload FROM intents WHERE id = ? AND status = 'processing' AND lease_owner = ?",
+                (intent_id, lease_owner),
+            ).fetchone()
+            if row is None:
+                return False
+
+            intent = json.loads(row[0])
+            intent.update(fields)
+            intent["lease_expires_at"] = None
+            self._upsert(intent)
+            return True
+
+    def requeue_expired(self) -> int:
+        with self._lock, self._transaction():
+            return self._requeue_expired(time.time())
+
+    def peek(self) -> Dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM intents WHERE status = 'pending' ORDER BY priority DESC, seq LIMIT 1"
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def pending_count(self) -> int:
+        # Busca num indice que comea por status, sem ler a tabela
+        with self._lock:
+            (count,) = self._conn.execute(
+                "SELECT COUNT(*) FROM intents WHERE status = 'pending'"
+            ).fetchone()
+        return count
+
+    def update(self, intent_id: str, **fields) -> None:
+        with self._lock, self._transaction():
+            row = self._conn.execute("SELECT payload FROM intents WHERE id = ?", (intent_id,)).fetchone()
+            if row is None:
+                return
+            intent = json.loads(row[0])
+            intent.update(fields)
+            self._upsert(intent)
+
+    def watch_paths(self) -> List[Path]:
+        # Commits em WAL alteram o arquivo `-wal`, observado junto com o banco
+        return [self.db_path]
+
+    def status_counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM intents GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    # ---------- Internos ----------
+    def _migrate_schema(self) -> None:
+        # Bancos criados antes dos leases nao tem as colunas
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(intents)")}
+        for name, kind in (("lease_owner", "TEXT"), ("lease_expires_at", "REAL")):
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE intents ADD COLUMN {name} {kind}")
+        self._conn.execute(_LEASE_INDEX)
+
+    def _claim_next(self, lease_owner: str | None, expires: float | None) -> Dict | None:
+        # Chamar dentro de _transaction (BEGIN IMMEDIATE)
+        assignments = _CLAIM if lease_owner is None else _CLAIM_WITH_LEASE
+        params = {"owner": lease_owner, "expires": expires}
+
+        if _SUPPORTS_RETURNING:
+            row = self._conn.execute(
+                f"UPDATE intents SET {assignments} WHERE seq = ({_NEXT_PENDING}) RETURNING payload",
+                params,
+            ).fetchone()
+            return json.loads(row[0]) if row else None
+
+        # SQLite antigo: SELECT e UPDATE na mesma transaao, que ja detem o
+        # lock de escrita, entao nenhuma outra conexao reivindica o mesmo seq
+        row = self._conn.execute(_NEXT_PENDING).fetchone()
+        if row is None:
+            return None
+        params["seq"] = row[0]
+        self._conn.execute(f"UPDATE intents SET {assignments} WHERE seq = :seq", params)
+        (payload,) = self._conn.execute("SELECT payload FROM intents WHERE seq = ?", (row[0],)).fetchone()
+        return json.loads(payload)
+
+    def _requeue_expired(self, now: float) -> int:
+        cursor = self._conn.execute(
+            """
+            UPDATE intents
+            SET status = 'pending',
+                lease_owner = NULL,
+                lease_expires_at = NULL,
+                payload = json_set(
+                    payload,
+                    '$.status', 'pending',
+                    '$.lease_owner', NULL,
+                    '$.lease_expires_at', NULL,
+                    '$.lease_expirations', COALESCE(json_extract(payload, '$.lease_expirations'), 0) + 1
+                )
+            WHERE status = 'processing' AND lease_expires_at IS NOT NULL AND lease_expires_at <= ?
+            """,
+            (now,),
+        )
+        return cursor.rowcount
+
+    def _upsert(self, intent: Dict) -> None:
+        self._conn.execute(
+            """
+            INSERT INTO intents (id, status, priority, payload, lease_owner, lease_expires_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                status = excluded.status,
+                priority = excluded.priority,
+                payload = excluded.payload,
+                lease_owner = excluded.lease_owner,
+                lease_expires_at = excluded.lease_expires_at
+            """,
+            (
+                intent.get("id"),
+                intent.get("status", "pending"),
+                intent.get("priority", 1),
+                json.dumps(intent),
+                intent.get("lease_owner"),
+                intent.get("lease_expires_at"),
+            ),
+        )
+
+    def _transaction(self):
+        return _Transaction(self._conn)
+
+
+class _Transaction:
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def __enter__(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self._conn.execute("COMMIT")
+        else:
+            self._conn.execute("ROLLBACK")
+        return False
+
+
+def migrate_json_queue(db_path: Path | None = None) -> int:
+    """
+    Copia a fila JSON (snapshot + journal) para o SQLite.
+
+    Idempotente: intents ja presentes (mesmo id) nao sao sobrescritas.
+    Retorna quantas intents foram inseridas.
+    """
+    from core.intent_queue import IntentQueue
+
+    intents = IntentQueue().load()
+    queue = SQLiteIntentQueue(db_path)
+    inserted = 0
+
+    try:
+        with queue._lock, queue._transaction() as conn:
+            # load() ja vem na ordem de prioridade: seq preserva o desempate FIFO
+            for intent in intents:
+                cursor = conn.execute(
+                    """
+                    INSERT OR IGNORE INTO intents
+                        (id, status, priority, payload, lease_owner, lease_expires_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        intent.get("id"),
+                        intent.get("status", "pending"),
+                        intent.get("priority", 1),
+                        json.dumps(intent),
+                        intent.get("lease_owner"),
+                        intent.get("lease_expires_at"),
+                    ),
+                )
+                inserted += cursor.rowcount
+    finally:
+        queue.close()
+
+    return inserted
@@ -0,0 +1,130 @@
+import json
+import os
+from pathlib import Path
+
+
+_SCAN_BLOCK_SIZE = 4096
+
+
+def head_path_for(history_file: Path) -> Path:
+    return history_file.with_suffix(".head.json")
+
+
+def write_ledger_head(history_file: Path, head: dict) -> None:
+    """Grava o indice de cabeca do ledger de forma atomica."""
+    head_path = head_path_for(history_file)
+    tmp_path = head_path.with_name(f".{head_path.name}.{os.getpid()}.tmp")
+
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(head, f)
+    os.replace(tmp_path, head_path)
+
+
+def read_ledger_head(history_file: Path) -> dict | None:
+    """
+    Retorna {"offset", "size", "entry_hash", "entries"} da ultima entrada.
+
+    Usa o sidecar quando ele confere com o arquivo; caso contrario, busca a
+    ultima linha lendo o ledger de tras para frente e reconstroi o sidecar.
+    """
+    if not history_file.exists():
+        return None
+
+    head = _read_sidecar(history_file)
+    if head is not None:
+        return head
+
+    head = scan_ledger_head(history_file)
+    if head is not None:
+        head["entries"] = _count_lines(history_file)
+        try:
+            write_ledger_head(history_file, head)
+        except OSError:
+            pass
+
+    return head
+
+
+def scan_ledger_head(history_file: Path) -> dict | None:
+    with open(history_file, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        end = size
+
+        # Ignora quebras de linha/brancos no final do arquivo
+        while end > 0:
+            start = max(0, end - _SCAN_BLOCK_SIZE)
+            f.seek(start)
+            block = f.read(end - start)
+            stripped = block.rstrip()
+            if stripped:
+                end = start + len(stripped)
+                break
+            end = start
+
+        if end == 0:
+            return None
+
+        position = end
+        line_start = 0
+
+        while position > 0:
+            start = max(0, position - _SCAN_BLOCK_SIZE)
+            f.seek(start)
+            block = f.read(position - start)
+            newline = block.rfind(b"\n")
+            if newline != -1:
+                line_start = start + newline + 1
+                break
+            position = start
+
+        f.seek(line_start)
+        last_line = f.read(end - line_start)
+
+    entry = json.loads(last_line.decode("utf-8"))
+    return {
+        "offset": line_start,
+        "size": size,
+        "entry_hash": entry.get("entry_hash"),
+        "entries": None,
+    }
+
+
+def _read_sidecar(history_file: Path) -> dict | None:
+    head_path = head_path_for(history_file)
+    if not head_path.exists():
+        return None
+
+    try:
+        head = json.loads(head_path.read_text(encoding="utf-8"))
+        size = history_file.stat().st_size
+
+        if head.get("size") != size or not isinstance(head.get("entries"), int):
+            return None
+
+        # Confere a entrada apontada (leitura O(1) a partir do offset)
+        with open(history_file, "rb") as f:
+            f.seek(head["offset"])
+            entry = json.loads(f.read(size - head["offset"]).decode("utf-8"))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+    if entry.get("entry_hash") != head.get("entry_hash"):
+        return None
+
+    return head
+
+
+def _count_lines(history_file: Path) -> int:
+    count = 0
+    last_byte = b"\n"
+
+    with open(history_file, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            count += chunk.count(b"\n")
+            last_byte = chunk[-1:]
+
+    if last_byte != b"\n":
+        count += 1
+
+    return count
@@ -0,0 +1,354 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+
+_HASH_SIZE = 32
+_OFFSET_SIZE = 8
+_PLAN_KEY_SIZE = 8
+_PLAN_SCAN_BLOCK = 64 * 1024
+
+
+def leaf_hash(entry_hash: str) -> bytes:
+    return hashlib.sha256(b"\x00" + entry_hash.encode("utf-8")).digest()
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def plan_key(plan_id: str | None) -> bytes:
+    if plan_id is None:
+        return bytes(_PLAN_KEY_SIZE)
+    return hashlib.sha256(plan_id.encode("utf-8")).digest()[:_PLAN_KEY_SIZE]
+
+
+def _split(size: int) -> int:
+    """Maior potencia de 2 estritamente menor que size (RFC 6962)."""
+    k = 1
+    while k << 1 < size:
+        k <<= 1
+    return k
+
+
+def merkle_dir_for(history_file: Path) -> Path:
+    return history_file.with_suffix(".merkle")
+
+
+def open_ledger(path: Path):
+    """Abre o segmento ativo ou um segmento selado (gzip opcional)."""
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+class MerkleIndex:
+    """
+    Arvore de Merkle incremental sobre os entry_hash do ledger.
+
+    Cada nivel fica num arquivo binario append-only (`level_<k>.bin`) com os
+    hashes das subarvores perfeitas completas daquele nivel; `offsets.bin`
+    guarda o offset em bytes de cada entrada no ledger e `plan_keys.bin` um
+    prefixo do hash do plan_id de cada folha. Um append custa O(log n) e
+    qualquer subarvore alinhada e lida em O(1).
+    """
+
+    def __init__(self, history_file: Path, directory: Path | None = None):
+        self.history_file = history_file
+        self.directory = directory or merkle_dir_for(history_file)
+
+    # ---------- Estado ----------
+    def size(self) -> int:
+        path = self._level_path(0)
+        if not path.exists():
+            return 0
+        return path.stat().st_size // _HASH_SIZE
+
+    def is_consistent(self, ledger_end: int | None = None) -> bool:
+        """
+        Indice confere com o ledger ate o byte ledger_end (padrao: o fim).
+
+        No append, ledger_end e o offset da entrada recem-escrita, que
+        ainda nao esta no indice.
+        """
+        n = self.size()
+        for path, record_size in ((self._offsets_path(), _OFFSET_SIZE), (self._plan_keys_path(), _PLAN_KEY_SIZE)):
+            if (path.stat().st_size if path.exists() else 0) != n * record_size:
+                return False
+
+        level = 1
+        while (n >> level) > 0:
+            path = self._level_path(level)
+            stored = path.stat().st_size // _HASH_SIZE if path.exists() else 0
+            if stored != n >> level:
+                return False
+            level += 1
+
+        return n == 0 or self._tail_matches(n, ledger_end)
+
+    def _tail_matches(self, n: int, ledger_end: int | None = None) -> bool:
+        # Tamanhos batendo nao bastam: a ultima folha precisa ser a entrada
+        # no offset registrado, e ela precisa ser a ultima do ledger
+        if not self.history_file.exists():
+            return False
+        try:
+            with open_ledger(self.history_file) as f:
+                position = self.entry_offset(n - 1)
+                f.seek(position)
+                raw = f.readline()
+                entry = json.loads(raw.decode("utf-8"))
+                position += len(raw)
+
+                following = []
+                for raw in f:
+                    if ledger_end is not None and position >= ledger_end:
+                        break
+                    position += len(raw)
+                    if raw.strip():
+                        following.append(json.loads(raw.decode("utf-8")))
+        except (OSError, ValueError, EOFError):
+            return False
+
+        if not isinstance(entry, dict) or not isinstance(entry.get("entry_hash"), str):
+            return False
+        if leaf_hash(entry["entry_hash"]) != self._read_node(0, n - 1):
+            return False
+        # Em segmento selado a unica linha seguinte permitida e o footer
+        return all(isinstance(item, dict) and "segment_footer" in item for item in following)
+
+    def root(self) -> str | None:
+        n = self.size()
+        if n == 0:
+            return None
+        return self._subtree_hash(0, n).hex()
+
+    # ---------- Escrita ----------
+    def append(self, entry_hash: str, offset: int, plan_id: str | None = None) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        index = self.size()
+        current = leaf_hash(entry_hash)
+        self._append_record(self._offsets_path(), offset.to_bytes(_OFFSET_SIZE, "big"))
+        self._append_record(self._plan_keys_path(), plan_key(plan_id))
+        self._append_record(self._level_path(0), current)
+
+        # Sobe completando pares: no maximo log2(n) niveis
+        level = 0
+        while index % 2 == 1:
+            left = self._read_node(level, index - 1)
+            current = node_hash(left, current)
+            level += 1
+            index //= 2
+            self._append_record(self._level_path(level), current)
+
+    def rebuild(self) -> int:
+        """Reconstroi o indice a partir do ledger (O(n), uma vez)."""
+        if self.directory.exists():
+            shutil.rmtree(self.directory)
+
+        if not self.history_file.exists():
+            return 0
+
+        count = 0
+        offset = 0
+        with open_ledger(self.history_file) as f:
+            for raw in f:
+                line_offset = offset
+                offset += len(raw)
+                line = raw.strip()
+                if not line:
+                    continue
+                entry = json.loads(line.decode("utf-8"))
+                if "entry_hash" not in entry:
+                    # Footer de segmento selado
+                    continue
+                self.append(entry["entry_hash"], line_offset, entry.get("plan_id"))
+                count += 1
+        return count
+
+    # ---------- Leitura / provas ----------
+    def entry_offset(self, index: int) -> int:
+        with open(self._offsets_path(), "rb") as f:
+            f.seek(index * _OFFSET_SIZE)
+            return int.from_bytes(f.read(_OFFSET_SIZE), "big")
+
+    def read_entries(self, lo: int, hi: int) -> list[dict]:
+        """Le as entradas lo..hi (inclusive, base 0) sem percorrer o resto."""
+        entries = []
+        with open_ledger(self.history_file) as f:
+            f.seek(self.entry_offset(lo))
+            while len(entries) < hi - lo + 1:
+                raw = f.readline()
+                if not raw:
+                    break
+                if raw.strip():
+                    entries.append(json.loads(raw.decode("utf-8")))
+        return entries
+
+    def find_plan(self, plan_id: str) -> int | None:
+        """
+        Indice da ultima folha de plan_id, lendo plan_keys.bin do fim.
+
+        Le 8 bytes por folha em vez de decodificar o ledger; a entrada do
+        candidato e conferida para descartar colisoes do prefixo.
+        """
+        path = self._plan_keys_path()
+        if not path.exists():
+            return None
+
+        key = plan_key(plan_id)
+        with open(path, "rb") as f:
+            end = f.seek(0, os.SEEK_END)
+            while end > 0:
+                start = max(0, end - _PLAN_SCAN_BLOCK)
+                f.seek(start)
+                block = f.read(end - start)
+                for position in range(len(block) - _PLAN_KEY_SIZE, -1, -_PLAN_KEY_SIZE):
+                    if block[position:position + _PLAN_KEY_SIZE] != key:
+                        continue
+                    index = (start + position) // _PLAN_KEY_SIZE
+                    if self.read_entries(index, index)[0].get("plan_id") == plan_id:
+                        return index
+                end = start
+        return None
+
+    def inclusion_proof(self, index: int) -> dict:
+        return self.range_proof(index, index)
+
+    def range_proof(self, lo: int, hi: int) -> dict:
+        n = self.size()
+        if not (0 <= lo <= hi < n):
+            raise IndexError(f"Range {lo}..{hi} outside ledger of {n} entries")
+
+        return {
+            "size": n,
+            "lo": lo,
+            "hi": hi,
+            "root": self._subtree_hash(0, n).hex(),
+            "proof": [h.hex() for h in self._proof(0, n, lo, hi)],
+        }
+
+    def _proof(self, start: int, end: int, lo: int, hi: int) -> list[bytes]:
+        if hi < start or lo >= end:
+            return [self._subtree_hash(start, end)]
+        if lo <= start and end - 1 <= hi:
+            return []
+        k = _split(end - start)
+        return self._proof(start, start + k, lo, hi) + self._proof(start + k, end, lo, hi)
+
+    def _subtree_hash(self, start: int, end: int) -> bytes:
+        width = end - start
+        if width & (width - 1) == 0 and start % width == 0:
+            level = width.bit_length() - 1
+            return self._read_node(level, start >> level)
+        k = _split(width)
+        return node_hash(self._subtree_hash(start, start + k), self._subtree_hash(start + k, end))
+
+    # ---------- Arquivos ----------
+    def _level_path(self, level: int) -> Path:
+        return self.directory / f"level_{level}.bin"
+
+    def _offsets_path(self) -> Path:
+        return self.directory / "offsets.bin"
+
+    def _plan_keys_path(self) -> Path:
+        return self.directory / "plan_keys.bin"
+
+    def _read_node(self, level: int, index: int) -> bytes:
+        with open(self._level_path(level), "rb") as f:
+            f.seek(index * _HASH_SIZE)
+            return f.read(_HASH_SIZE)
+
+    @staticmethod
+    def _append_record(path: Path, record: bytes) -> None:
+        with open(path, "ab") as f:
+            f.write(record)
+
+
+def compute_range_root(entry_hashes: list[str], lo: int, size: int, proof: list[str]) -> str:
+    """Recalcula a raiz a partir de um trecho de entry_hash e da prova."""
+    hi = lo + len(entry_hashes) - 1
+    if not entry_hashes or not (0 <= lo <= hi < size):
+        raise ValueError("Invalid range for proof")
+
+    nodes = [bytes.fromhex(h) for h in proof]
+    leaves = [leaf_hash(h) for h in entry_hashes]
+    position = 0
+
+    def _root(start: int, end: int) -> bytes:
+        nonlocal position
+        if hi < start or lo >= end:
+            if position >= len(nodes):
+                raise ValueError("Proof too short")
+            node = nodes[position]
+            position += 1
+            return node
+        if end - start == 1:
+            return leaves[start - lo]
+        k = _split(end - start)
+        left = _root(start, start + k)
+        return node_hash(left, _root(start + k, end))
+
+    root = _root(0, size)
+    if position != len(nodes):
+        raise ValueError("Proof has unused nodes")
+    return root.hex()
+
+
+def verify_range(entry_hashes: list[str], lo: int, size: int, proof: list[str], root: str) -> bool:
+    try:
+        return compute_range_root(entry_hashes, lo, size, proof) == root
+    except ValueError:
+        return False
+
+
+def verify_inclusion(entry_hash: str, index: int, size: int, proof: list[str], root: str) -> bool:
+    return verify_range([entry_hash], index, size, proof, root)
+
+
+def sync_merkle_index(
+    history_file: Path,
+    entry_hash: str,
+    offset: int,
+    index: int,
+    plan_id: str | None = None,
+) -> None:
+    """Anexa a entrada `index` ao indice, reconstruindo-o se estiver defasado."""
+    merkle = MerkleIndex(history_file)
+
+    if merkle.size() == index and merkle.is_consistent(ledger_end=offset):
+        merkle.append(entry_hash, offset, plan_id)
+        return
+
+    merkle.rebuild()
+
+
+def remove_merkle_index(history_file: Path) -> None:
+    directory = merkle_dir_for(history_file)
+    if directory.exists():
+        shutil.rmtree(directory)
+
+
+def find_entry_index(history_file: Path, plan_id: str) -> int | None:
+    """Indice (base 0) da ultima execuao registrada para plan_id."""
+    if not history_file.exists():
+        return None
+    return _current_index(history_file).find_plan(plan_id)
+
+
+def export_proof(history_file: Path, index: int) -> dict:
+    merkle = _current_index(history_file)
+
+    proof = merkle.inclusion_proof(index)
+    proof["entry"] = merkle.read_entries(index, index)[0]
+    return proof
+
+
+def _current_index(history_file: Path) -> MerkleIndex:
+    merkle = MerkleIndex(history_file)
+    if merkle.size() == 0 or not merkle.is_consistent():
+        merkle.rebuild()
+    return merkle
@@ -0,0 +1,187 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from core.ledger_verify import (
+    LedgerIntegrityError,
+    check_entry_hash,
+    check_previous_hash,
+    parse_entry,
+    verify_sealed_segment,
+)
+
+
+# Abaixo disso o custo de subir processos supera o ganho
+MIN_PARALLEL_BYTES = 4 * 1024 * 1024
+
+
+def split_chunks(path: Path, size: int, parts: int) -> list[tuple[int, int]]:
+    """Divide o arquivo em faixas de bytes alinhadas em inicio de linha."""
+    boundaries = [0]
+
+    with open(path, "rb") as f:
+        for k in range(1, parts):
+            target = max(size * k // parts, boundaries[-1])
+            if target > 0:
+                # Avana ate o inicio da proxima linha
+                f.seek(target - 1)
+                f.readline()
+            position = f.tell()
+            if position >= size:
+                break
+            if position > boundaries[-1]:
+                boundaries.append(position)
+
+    boundaries.append(size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def verify_chunk(path: str, start: int, end: int) -> dict:
+    """
+    Verifica uma faixa do ledger com numeraao de linhas local.
+
+    O encadeamento da primeira linha nao e checado aqui: o previous_hash dela
+    e devolvido para o processo pai costurar as fronteiras entre faixas.
+    """
+    count = 0
+    first_previous = None
+    has_first = False
+    previous_entry_hash = None
+    last_entry_offset = None
+    last_entry_end = None
+    error = None
+
+    offset = start
+
+    with open(path, "rb") as f:
+        f.seek(start)
+
+        while offset < end:
+            raw = f.readline()
+            if not raw:
+                break
+
+            entry_offset = offset
+            offset += len(raw)
+
+            line = raw.strip()
+            if not line:
+                continue
+
+            count += 1
+
+            try:
+                try:
+                    text = line.decode("utf-8")
+                except UnicodeDecodeError as e:
+                    raise LedgerIntegrityError(f"Line {count}: invalid JSON: {e}")
+
+                entry = parse_entry(count, text)
+
+                if count == 1:
+                    has_first = True
+                    first_previous = entry["previous_hash"]
+                else:
+                    check_previous_hash(count, entry, previous_entry_hash)
+
+                previous_entry_hash = check_entry_hash(count, entry)
+            except LedgerIntegrityError as e:
+                error = (count, str(e).split(": ", 1)[1])
+                break
+
+            last_entry_offset = entry_offset
+            last_entry_end = offset
+
+    return {
+        "count": count,
+        "has_first": has_first,
+        "first_previous": first_previous,
+        "last_hash": previous_entry_hash,
+        "last_entry_offset": last_entry_offset,
+        "last_entry_end": last_entry_end,
+        "error": error,
+    }
+
+
+def verify_parallel(
+    path: Path,
+    size: int,
+    workers: int,
+    base_hash: str | None = None,
+) -> dict | None:
+    """
+    Verificaao completa em paralelo.
+
+    Retorna o mesmo resumo de `_verify_stream` ou None quando o arquivo e
+    pequeno demais para compensar. Erros saem com o mesmo numero de linha e
+    mensagem da verificaao sequencial.
+    """
+    if workers <= 1 or size < MIN_PARALLEL_BYTES:
+        return None
+
+    chunks = split_chunks(path, size, workers * 4)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(verify_chunk, str(path), start, end) for start, end in chunks]
+
+        base = 0
+        expected = base_hash
+        last_entry_offset = None
+        last_entry_end = None
+
+        # Costura em ordem: o primeiro erro encontrado e o primeiro do arquivo
+        for future in futures:
+            result = future.result()
+
+            if result["has_first"] and result["first_previous"] != expected:
+                for pending in futures:
+                    pending.cancel()
+                raise LedgerIntegrityError(
+                    f"Line {base + 1}: previous_hash mismatch. "
+                    f"Expected={expected} Got={result['first_previous']}"
+                )
+
+            if result["error"] is not None:
+                for pending in futures:
+                    pending.cancel()
+                local_idx, detail = result["error"]
+                raise LedgerIntegrityError(f"Line {base + local_idx}: {detail}")
+
+            if result["count"]:
+                expected = result["last_hash"]
+                last_entry_offset = result["last_entry_offset"]
+                last_entry_end = result["last_entry_end"]
+            base += result["count"]
+
+    return {
+        "line": base,
+        "entry_hash": expected,
+        "entry_offset": last_entry_offset,
+        "offset": last_entry_end,
+    }
+
+
+def verify_segments_parallel(history_file: Path, records: list[dict], workers: int) -> int:
+    """
+    Verifica segmentos selados em paralelo, um segmento por tarefa.
+
+    Resultados sao consumidos na ordem do manifesto: o erro levantado e o do
+    primeiro segmento invalido, como na verificaao sequencial.
+    """
+    with ProcessPoolExecutor(max_workers=min(workers, len(records))) as pool:
+        futures = [pool.submit(verify_sealed_segment, history_file, record) for record in records]
+
+        total = 0
+        for future in futures:
+            try:
+                total += future.result()
+            except LedgerIntegrityError:
+                for pending in futures:
+                    pending.cancel()
+                raise
+
+    return total
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
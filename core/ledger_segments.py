@@ -0,0 +1,319 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+from core.ledger_merkle import MerkleIndex, export_proof, find_entry_index, merkle_dir_for
+
+
+DEFAULT_SEGMENT_MAX_ENTRIES = 100000
+
+
+def segments_dir_for(history_file: Path) -> Path:
+    return history_file.parent / "segments"
+
+
+def manifest_path_for(history_file: Path) -> Path:
+    return segments_dir_for(history_file) / f"{history_file.stem}.manifest.json"
+
+
+def sealed_merkle_dir_for(history_file: Path, segment: int) -> Path:
+    return segments_dir_for(history_file) / f"{history_file.stem}.{segment:06d}.merkle"
+
+
+def seal_marker_path_for(history_file: Path) -> Path:
+    return segments_dir_for(history_file) / f"{history_file.stem}.sealing.json"
+
+
+def load_manifest(history_file: Path) -> list[dict]:
+    path = manifest_path_for(history_file)
+    if not path.exists():
+        return []
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_manifest(history_file: Path, manifest: list[dict]) -> None:
+    path = manifest_path_for(history_file)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def segment_base_hash(history_file: Path) -> str | None:
+    """previous_hash esperado na primeira entrada do segmento ativo."""
+    manifest = load_manifest(history_file)
+    if not manifest:
+        return None
+    return manifest[-1]["last_hash"]
+
+
+def sealed_entries(history_file: Path) -> int:
+    return sum(record["entries"] for record in load_manifest(history_file))
+
+
+def open_segment(history_file: Path, record: dict):
+    path = segments_dir_for(history_file) / record["file"]
+    if record["file"].endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def sealed_merkle_index(history_file: Path, record: dict) -> MerkleIndex:
+    """Indice de Merkle de um segmento selado, reconstruido se faltar."""
+    merkle = MerkleIndex(
+        segments_dir_for(history_file) / record["file"],
+        sealed_merkle_dir_for(history_file, record["segment"]),
+    )
+    if merkle.size() != record["entries"] or not merkle.is_consistent():
+        merkle.rebuild()
+    return merkle
+
+
+def export_entry_proof(history_file: Path, plan_id: str) -> dict | None:
+    """
+    Prova de inclusao da ultima execuao de plan_id.
+
+    Procura no segmento ativo e depois nos selados, do mais novo ao mais
+    antigo. Para um segmento selado a raiz da prova e o merkle_root do
+    manifesto.
+    """
+    index = find_entry_index(history_file, plan_id)
+    if index is not None:
+        proof = export_proof(history_file, index)
+        proof["segment"] = None
+        return proof
+
+    for record in reversed(load_manifest(history_file)):
+        merkle = sealed_merkle_index(history_file, record)
+        index = merkle.find_plan(plan_id)
+        if index is None:
+            continue
+        proof = merkle.inclusion_proof(index)
+        proof["entry"] = merkle.read_entries(index, index)[0]
+        proof["segment"] = record["segment"]
+        return proof
+
+    return None
+
+
+def read_segment_max_entries() -> int:
+    raw = (os.getenv("LEDGER_SEGMENT_MAX_ENTRIES") or "").strip()
+    if not raw:
+        return DEFAULT_SEGMENT_MAX_ENTRIES
+    try:
+        return max(1, int(raw))
+    except ValueError:
+        return DEFAULT_SEGMENT_MAX_ENTRIES
+
+
+def _read_compress() -> bool:
+    raw = (os.getenv("LEDGER_SEGMENT_COMPRESS") or "").strip().lower()
+    return raw not in {"0", "false", "no", "off"}
+
+
+def _file_sha256(path: Path) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def maybe_seal_segment(history_file: Path, entries: int, lock) -> dict | None:
+    """
+    Sela o segmento ativo ao atingir o tamanho maximo (chamar fora do lock).
+
+    Sob `lock` ficam so a verificaao das entradas apos o checkpoint e o
+    rename do arquivo; a pre-verificaao, o gzip e o sha256 rodam sem ele.
+    """
+    max_entries = read_segment_max_entries()
+    if entries < max_entries:
+        return None
+
+    from core.ledger_head import read_ledger_head
+    from core.ledger_verify import LedgerIntegrityError, advance_checkpoint
+
+    # Pre-verificaao sem o lock: o selo so re-verifica o que chegou depois.
+    # Falhas aqui sao reavaliadas sob o lock pela verificaao do selo.
+    try:
+        advance_checkpoint(history_file, segment_base_hash(history_file))
+    except (LedgerIntegrityError, OSError, ValueError):
+        pass
+
+    with lock():
+        finished = finish_pending_seal(history_file)
+        head = read_ledger_head(history_file)
+        record = None
+        # Outro worker pode ter selado entre o append e o lock
+        if head is not None and head["entries"] >= max_entries:
+            record = seal_active_segment(history_file)
+
+    if finished is not None or record is not None:
+        archive_sealed_segments(history_file, lock)
+    return record
+
+
+def seal_active_segment(history_file: Path) -> dict:
+    """
+    Sela o segmento ativo (chamar sob o history_lock): verifica, move o
+    arquivo para segments/ com um footer e inicia um segmento ativo vazio
+    encadeado ao ultimo hash selado.
+
+    O registro entra no manifesto com sha256=None; compressao e hash ficam
+    para archive_sealed_segments, fora do lock.
+    """
+    from core.ledger_verify import verify_active_segment
+
+    manifest = load_manifest(history_file)
+    base_hash = manifest[-1]["last_hash"] if manifest else None
+    number = (manifest[-1]["segment"] + 1) if manifest else 1
+
+    # Verificado no momento do selo, a partir do ultimo checkpoint
+    result = verify_active_segment(history_file, base_hash)
+    if result["line"] == 0:
+        raise ValueError("Cannot seal an empty ledger segment")
+
+    merkle = MerkleIndex(history_file)
+    if merkle.size() != result["line"] or not merkle.is_consistent():
+        merkle.rebuild()
+
+    record = {
+        "segment": number,
+        "entries": result["line"],
+        "first_previous_hash": base_hash,
+        "last_hash": result["entry_hash"],
+        "merkle_root": merkle.root(),
+        "sealed_at": datetime.utcnow().isoformat() + "Z",
+        "file": f"{history_file.stem}.{number:06d}{history_file.suffix}",
+        "sha256": None,
+    }
+
+    segments_dir_for(history_file).mkdir(parents=True, exist_ok=True)
+
+    # Intenao gravada antes de tocar no manifesto: um crash daqui em diante
+    # e concluido por finish_pending_seal em vez de deixar o segmento ativo
+    # com entradas que o manifesto ja da como seladas
+    _write_json_atomic(seal_marker_path_for(history_file), record)
+    return _complete_seal(history_file, record)
+
+
+def archive_sealed_segments(history_file: Path, lock, compress: bool | None = None) -> int:
+    """
+    Conclui o arquivamento dos segmentos selados: gzip opcional e sha256.
+
+    Roda fora do history_lock; so a troca do registro no manifesto e feita
+    sob `lock`. Idempotente: segmentos ja arquivados sao ignorados.
+    Retorna quantos segmentos foram arquivados.
+    """
+    if compress is None:
+        compress = _read_compress()
+
+    segments_dir = segments_dir_for(history_file)
+    archived = 0
+
+    for record in load_manifest(history_file):
+        if record.get("sha256") is not None:
+            continue
+
+        source = segments_dir / record["file"]
+        name = record["file"] + ".gz" if compress else record["file"]
+        tmp_target = None
+        if compress:
+            tmp_target = segments_dir / f".{name}.{os.getpid()}.tmp"
+            with open(source, "rb") as src, gzip.open(tmp_target, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+        digest = _file_sha256(tmp_target or source)
+
+        with lock():
+            manifest = load_manifest(history_file)
+            current = next((r for r in manifest if r["segment"] == record["segment"]), None)
+            # Outro processo arquivou primeiro
+            if current is None or current.get("sha256") is not None:
+                if tmp_target is not None:
+                    tmp_target.unlink(missing_ok=True)
+                continue
+
+            if tmp_target is not None:
+                os.replace(tmp_target, segments_dir / name)
+            current["file"] = name
+            current["sha256"] = digest
+            save_manifest(history_file, manifest)
+            if name != record["file"]:
+                source.unlink(missing_ok=True)
+        archived += 1
+
+    return archived
+
+
+def finish_pending_seal(history_file: Path) -> dict | None:
+    """
+    Conclui um selo interrompido por crash (chamar sob o history_lock).
+
+    Sem marcador de selo pendente custa apenas um stat.
+    """
+    marker = seal_marker_path_for(history_file)
+    if not marker.exists():
+        return None
+    record = json.loads(marker.read_text(encoding="utf-8"))
+    return _complete_seal(history_file, record)
+
+
+def _complete_seal(history_file: Path, record: dict) -> dict:
+    """Passos idempotentes do selo, a partir do arquivo ja arquivado."""
+    from core.ledger_head import head_path_for
+    from core.ledger_verify import checkpoint_path_for
+
+    manifest = load_manifest(history_file)
+    if not manifest or manifest[-1]["segment"] < record["segment"]:
+        manifest.append(record)
+        save_manifest(history_file, manifest)
+
+    # Provas do segmento selado continuam disponiveis
+    sealed_merkle = sealed_merkle_dir_for(history_file, record["segment"])
+    if merkle_dir_for(history_file).exists():
+        if sealed_merkle.exists():
+            shutil.rmtree(sealed_merkle)
+        os.replace(merkle_dir_for(history_file), sealed_merkle)
+
+    # Arquiva o segmento ativo por rename e anexa o footer; um selo retomado
+    # encontra o arquivo ja movido e so completa o footer
+    target = segments_dir_for(history_file) / record["file"]
+    if not target.exists() and history_file.exists():
+        os.replace(history_file, target)
+    if record.get("sha256") is None and not _ends_with_footer(target):
+        footer = {k: v for k, v in record.items() if k not in ("file", "sha256")}
+        with open(target, "ab") as f:
+            f.write((json.dumps({"segment_footer": footer}) + "\n").encode("utf-8"))
+
+    # Novo segmento ativo vazio
+    tmp_active = history_file.with_name(f".{history_file.name}.tmp")
+    tmp_active.write_bytes(b"")
+    os.replace(tmp_active, history_file)
+
+    for sidecar in (checkpoint_path_for(history_file), head_path_for(history_file)):
+        if sidecar.exists():
+            sidecar.unlink()
+
+    seal_marker_path_for(history_file).unlink(missing_ok=True)
+    return record
+
+
+def _ends_with_footer(path: Path) -> bool:
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(0, size - 4096))
+        lines = [raw for raw in f.read().splitlines() if raw.strip()]
+    return bool(lines) and lines[-1].startswith(b'{"segment_footer"')
+
+
+def _write_json_atomic(path: Path, data) -> None:
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
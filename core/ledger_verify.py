@@ -1,7 +1,20 @@
 import json
 import hashlib
+import os
 from pathlib import Path
 
+from core.ledger_head import write_ledger_head
+from core.ledger_merkle import remove_merkle_index, sync_merkle_index
+from core.ledger_segments import (
+    archive_sealed_segments,
+    finish_pending_seal,
+    load_manifest,
+    open_segment,
+    seal_marker_path_for,
+    segment_base_hash,
+    segments_dir_for,
+)
+
 
 HISTORY_FILE = Path("ai/history/execution_history.log")
 
@@ -16,64 +29,364 @@ def compute_entry_hash(entry_core: dict) -> str:
     return hasher.hexdigest()
 
 
-def verify_ledger() -> dict:
-    if not HISTORY_FILE.exists():
-        return {
-            "ok": True,
-            "entries": 0,
-            "message": "Ledger file not found (treated as empty/OK)."
-        }
+def parse_entry(idx: int, line: str) -> dict:
+    try:
+        entry = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise LedgerIntegrityError(f"Line {idx}: invalid JSON: {e}")
+
+    if "entry_hash" not in entry:
+        raise LedgerIntegrityError(f"Line {idx}: missing entry_hash")
+
+    if "previous_hash" not in entry:
+        raise LedgerIntegrityError(f"Line {idx}: missing previous_hash")
+
+    return entry
+
+
+def check_previous_hash(idx: int, entry: dict, previous_entry_hash: str | None) -> None:
+    # Verificaao do encadeamento
+    if entry["previous_hash"] != previous_entry_hash:
+        raise LedgerIntegrityError(
+            f"Line {idx}: previous_hash mismatch. Expected={previous_entry_hash} Got={entry['previous_hash']}"
+        )
+
+
+def check_entry_hash(idx: int, entry: dict) -> str:
+    # Recalcular hash (sem entry_hash)
+    entry_core = dict(entry)
+    entry_hash = entry_core.pop("entry_hash")
+
+    recalculated = compute_entry_hash(entry_core)
+
+    if recalculated != entry_hash:
+        raise LedgerIntegrityError(
+            f"Line {idx}: entry_hash mismatch. Expected={recalculated} Got={entry_hash}"
+        )
+
+    return entry_hash
+
+
+def verify_entry(idx: int, line: str, previous_entry_hash: str | None) -> str:
+    """Valida uma linha do ledger e retorna seu entry_hash."""
+    entry = parse_entry(idx, line)
+    check_previous_hash(idx, entry, previous_entry_hash)
+    return check_entry_hash(idx, entry)
+
+
+def checkpoint_path_for(history_file: Path) -> Path:
+    return history_file.with_suffix(".checkpoint.json")
+
+
+def load_checkpoint() -> dict | None:
+    return _read_checkpoint(checkpoint_path_for(HISTORY_FILE))
+
+
+def _read_checkpoint(path: Path) -> dict | None:
+    if not path.exists():
+        return None
+
+    try:
+        checkpoint = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
 
-    with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-        lines = [line.strip() for line in f.readlines() if line.strip()]
+    required = ("entry_offset", "offset", "line", "entry_hash")
+    if not isinstance(checkpoint, dict) or any(k not in checkpoint for k in required):
+        return None
 
-    if not lines:
-        return {"ok": True, "entries": 0, "message": "Ledger empty/OK."}
+    return checkpoint
 
-    previous_entry_hash = None
 
-    for idx, line in enumerate(lines, start=1):
+def save_checkpoint(checkpoint: dict, history_file: Path | None = None) -> None:
+    path = checkpoint_path_for(history_file or HISTORY_FILE)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def clear_checkpoint() -> None:
+    path = checkpoint_path_for(HISTORY_FILE)
+    if path.exists():
+        path.unlink()
+
+
+def _verify_stream(f, offset: int, idx: int, previous_entry_hash: str | None) -> dict:
+    """
+    Verifica as linhas a partir da posicao atual de `f` (modo binario).
+
+    `offset` e a posicao atual, `idx` o numero da ultima linha ja verificada.
+    """
+    last_entry_offset = None
+
+    for raw in f:
+        entry_offset = offset
+        offset += len(raw)
+
+        line = raw.strip()
+        if not line:
+            continue
+
+        idx += 1
+
         try:
-            entry = json.loads(line)
-        except json.JSONDecodeError as e:
+            text = line.decode("utf-8")
+        except UnicodeDecodeError as e:
             raise LedgerIntegrityError(f"Line {idx}: invalid JSON: {e}")
 
-        if "entry_hash" not in entry:
-            raise LedgerIntegrityError(f"Line {idx}: missing entry_hash")
+        previous_entry_hash = verify_entry(idx, text, previous_entry_hash)
+        last_entry_offset = entry_offset
+        last_entry_end = offset
 
-        if "previous_hash" not in entry:
-            raise LedgerIntegrityError(f"Line {idx}: missing previous_hash")
+    if last_entry_offset is None:
+        return {"line": idx, "entry_hash": previous_entry_hash, "entry_offset": None, "offset": None}
 
-        # Verificaao do encadeamento
-        if entry["previous_hash"] != previous_entry_hash:
-            raise LedgerIntegrityError(
-                f"Line {idx}: previous_hash mismatch. Expected={previous_entry_hash} Got={entry['previous_hash']}"
-            )
+    return {
+        "line": idx,
+        "entry_hash": previous_entry_hash,
+        "entry_offset": last_entry_offset,
+        "offset": last_entry_end,
+    }
+
+
+def _checkpoint_still_valid(f, checkpoint: dict, size: int) -> bool:
+    if checkpoint["offset"] > size or checkpoint["entry_offset"] >= checkpoint["offset"]:
+        return False
+
+    # A entrada do checkpoint precisa continuar identica e alinhada em linha
+    start = max(0, checkpoint["entry_offset"] - 1)
+    f.seek(start)
+    raw = f.read(checkpoint["offset"] - start)
+
+    if checkpoint["entry_offset"] > 0:
+        if raw[:1] != b"\n":
+            return False
+        raw = raw[1:]
 
-        # Recalcular hash (sem entry_hash)
+    if not raw.endswith(b"\n") or raw[:1] != b"{":
+        return False
+
+    try:
+        entry = json.loads(raw.decode("utf-8"))
         entry_core = dict(entry)
         entry_hash = entry_core.pop("entry_hash")
+    except (ValueError, AttributeError, KeyError):
+        return False
+
+    return entry_hash == checkpoint["entry_hash"] and compute_entry_hash(entry_core) == entry_hash
+
+
+def verify_active_segment(path: Path, base_hash: str | None) -> dict:
+    """
+    Verificaao de um segmento ativo (sem footer) para o selo.
+
+    O selo roda no caminho do append: quando o checkpoint ainda vale, so as
+    entradas apos ele sao re-verificadas.
+    """
+    checkpoint = _read_checkpoint(checkpoint_path_for(path))
+
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
 
-        recalculated = compute_entry_hash(entry_core)
+        if checkpoint is None or not _checkpoint_still_valid(f, checkpoint, size):
+            f.seek(0)
+            return _verify_stream(f, 0, 0, base_hash)
 
-        if recalculated != entry_hash:
+        f.seek(checkpoint["offset"])
+        result = _verify_stream(f, checkpoint["offset"], checkpoint["line"], checkpoint["entry_hash"])
+        if result["entry_offset"] is None:
+            return dict(checkpoint)
+        return result
+
+
+def advance_checkpoint(path: Path, base_hash: str | None) -> dict:
+    """
+    Verifica o segmento ativo e grava o checkpoint, sem o history_lock.
+
+    Um checkpoint gravado depois de um selo concorrente nao confere com o
+    novo segmento ativo e e descartado por `_checkpoint_still_valid`.
+    """
+    result = verify_active_segment(path, base_hash)
+    if result["entry_offset"] is not None:
+        save_checkpoint({
+            "entry_offset": result["entry_offset"],
+            "offset": result["offset"],
+            "line": result["line"],
+            "entry_hash": result["entry_hash"],
+        }, path)
+    return result
+
+
+def verify_segment_chain() -> int:
+    """
+    Confere o encadeamento entre segmentos selados pelo manifesto.
+
+    Custa O(segmentos): o conteudo selado ja foi verificado no selo.
+    Retorna o total de entradas seladas.
+    """
+    previous_last = None
+    total = 0
+
+    for record in load_manifest(HISTORY_FILE):
+        if record["first_previous_hash"] != previous_last:
             raise LedgerIntegrityError(
-                f"Line {idx}: entry_hash mismatch. Expected={recalculated} Got={entry_hash}"
+                f"Segment {record['segment']}: previous_hash mismatch. "
+                f"Expected={previous_last} Got={record['first_previous_hash']}"
+            )
+        previous_last = record["last_hash"]
+        total += record["entries"]
+
+    return total
+
+
+def verify_sealed_segment(history_file: Path, record: dict) -> int:
+    """Re-verifica o conteudo de um segmento selado contra o manifesto."""
+    label = f"Segment {record['segment']}"
+    path = segments_dir_for(history_file) / record["file"]
+
+    if not path.exists():
+        raise LedgerIntegrityError(f"{label}: file missing ({record['file']})")
+
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            hasher.update(chunk)
+    # sha256=None: selado, mas ainda nao arquivado (ver archive_sealed_segments)
+    if record["sha256"] is not None and hasher.hexdigest() != record["sha256"]:
+        raise LedgerIntegrityError(f"{label}: archive sha256 mismatch")
+
+    with open_segment(history_file, record) as f:
+        lines = [raw for raw in f if raw.strip()]
+
+    footer = json.loads(lines.pop().decode("utf-8")).get("segment_footer") if lines else None
+    if not footer or footer.get("last_hash") != record["last_hash"] or footer.get("entries") != record["entries"]:
+        raise LedgerIntegrityError(f"{label}: footer mismatch")
+
+    previous_entry_hash = record["first_previous_hash"]
+    for idx, raw in enumerate(lines, start=1):
+        try:
+            previous_entry_hash = verify_entry(idx, raw.decode("utf-8").strip(), previous_entry_hash)
+        except LedgerIntegrityError as e:
+            raise LedgerIntegrityError(f"{label} {e}")
+
+    if len(lines) != record["entries"] or previous_entry_hash != record["last_hash"]:
+        raise LedgerIntegrityError(f"{label}: entry count or last hash mismatch")
+
+    return record["entries"]
+
+
+def verify_sealed_segments(workers: int = 1) -> int:
+    """
+    Auditoria profunda: re-verifica o conteudo de cada segmento selado.
+
+    Com `workers > 1` os segmentos sao verificados em processos separados;
+    o erro reportado continua sendo o do primeiro segmento do manifesto.
+    """
+    records = load_manifest(HISTORY_FILE)
+
+    if workers > 1 and len(records) > 1:
+        from core.ledger_parallel import verify_segments_parallel
+        return verify_segments_parallel(HISTORY_FILE, records, workers)
+
+    return sum(verify_sealed_segment(HISTORY_FILE, record) for record in records)
+
+
+def verify_ledger(full: bool = False, workers: int = 1) -> dict:
+    """
+    Verifica o encadeamento do ledger.
+
+    Por padrao re-verifica apenas o trecho apos o ultimo checkpoint (apos
+    confirmar que a entrada do checkpoint nao mudou). `full=True` refaz a
+    cadeia inteira desde o genesis, para auditoria; com `workers > 1` a
+    verificaao completa e dividida entre processos.
+
+    Segmentos selados entram apenas pelo encadeamento do manifesto; em
+    `full=True` o conteudo deles tambem e re-verificado. Numeros de linha
+    nos erros sao relativos ao segmento.
+    """
+    from core.executor import history_lock
+
+    if seal_marker_path_for(HISTORY_FILE).exists():
+        with history_lock():
+            finish_pending_seal(HISTORY_FILE)
+    # Retoma arquivamentos interrompidos (gzip/sha256 fora do lock)
+    archive_sealed_segments(HISTORY_FILE, history_lock)
+
+    sealed = verify_sealed_segments(workers) if full else verify_segment_chain()
+    base_hash = segment_base_hash(HISTORY_FILE)
+
+    if not HISTORY_FILE.exists():
+        return {
+            "ok": True,
+            "entries": sealed,
+            "message": "Ledger file not found (treated as empty/OK)."
+        }
+
+    checkpoint = None if full else load_checkpoint()
+
+    with open(HISTORY_FILE, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+
+        if checkpoint is not None and _checkpoint_still_valid(f, checkpoint, size):
+            f.seek(checkpoint["offset"])
+            result = _verify_stream(
+                f,
+                checkpoint["offset"],
+                checkpoint["line"],
+                checkpoint["entry_hash"],
             )
+            mode = "incremental"
+            verified = result["line"] - checkpoint["line"]
+            if result["entry_offset"] is None:
+                result = dict(checkpoint)
+        else:
+            result = None
+            if workers > 1:
+                from core.ledger_parallel import verify_parallel
+                result = verify_parallel(HISTORY_FILE, size, workers, base_hash)
+
+            if result is None:
+                f.seek(0)
+                result = _verify_stream(f, 0, 0, base_hash)
+            mode = "full"
+            verified = result["line"]
+
+    if result["line"] == 0:
+        clear_checkpoint()
+        return {"ok": True, "entries": sealed, "message": "Ledger empty/OK."}
 
-        previous_entry_hash = entry_hash
+    try:
+        save_checkpoint({
+            "entry_offset": result["entry_offset"],
+            "offset": result["offset"],
+            "line": result["line"],
+            "entry_hash": result["entry_hash"],
+        })
+    except OSError:
+        pass
 
-    return {"ok": True, "entries": len(lines), "message": "Ledger integrity OK."}
+    return {
+        "ok": True,
+        "entries": sealed + result["line"],
+        "active_entries": result["line"],
+        "verified_entries": verified,
+        "mode": mode,
+        "message": "Ledger integrity OK.",
+    }
 
 def recover_ledger() -> dict:
     if not HISTORY_FILE.exists():
         return {"ok": True, "message": "No ledger to recover."}
 
-    # Backup automatico
+    clear_checkpoint()
+
+    # Backup automatico (apenas o segmento ativo; selados sao preservados)
     backup_path = HISTORY_FILE.with_suffix(".corrupted.bak")
     HISTORY_FILE.rename(backup_path)
 
-    # Criar novo genesis block
+    # Criar novo genesis block, encadeado ao ultimo segmento selado
     genesis_entry = {
         "timestamp": "GENESIS_RECOVERY",
         "plan_id": "LEDGER_RECOVERY",
@@ -82,7 +395,7 @@ def recover_ledger() -> dict:
         "policy_sha256": None,
         "policy_version": None,
         "risk_score": None,
-        "previous_hash": None,
+        "previous_hash": segment_base_hash(HISTORY_FILE),
     }
 
     # Calcular hash do genesis
@@ -92,8 +405,19 @@ def recover_ledger() -> dict:
 
     genesis_entry["entry_hash"] = genesis_hash
 
-    with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-        f.write(json.dumps(genesis_entry) + "\n")
+    with open(HISTORY_FILE, "wb") as f:
+        f.write((json.dumps(genesis_entry) + "\n").encode("utf-8"))
+        size = f.tell()
+
+    write_ledger_head(HISTORY_FILE, {
+        "offset": 0,
+        "size": size,
+        "entry_hash": genesis_hash,
+        "entries": 1,
+    })
+
+    remove_merkle_index(HISTORY_FILE)
+    sync_merkle_index(HISTORY_FILE, genesis_hash, 0, 0, genesis_entry["plan_id"])
 
     return {
         "ok": True,
@@ -1,59 +1,446 @@
+import atexit
 import json
 import os
+import threading
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 
+from core.anomaly_detector import AnomalyDetector, detector_from_env
+from core.decision_log import DecisionLogWriter, writer_from_env
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - plataformas sem fcntl
+    fcntl = None
+
 DECISION_LOG_PATH = os.path.join("logs", "decisions.log")
 METRICS_FILE = Path("data/autonomy_metrics.json")
 DECISIONS_FILE = Path("logs/decisions.log")
 
+DEFAULT_METRICS_FLUSH_INTERVAL_SECONDS = 5.0
+
+
+_DECISION_WRITER: DecisionLogWriter | None = None
+_DECISION_WRITER_LOCK = threading.Lock()
+
+_ANOMALY_DETECTOR: AnomalyDetector | None = None
+_ANOMALY_DETECTOR_LOADED = False
+# Evita recursao: eventos "anomaly" passam por log_decision
+_ANOMALY_GUARD = threading.local()
 
-def log_decision(event: dict):
-    os.makedirs("logs", exist_ok=True)
 
+def get_decision_log_writer() -> DecisionLogWriter:
+    global _DECISION_WRITER
+
+    if _DECISION_WRITER is None:
+        with _DECISION_WRITER_LOCK:
+            if _DECISION_WRITER is None:
+                _DECISION_WRITER = writer_from_env(DECISION_LOG_PATH)
+                atexit.register(_DECISION_WRITER.close)
+
+    return _DECISION_WRITER
+
+
+def log_decision(event: dict):
     event_record = {
         "timestamp": datetime.utcnow().isoformat() + "Z",
         **event
     }
 
-    with open(DECISION_LOG_PATH, "a", encoding="utf-8") as f:
-        f.write(json.dumps(event_record) + "\n")
+    line = json.dumps(event_record) + "\n"
 
-def load_metrics() -> dict:
+    _write_decisions(line)
+    _observe_anomalies([event_record])
+
+
+def log_decisions(events: list[dict]) -> None:
+    """Varios registros numa unica escrita (mesmo timestamp)."""
+    if not events:
+        return
+
+    timestamp = datetime.utcnow().isoformat() + "Z"
+    payload = "".join(
+        json.dumps({"timestamp": timestamp, **event}) + "\n"
+        for event in events
+    )
+
+    _write_decisions(payload)
+    _observe_anomalies(events)
+
+
+def _write_decisions(payload: str) -> None:
+    if not _decision_log_async():
+        os.makedirs(os.path.dirname(DECISION_LOG_PATH) or ".", exist_ok=True)
+        with open(DECISION_LOG_PATH, "a", encoding="utf-8") as f:
+            f.write(payload)
+        return
+
+    get_decision_log_writer().write(payload)
+
+
+def get_anomaly_detector() -> AnomalyDetector | None:
+    global _ANOMALY_DETECTOR, _ANOMALY_DETECTOR_LOADED
+
+    if not _ANOMALY_DETECTOR_LOADED:
+        with _DECISION_WRITER_LOCK:
+            if not _ANOMALY_DETECTOR_LOADED:
+                _ANOMALY_DETECTOR = detector_from_env()
+                _ANOMALY_DETECTOR_LOADED = True
+                if _ANOMALY_DETECTOR is not None:
+                    atexit.register(_ANOMALY_DETECTOR.save)
+
+    return _ANOMALY_DETECTOR
+
+
+def _observe_anomalies(events: list[dict]) -> None:
+    detector = get_anomaly_detector()
+    if detector is None or getattr(_ANOMALY_GUARD, "active", False):
+        return
+
+    _ANOMALY_GUARD.active = True
+    try:
+        anomalies = []
+        for event in events:
+            anomalies.extend(detector.observe(event))
+
+        for anomaly in anomalies:
+            log_decision(anomaly)
+            increment_metric("anomaly_detected")
+    except Exception:
+        # Fail-safe: o detector nunca impede o registro da decisao
+        pass
+    finally:
+        _ANOMALY_GUARD.active = False
+
+
+def flush_decision_log(timeout: float | None = 2.0) -> bool:
+    if _DECISION_WRITER is None:
+        return True
+    return _DECISION_WRITER.flush(timeout)
+
+
+def _decision_log_async() -> bool:
+    raw = (os.getenv("DECISION_LOG_ASYNC") or "").strip().lower()
+    return raw not in {"0", "false", "no", "off"}
+
+
+def _read_metrics_file() -> dict:
     if not METRICS_FILE.exists():
         return {}
 
     with open(METRICS_FILE, "r", encoding="utf-8") as f:
         return json.load(f)
 
+
+def _apply_deltas(metrics: dict, deltas: dict) -> dict:
+    for name, amount in deltas.items():
+        current = metrics.get(name, 0)
+
+        if not isinstance(current, int):
+            current = 0
+
+        metrics[name] = current + amount
+
+    return metrics
+
+
+@contextmanager
+def _metrics_file_lock():
+    METRICS_FILE.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(METRICS_FILE.with_suffix(".lock"), "a+", encoding="utf-8") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
 def save_metrics(metrics: dict) -> None:
-    os.makedirs("data", exist_ok=True)
-    with open(METRICS_FILE, "w", encoding="utf-8") as f:
+    METRICS_FILE.parent.mkdir(parents=True, exist_ok=True)
+
+    # Escrita atomica: arquivo temporario + rename
+    tmp_path = METRICS_FILE.with_name(f".{METRICS_FILE.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
         json.dump(metrics, f, indent=2)
+    os.replace(tmp_path, METRICS_FILE)
 
 
-def increment_metric(name: str, amount: int = 1) -> None:
+class MetricsRegistry:
+    """
+    Contadores em memoria com flush agrupado para METRICS_FILE.
+
+    Guarda apenas os deltas pendentes deste processo; o flush relê o arquivo,
+    soma os deltas e grava tudo de uma vez, preservando incrementos feitos
+    por outros processos entre flushes.
+    """
+
+    def __init__(self, flush_interval: float | None = None):
+        self.flush_interval = (
+            _read_flush_interval() if flush_interval is None else flush_interval
+        )
+        self._pending: dict = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._pending[name] = self._pending.get(name, 0) + amount
+
+        if self._thread is None and self.flush_interval > 0:
+            self._start_flusher()
+
+    def pending(self) -> dict:
+        with self._lock:
+            return dict(self._pending)
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                deltas = self._pending
+                self._pending = {}
+
+            try:
+                # Leitura-soma-escrita sob flock: sem ele, dois processos
+                # leem o mesmo valor e um dos deltas se perde no replace
+                with _metrics_file_lock():
+                    try:
+                        metrics = _read_metrics_file()
+                    except Exception:
+                        # Fail-safe: se metrics estiver corrompido, reinicia
+                        metrics = {}
+
+                    save_metrics(_apply_deltas(metrics, deltas))
+            except Exception:
+                # Devolve os deltas para a proxima tentativa
+                with self._lock:
+                    for name, amount in deltas.items():
+                        self._pending[name] = self._pending.get(name, 0) + amount
+                raise
+
+    def close(self) -> None:
+        self._stop.set()
+        try:
+            self.flush()
+        except Exception:
+            pass
+
+    def _start_flusher(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run,
+                name="metrics-flusher",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+
+def _read_flush_interval() -> float:
+    raw = (os.getenv("METRICS_FLUSH_INTERVAL_SECONDS") or "").strip()
+    if not raw:
+        return DEFAULT_METRICS_FLUSH_INTERVAL_SECONDS
     try:
-        metrics = load_metrics()
-    except Exception:
-        # Fail-safe: se metrics estiver corrompido, reinicia
-        metrics = {}
+        return max(0.0, float(raw))
+    except ValueError:
+        return DEFAULT_METRICS_FLUSH_INTERVAL_SECONDS
 
-    current = metrics.get(name, 0)
 
-    if not isinstance(current, int):
-        current = 0
+_METRICS_REGISTRY = MetricsRegistry()
+atexit.register(_METRICS_REGISTRY.close)
 
-    metrics[name] = current + amount
-    save_metrics(metrics)
+
+def get_metrics_registry() -> MetricsRegistry:
+    return _METRICS_REGISTRY
+
+
+def load_metrics() -> dict:
+    # Inclui deltas ainda nao persistidos deste processo
+    return _apply_deltas(_CONTEXT_SNAPSHOT.metrics(), _METRICS_REGISTRY.pending())
+
+
+def increment_metric(name: str, amount: int = 1) -> None:
+    _METRICS_REGISTRY.increment(name, amount)
+
+
+def flush_metrics() -> None:
+    _METRICS_REGISTRY.flush()
 
 
 def load_last_decisions(limit: int = 5) -> list:
-    if not DECISIONS_FILE.exists():
-        return []
+    """
+    Ultimas decisoes, incluindo as deste processo ainda na fila do writer.
+
+    As pendentes sao lidas antes do arquivo: uma linha gravada entre as duas
+    leituras aparece nos dois lados e e descartada da parte pendente.
+    """
+    writer = _DECISION_WRITER
+    pending = writer.pending_lines(limit) if writer is not None and limit > 0 else []
+    decisions = _CONTEXT_SNAPSHOT.last_decisions(limit)
+    if not pending:
+        return decisions
+
+    for line in pending:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record not in decisions:
+            decisions.append(record)
+    return decisions[-limit:]
+
+
+class ContextSnapshot:
+    """
+    Ultimas decisoes e metricas mantidas em memoria.
+
+    O log de decisoes e acompanhado por offset: cada leitura so le os bytes
+    anexados desde a anterior (deste ou de outros processos), com custo
+    independente do tamanho do log. Troca de inode ou truncamento (rotaao)
+    recomea pelas ultimas TAIL_BYTES. As metricas so sao relidas quando
+    inode/tamanho/mtime do arquivo mudam.
+    """
+
+    MAX_DECISIONS = 100
+    TAIL_BYTES = 64 * 1024
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._decisions: deque = deque(maxlen=self.MAX_DECISIONS)
+        self._decisions_source: tuple | None = None
+        self._offset = 0
+        self._skip_partial = False
+        self._metrics_signature: tuple | None = None
+        self._metrics: dict = {}
+
+    def last_decisions(self, limit: int) -> list:
+        if limit <= 0:
+            return []
+
+        path = Path(DECISIONS_FILE)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            with self._lock:
+                self._reset_decisions(None, 0)
+            return []
+
+        with self._lock:
+            source = (str(path), stat.st_ino)
+            if source != self._decisions_source or stat.st_size < self._offset:
+                self._reset_decisions(source, stat.st_size)
+            elif stat.st_size - self._offset > self.TAIL_BYTES:
+                # Muito escrito desde a ultima leitura: so o fim interessa
+                self._reset_decisions(source, stat.st_size)
+
+            if stat.st_size > self._offset:
+                self._read_new_lines(path, stat.st_size)
+
+            decisions = list(self._decisions)
+
+        if limit > self.MAX_DECISIONS:
+            return _read_last_decisions(path, limit)
+        return decisions[-limit:]
+
+    def metrics(self) -> dict:
+        path = Path(METRICS_FILE)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return {}
+
+        signature = (str(path), stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            if signature != self._metrics_signature:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._metrics = json.load(f)
+                self._metrics_signature = signature
+            return dict(self._metrics)
+
+    def _reset_decisions(self, source: tuple | None, size: int) -> None:
+        self._decisions.clear()
+        self._decisions_source = source
+        self._offset = max(0, size - self.TAIL_BYTES)
+        self._skip_partial = self._offset > 0
+
+    def _read_new_lines(self, path: Path, size: int) -> None:
+        start = self._offset
+        with open(path, "rb") as f:
+            f.seek(start)
+            data = f.read(size - start)
+
+        # Comeando no meio do arquivo, a primeira linha esta cortada
+        if self._skip_partial:
+            boundary = data.find(b"\n")
+            if boundary < 0:
+                return
+            data = data[boundary + 1:]
+            start += boundary + 1
+            self._skip_partial = False
+
+        # Linha final sem "\n" ainda esta sendo escrita: fica para depois
+        end = data.rfind(b"\n")
+        if end < 0:
+            self._offset = start
+            return
+
+        for line in data[:end].split(b"\n"):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            self._decisions.append(record)
+
+        self._offset = start + end + 1
+
+
+def _read_last_decisions(path: Path, limit: int, block_size: int = 64 * 1024) -> list:
+    """Le as ultimas `limit` linhas de tras para frente, sem varrer o log."""
+    with open(path, "rb") as f:
+        position = f.seek(0, os.SEEK_END)
+        data = b""
+        while position > 0 and data.count(b"\n") <= limit:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+
+    lines = data.split(b"\n")
+    # Sem chegar ao inicio do arquivo, a primeira linha esta cortada
+    if position > 0:
+        lines = lines[1:]
+
+    records = []
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue
+    return records[-limit:]
+
+
+_CONTEXT_SNAPSHOT = ContextSnapshot()
 
-    with open(DECISIONS_FILE, "r", encoding="utf-8") as f:
-        lines = f.readlines()
 
-    last_lines = lines[-limit:]
-    return [json.loads(line) for line in last_lines]
+def get_context_snapshot() -> ContextSnapshot:
+    return _CONTEXT_SNAPSHOT
@@ -1,3 +1,4 @@
+import hashlib
 import json
 from pathlib import Path
 from datetime import datetime
@@ -40,6 +41,22 @@ def load_plan(path: str) -> dict:
             raise PlanValidationError(f"Invalid JSON format: {e}")
 
 
+def load_plan_with_digest(path: str) -> tuple[dict, str]:
+    """Como load_plan, devolvendo tambem o SHA-256 do arquivo (uma leitura)."""
+    plan_path = Path(path)
+
+    if not plan_path.exists():
+        raise PlanValidationError(f"Plan file not found: {path}")
+
+    raw = plan_path.read_bytes()
+    try:
+        data = json.loads(raw.decode("utf-8"))
+    except json.JSONDecodeError as e:
+        raise PlanValidationError(f"Invalid JSON format: {e}")
+
+    return data, hashlib.sha256(raw).hexdigest()
+
+
 def validate_plan_structure(plan: dict) -> None:
     required_fields = [
         "schema_version",
@@ -0,0 +1,148 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from pathlib import Path
+
+
+DEFAULT_POLL_INTERVAL_SECONDS = 0.25
+
+# inotify(7)
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class QueueWatcher:
+    """
+    Espera mudanas nos arquivos da fila de intents.
+
+    No Linux usa inotify (via ctypes) nos diretorios dos arquivos e filtra
+    pelo nome; sem inotify, faz polling de (inode, mtime, tamanho). Arquivos
+    derivados (ex.: `intents_queue.db-wal`) contam como mudana do original.
+    """
+
+    def __init__(
+        self,
+        paths: list[Path],
+        poll_interval: float = DEFAULT_POLL_INTERVAL_SECONDS,
+        use_inotify: bool | None = None,
+    ):
+        self.paths = [Path(p) for p in paths]
+        self.poll_interval = poll_interval
+        self._names = {p.name for p in self.paths}
+        self._fd = None
+        self._stats = self._snapshot()
+
+        if use_inotify is None:
+            use_inotify = _read_watch_mode() != "poll"
+        if use_inotify:
+            self._fd = _inotify_open({p.parent for p in self.paths})
+
+    @property
+    def mode(self) -> str:
+        return "inotify" if self._fd is not None else "poll"
+
+    def wait(self, timeout: float) -> bool:
+        """Bloqueia ate uma mudana ou timeout. Retorna True se houve mudana."""
+        if self._fd is not None:
+            return self._wait_inotify(timeout)
+        return self._wait_poll(timeout)
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _wait_inotify(self, timeout: float) -> bool:
+        deadline = time.monotonic() + max(0.0, timeout)
+
+        while True:
+            remaining = max(0.0, deadline - time.monotonic())
+            ready, _, _ = select.select([self._fd], [], [], remaining)
+            if not ready:
+                return False
+
+            if self._drain_events():
+                return True
+
+    def _drain_events(self) -> bool:
+        changed = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            if not data:
+                return changed
+
+            pos = 0
+            while pos + _EVENT_HEADER.size <= len(data):
+                _, _, _, length = _EVENT_HEADER.unpack_from(data, pos)
+                pos += _EVENT_HEADER.size
+                name = data[pos:pos + length].rstrip(b"\0").decode("utf-8", "replace")
+                pos += length
+                if self._matches(name):
+                    changed = True
+
+    def _matches(self, name: str) -> bool:
+        return any(name == watched or name.startswith(watched + "-") for watched in self._names)
+
+    def _wait_poll(self, timeout: float) -> bool:
+        deadline = time.monotonic() + max(0.0, timeout)
+
+        while True:
+            current = self._snapshot()
+            if current != self._stats:
+                self._stats = current
+                return True
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.poll_interval, remaining))
+
+    def _snapshot(self) -> tuple:
+        keys = []
+        for path in self.paths:
+            for candidate in (path, path.with_name(path.name + "-wal")):
+                try:
+                    st = candidate.stat()
+                    keys.append((st.st_ino, st.st_mtime_ns, st.st_size))
+                except FileNotFoundError:
+                    keys.append(None)
+        return tuple(keys)
+
+
+def _read_watch_mode() -> str:
+    return (os.getenv("INTENT_WATCH_MODE") or "").strip().lower()
+
+
+def _inotify_open(directories: set[Path]) -> int | None:
+    """Descritor inotify nao bloqueante, ou None se indisponivel."""
+    if not hasattr(os, "O_NONBLOCK"):
+        return None
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        init = libc.inotify_init1
+        add_watch = libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+
+    fd = init(os.O_NONBLOCK | os.O_CLOEXEC)
+    if fd < 0:
+        return None
+
+    for directory in directories:
+        directory.mkdir(parents=True, exist_ok=True)
+        if add_watch(fd, os.fsencode(str(directory)), _IN_MASK) < 0:
+            os.close(fd)
+            return None
+
+    return fd
@@ -0,0 +1,67 @@
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy e opcional
+    np = None
+
+
+RISK_ALLOWED = 0
+RISK_ABOVE_THRESHOLD = 1
+RISK_MISSING = 2
+RISK_INVALID = 3
+
+
+def extract_risk_scores(plans: list[dict]) -> tuple[list[float], list[bool], list[bool]]:
+    """risk_score/10 de cada plano e mascaras de ausente/invalido (valor 0.0 nesses casos)."""
+    values = []
+    missing = []
+    invalid = []
+
+    for plan in plans:
+        if "risk_score" not in plan:
+            values.append(0.0)
+            missing.append(True)
+            invalid.append(False)
+            continue
+
+        try:
+            values.append(float(plan["risk_score"]) / 10.0)
+            invalid.append(False)
+        except Exception:
+            values.append(0.0)
+            invalid.append(True)
+        missing.append(False)
+
+    return values, missing, invalid
+
+
+def classify_risk(plans: list[dict], threshold: float) -> list[int]:
+    """
+    Codigo RISK_* por plano, com a mesma regra de evaluate():
+    ausente > invalido > acima do threshold > permitido.
+    """
+    values, missing, invalid = extract_risk_scores(plans)
+
+    if np is not None:
+        over = np.asarray(values, dtype=np.float64) > threshold
+        codes = np.where(
+            np.asarray(missing, dtype=bool),
+            RISK_MISSING,
+            np.where(
+                np.asarray(invalid, dtype=bool),
+                RISK_INVALID,
+                np.where(over, RISK_ABOVE_THRESHOLD, RISK_ALLOWED),
+            ),
+        )
+        return codes.tolist()
+
+    codes = []
+    for value, is_missing, is_invalid in zip(values, missing, invalid):
+        if is_missing:
+            codes.append(RISK_MISSING)
+        elif is_invalid:
+            codes.append(RISK_INVALID)
+        elif value > threshold:
+            codes.append(RISK_ABOVE_THRESHOLD)
+        else:
+            codes.append(RISK_ALLOWED)
+    return codes
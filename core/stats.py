@@ -0,0 +1,70 @@
+class P2Quantile:
+    """Estimador P² (Jain & Chlamtac) de um quantil com memoria constante."""
+
+    def __init__(self, p: float):
+        self.p = p
+        self._initial: list[float] = []
+        self._q: list[float] | None = None
+        self._n = [0, 1, 2, 3, 4]
+        self._desired = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]
+        self._step = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def update(self, x: float) -> None:
+        q = self._q
+        if q is None:
+            self._initial.append(x)
+            if len(self._initial) == 5:
+                self._initial.sort()
+                self._q = list(self._initial)
+            return
+
+        n = self._n
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+        desired = self._desired
+        for i in range(5):
+            desired[i] += self._step[i]
+
+        for i in (1, 2, 3):
+            d = desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                candidate = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if not q[i - 1] < candidate < q[i + 1]:
+                    candidate = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = candidate
+                n[i] += d
+
+    def to_state(self) -> dict:
+        return {"initial": self._initial, "q": self._q, "n": self._n, "desired": self._desired}
+
+    @classmethod
+    def from_state(cls, p: float, state: dict) -> "P2Quantile":
+        estimator = cls(p)
+        estimator._initial = list(state["initial"])
+        estimator._q = list(state["q"]) if state["q"] is not None else None
+        estimator._n = list(state["n"])
+        estimator._desired = list(state["desired"])
+        return estimator
+
+    def value(self) -> float | None:
+        if self._q is not None:
+            return self._q[2]
+        if not self._initial:
+            return None
+        ordered = sorted(self._initial)
+        return ordered[min(len(ordered) - 1, int(self.p * len(ordered)))]
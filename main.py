@@ -1,5 +1,6 @@
 from datetime import datetime
 import argparse
+import json
 import os
 import signal
 import sys
@@ -9,20 +10,29 @@ from ai.config import AppConfig, config_summary, load_config, validate_config
 from ai.preflight import run_preflight
 from core.executor import execute_plan, PlanExecutionError
 from core.ledger_verify import verify_ledger, LedgerIntegrityError, recover_ledger
+from core.ledger_parallel import default_workers
+from core.ledger_segments import export_entry_proof
 from core.policy_lock import (
     initialize_policy_lock,
     verify_policy_locked,
     PolicyLockError,
 )
 from core.autonomy_supervisor import AutonomySupervisor
-from core.autonomy_reactive import ReactiveAutonomy
+from core.autonomy_reactive import ReactiveAutonomy, read_drain_summary_min_intents
+from core.queue_watcher import QueueWatcher
 from core.command_policy import load_policy
-from core.observability import load_metrics, load_last_decisions
+from core.observability import (
+    flush_decision_log,
+    load_last_decisions,
+    load_metrics,
+)
 from core.ai_advisor import AIAdvisor, build_ai_context
 
 
 running = True
 
+HEARTBEAT_INTERVAL_SECONDS = 10
+
 
 class RuntimePaths:
     def __init__(self, config: AppConfig):
@@ -97,6 +107,10 @@ def handle_signal(signum, frame):
     log(f"INFO Sinal recebido ({signum}). Encerrando com segurana.")
     running = False
 
+    # Drena o log de decisoes assincrono; o restante sai no atexit
+    if not flush_decision_log(timeout=2.0):
+        log("WARN Log de decisoes nao drenado a tempo; concluindo no encerramento")
+
 
 def run_startup_preflight(config: AppConfig) -> bool:
     report = run_preflight(config)
@@ -162,18 +176,102 @@ def show_observability_report(config):
     return 0
 
 
+# ---------- Autonomia Reativa ----------
+def run_reactive_dry_run(result: dict) -> str:
+    try:
+        report = execute_plan(result["plan_path"], apply=False)
+        log(f"INFO DRY-RUN executado via autonomia reativa: {report['plan_id']}")
+        return "dry_run_executed"
+    except Exception as e:
+        log(f"ERROR Falha no DRY-RUN reativo: {e}")
+        return "dry_run_failed"
+
+
+def run_intent_drain(
+    reactive: ReactiveAutonomy,
+    max_intents: int | None,
+    deadline: float | None,
+    workers: int,
+) -> int:
+    if workers == 0:
+        workers = default_workers()
+
+    log(
+        f"INFO Modo drain  workers={workers} "
+        f"max={max_intents if max_intents else 'sem limite'} "
+        f"prazo={f'{deadline}s' if deadline else 'sem limite'}"
+    )
+
+    summary = reactive.drain(
+        max_intents=max_intents,
+        deadline_seconds=deadline,
+        workers=workers,
+        on_ready=run_reactive_dry_run,
+        should_continue=lambda: running,
+    )
+
+    for status, count in sorted(summary["statuses"].items()):
+        log(f"INFO   {status}={count}")
+    log(
+        f"INFO Drain concluido  processadas={summary['processed']} "
+        f"tempo={summary['elapsed_seconds']}s "
+        f"vazao={summary['throughput_per_second']}/s "
+        f"fila_vazia={summary['queue_empty']}"
+    )
+    return 0
+
+
+def run_daemon_drain(reactive: ReactiveAutonomy, deadline: float, workers: int) -> int:
+    """
+    Drain disparado pelo daemon a cada escrita na fila.
+
+    Limitado pelo prazo para heartbeat e requeue_expired seguirem rodando
+    com a fila sempre cheia; drains pequenos nao geram log nem registro de
+    decisao. Retorna quantas intents foram processadas.
+    """
+    if workers == 0:
+        workers = default_workers()
+
+    min_intents = read_drain_summary_min_intents()
+    summary = reactive.drain(
+        deadline_seconds=deadline,
+        workers=workers,
+        on_ready=run_reactive_dry_run,
+        should_continue=lambda: running,
+        summary_min_intents=min_intents,
+    )
+
+    if summary["processed"] >= min_intents:
+        log(
+            f"INFO Drain concluido  processadas={summary['processed']} "
+            f"tempo={summary['elapsed_seconds']}s "
+            f"vazao={summary['throughput_per_second']}/s "
+            f"fila_vazia={summary['queue_empty']}"
+        )
+    return summary["processed"]
+
+
 # ---------- Main ----------
 def main(
     skip_preflight: bool = False,
     execute_plan_path: str | None = None,
     apply: bool = False,
     verify_ledger_flag: bool = False,
+    full_verify: bool = False,
+    verify_workers: int = 1,
+    ledger_proof: str | None = None,
     ledger_recover: bool = False,
     force_recover: bool = False,
     policy_maintenance: bool = False,
     policy_lock_init: bool = False,
     enable_autonomy: bool = False,
     process_intents: bool = False,
+    drain_intents: bool = False,
+    max_intents: int | None = None,
+    drain_deadline: float | None = None,
+    intent_workers: int = 1,
+    reactive_daemon: bool = False,
+    migrate_intent_queue: bool = False,
 ):
 
     config = load_config()
@@ -218,12 +316,29 @@ def main(
     if verify_ledger_flag:
         log("INFO Modo Verificaao de Ledger ativado")
         try:
-            result = verify_ledger()
-            log(f"INFO Ledger OK  entries={result['entries']}")
+            if verify_workers == 0:
+                verify_workers = default_workers()
+            result = verify_ledger(full=full_verify, workers=verify_workers)
+            log(
+                f"INFO Ledger OK  entries={result['entries']} "
+                f"mode={result.get('mode', 'full')} verified={result.get('verified_entries', 0)}"
+            )
             return 0
         except LedgerIntegrityError as e:
             log(f"ERROR Ledger FALHOU  {e}")
             return 1
+    # ---------- Prova de inclusao (Merkle) ----------
+    if ledger_proof:
+        from core.ledger_verify import HISTORY_FILE
+
+        proof = export_entry_proof(HISTORY_FILE, ledger_proof)
+        if proof is None:
+            log(f"ERROR Nenhuma execuao registrada para {ledger_proof}")
+            return 1
+
+        print(json.dumps(proof, indent=2))
+        return 0
+
     # ---------- Ledger Recovery ----------
     if ledger_recover:
         if not force_recover:
@@ -300,6 +415,14 @@ def main(
             log(f"ERROR Execuao falhou: {e}")
             return 1
 
+    # ---------- Migraao da fila de intents ----------
+    if migrate_intent_queue:
+        from core.intent_queue_sqlite import INTENT_DB_FILE, migrate_json_queue
+
+        inserted = migrate_json_queue()
+        log(f"INFO Fila migrada para {INTENT_DB_FILE}  intents inseridas={inserted}")
+        return 0
+
     # ---------- Autonomia Reativa ----------
     if process_intents:
         # Verificaao obrigatoria de integridade antes da autonomia
@@ -317,53 +440,117 @@ def main(
         log("INFO Processando fila de intents")
 
         reactive = ReactiveAutonomy(config)
-        result = reactive.process_next_intent()
+        try:
+            if drain_intents:
+                return run_intent_drain(reactive, max_intents, drain_deadline, intent_workers)
 
-        if result["status"] == "empty":
-            log("INFO Nenhuma intent na fila")
-            return 0
+            result = reactive.process_next_intent()
 
-        if result["status"] == "blocked":
-            log(f"INFO Intent bloqueada: {result['reason']}")
-            return 0
+            if result["status"] == "empty":
+                log("INFO Nenhuma intent na fila")
+                return 0
 
-        if result["status"] == "ready_for_dry_run":
-            log("INFO Intent aprovada para DRY-RUN automatico")
-            try:
-                report = execute_plan(result["plan_path"], apply=False)
-                log(f"INFO DRY-RUN executado via autonomia reativa: {report['plan_id']}")
-            except Exception as e:
-                log(f"ERROR Falha no DRY-RUN reativo: {e}")
+            if result["status"] == "blocked":
+                log(f"INFO Intent bloqueada: {result['reason']}")
+                return 0
+
+            if result["status"] == "ready_for_dry_run":
+                log("INFO Intent aprovada para DRY-RUN automatico")
+                run_reactive_dry_run(result)
+                return 0
+
+            if result["status"] == "lease_lost":
+                log("WARN Lease da intent expirou durante o processamento; resultado descartado")
+                return 0
+
+            log(f"INFO Intent finalizada com status {result['status']}")
             return 0
+        finally:
+            # Pool de recomendaoes nao segura o encerramento do processo
+            reactive.close()
 
     # ---------- Modo Residente ----------
+    reactive = None
+    watcher = None
+
+    if reactive_daemon:
+        if not config.autonomy_reactive_enabled:
+            log("ERROR --reactive-daemon requer AUTONOMY_REACTIVE_ENABLED=true")
+            return 1
+
+        # Verificaao obrigatoria de integridade antes da autonomia
+        try:
+            verify_ledger()
+        except LedgerIntegrityError as e:
+            log(f"CRITICAL Ledger comprometido  {e}")
+            set_state("LEDGER_TAMPERED")
+            return 1
+
+        if intent_workers == 0:
+            intent_workers = default_workers()
+
+        # Avaliadores, config e fila ficam carregados durante todo o servio
+        reactive = ReactiveAutonomy(config)
+        watcher = QueueWatcher(reactive.queue.watch_paths())
+
     set_state("STARTING")
     init_metrics()
 
     log("INFO Curudroid iniciado (modo residente)")
     log(f"INFO Python: {sys.version.split()[0]}")
-    log("INFO Autonomia: DESATIVADA")
+    if reactive is None:
+        log("INFO Autonomia: DESATIVADA")
+    else:
+        log(f"INFO Autonomia: REATIVA  fila observada via {watcher.mode}, workers={intent_workers}")
 
     set_state("RUNNING")
 
     start_time = time.time()
     heartbeat_count = 0
+    next_heartbeat = time.monotonic()
+    processed_since_heartbeat = 0
 
     while running:
-        heartbeat_count += 1
-        uptime = int(time.time() - start_time)
-        now = datetime.now().isoformat(timespec="seconds")
+        if time.monotonic() >= next_heartbeat:
+            heartbeat_count += 1
+            uptime = int(time.time() - start_time)
+            now = datetime.now().isoformat(timespec="seconds")
 
-        try:
-            with open(RUNTIME_PATHS.metrics_file, "w", encoding="utf-8") as f:
-                f.write(f"uptime_seconds={uptime}\n")
-                f.write(f"heartbeats={heartbeat_count}\n")
-                f.write(f"last_heartbeat={now}\n")
-        except Exception as e:
-            log(f"WARN Falha ao atualizar metricas: {e}")
+            try:
+                with open(RUNTIME_PATHS.metrics_file, "w", encoding="utf-8") as f:
+                    f.write(f"uptime_seconds={uptime}\n")
+                    f.write(f"heartbeats={heartbeat_count}\n")
+                    f.write(f"last_heartbeat={now}\n")
+            except Exception as e:
+                log(f"WARN Falha ao atualizar metricas: {e}")
+
+            if reactive is not None:
+                log(f"INFO Heartbeat  sistema ativo  intents={processed_since_heartbeat}")
+                processed_since_heartbeat = 0
+            else:
+                log("INFO Heartbeat  sistema ativo")
+            next_heartbeat = time.monotonic() + HEARTBEAT_INTERVAL_SECONDS
 
-        log("INFO Heartbeat  sistema ativo")
-        time.sleep(10)
+            if reactive is not None:
+                reactive.queue.requeue_expired()
+
+        if reactive is None:
+            time.sleep(max(0.0, next_heartbeat - time.monotonic()))
+            continue
+
+        if reactive.queue.pending_count() > 0:
+            # Prazo ate o proximo heartbeat: fila cheia nao trava o loop
+            remaining = max(1.0, next_heartbeat - time.monotonic())
+            processed_since_heartbeat += run_daemon_drain(reactive, remaining, intent_workers)
+            continue
+
+        # Acorda na proxima escrita da fila; fatias curtas para reagir a sinais
+        watcher.wait(min(1.0, max(0.0, next_heartbeat - time.monotonic())))
+
+    if watcher is not None:
+        watcher.close()
+    if reactive is not None:
+        reactive.close()
 
     set_state("STOPPING")
     log("INFO Curudroid finalizado de forma graciosa")
@@ -398,6 +585,26 @@ if __name__ == "__main__":
         help="Verifica integridade do historico encadeado (ledger)",
     )
 
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Com --verify-ledger, refaz a cadeia inteira ignorando checkpoints (auditoria)",
+    )
+
+    parser.add_argument(
+        "--verify-workers",
+        type=int,
+        default=1,
+        help="Com --verify-ledger --full, numero de processos (0 = todos os nucleos)",
+    )
+
+    parser.add_argument(
+        "--ledger-proof",
+        type=str,
+        metavar="PLAN_ID",
+        help="Exporta prova de inclusao Merkle da ultima execuao do plano",
+    )
+
     parser.add_argument(
         "--ledger-recover",
         action="store_true",
@@ -434,6 +641,46 @@ if __name__ == "__main__":
         help="Processa proxima intent da fila reativa",
     )
 
+    parser.add_argument(
+        "--drain",
+        action="store_true",
+        help="Com --process-intents, processa ate esvaziar a fila (verifica o ledger uma vez)",
+    )
+
+    parser.add_argument(
+        "--max-intents",
+        type=int,
+        default=None,
+        help="Com --drain, numero maximo de intents processadas",
+    )
+
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="Com --drain, para de reivindicar intents apos SECONDS",
+    )
+
+    parser.add_argument(
+        "--intent-workers",
+        type=int,
+        default=1,
+        help="Com --drain/--reactive-daemon, numero de threads consumindo a fila (0 = todos os nucleos)",
+    )
+
+    parser.add_argument(
+        "--reactive-daemon",
+        action="store_true",
+        help="Modo residente processando intents assim que entram na fila",
+    )
+
+    parser.add_argument(
+        "--migrate-intent-queue",
+        action="store_true",
+        help="Copia a fila JSON para o backend SQLite (INTENT_QUEUE_BACKEND=sqlite)",
+    )
+
     parser.add_argument(
         "--observability-report",
         action="store_true",
@@ -457,11 +704,20 @@ if __name__ == "__main__":
             execute_plan_path=args.execute,
             apply=args.apply,
             verify_ledger_flag=args.verify_ledger,
+            full_verify=args.full,
+            verify_workers=args.verify_workers,
+            ledger_proof=args.ledger_proof,
             ledger_recover=args.ledger_recover,
             force_recover=args.force_recover,
             policy_maintenance=args.policy_maintenance,
             policy_lock_init=args.policy_lock_init,
             enable_autonomy=args.enable_autonomy,
             process_intents=args.process_intents,
+            drain_intents=args.drain,
+            max_intents=args.max_intents,
+            drain_deadline=args.deadline,
+            intent_workers=args.intent_workers,
+            reactive_daemon=args.reactive_daemon,
+            migrate_intent_queue=args.migrate_intent_queue,
         )
     )
@@ -1,7 +1,11 @@
+import tempfile
 import unittest
+from pathlib import Path
 from unittest import mock
 
+import core.decision_cache as decision_cache
 from ai.config import AppConfig
+from core.advice_cache import AdviceCache
 from core.ai_advisor import AIAdvisor
 
 
@@ -57,5 +61,196 @@ class AIAdvisorTests(unittest.TestCase):
         self.assertEqual(log_mock.call_args[0][0]["status"], "success")
 
 
+class _CountingProvider(_FakeProvider):
+    def __init__(self):
+        self.calls = 0
+
+    def recommend(self, plan: dict, context: dict) -> dict | None:
+        self.calls += 1
+        return super().recommend(plan, context)
+
+
+class AdviceCacheTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.cache_file = Path(self._tmp.name) / "ai_advice_cache.json"
+
+        patcher = mock.patch.object(decision_cache, "increment_metric")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch("core.ai_advisor.log_decision")
+        self.log_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.provider = _CountingProvider()
+
+    def _advisor(self, **cache_kwargs) -> AIAdvisor:
+        cache_kwargs.setdefault("ttl_seconds", 60)
+        return AIAdvisor(self.provider, cache=AdviceCache(self.cache_file, **cache_kwargs))
+
+    def _context(self, intent_id: str, allowed: tuple = (True, True, True), blocked: int = 0) -> dict:
+        return {
+            "plan_id": "p1",
+            "last_decisions": [{"component": "supervisor", "allowed": value} for value in allowed],
+            "metrics": {"intents_processed": len(intent_id), "intents_blocked": blocked, "intents_dry_run": 10},
+            "extra": {"entrypoint": "autonomy_reactive", "intent_id": intent_id},
+        }
+
+    def test_repeat_plan_is_served_from_cache(self):
+        advisor = self._advisor()
+        plan = {"id": "p1", "risk_score": 2, "commands": []}
+
+        first = advisor.analyze(plan, self._context("i1"))
+        second = advisor.analyze(plan, self._context("i22"))
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.provider.calls, 1)
+        statuses = [c.args[0]["cache"] for c in self.log_mock.call_args_list]
+        self.assertEqual(statuses, ["miss", "hit"])
+
+    def test_provider_error_is_logged_as_cache_miss(self):
+        self.provider.recommend = mock.Mock(side_effect=RuntimeError("boom"))
+        advisor = self._advisor()
+
+        self.assertIsNone(advisor.analyze({"id": "p1", "risk_score": 2, "commands": []}, self._context("i1")))
+
+        record = self.log_mock.call_args.args[0]
+        self.assertEqual((record["status"], record["cache"]), ("error", "miss"))
+
+    def test_hit_logs_the_input_it_was_produced_for(self):
+        advisor = self._advisor()
+        plan = {"id": "p1", "risk_score": 2, "commands": []}
+
+        advisor.analyze(plan, self._context("i1", blocked=1))
+        advisor.analyze(plan, self._context("i22", blocked=2))
+
+        miss, hit = (c.args[0] for c in self.log_mock.call_args_list)
+        self.assertEqual(hit["cache"], "hit")
+        self.assertEqual(hit["cached_input_hash"], miss["input_hash"])
+        self.assertNotEqual(hit["input_hash"], miss["input_hash"])
+        self.assertIn("cache_key", hit)
+
+    def test_block_rate_band_change_is_a_miss(self):
+        advisor = self._advisor()
+        plan = {"id": "p1", "risk_score": 2, "commands": []}
+
+        advisor.analyze(plan, self._context("i1"))
+        advisor.analyze(plan, self._context("i2", allowed=(False, False, True)))
+        advisor.analyze(plan, self._context("i3", blocked=10))
+
+        self.assertEqual(self.provider.calls, 3)
+
+    def test_recent_anomaly_is_a_miss(self):
+        advisor = self._advisor()
+        plan = {"id": "p1", "risk_score": 2, "commands": []}
+        context = self._context("i1")
+        advisor.analyze(plan, context)
+
+        context["last_decisions"].append({"component": "anomaly", "allowed": None})
+        advisor.analyze(plan, context)
+
+        self.assertEqual(self.provider.calls, 2)
+
+    def test_cache_survives_restart_and_is_scoped_by_model(self):
+        plan = {"id": "p1", "risk_score": 2}
+        advisor = self._advisor()
+        advisor.analyze(plan, {})
+        advisor.cache.close()
+        self._advisor().analyze(plan, {})
+        self.assertEqual(self.provider.calls, 1)
+
+        self.provider.model_name = "other-model"
+        self._advisor().analyze(plan, {})
+        self.assertEqual(self.provider.calls, 2)
+
+    def test_expired_entries_are_refreshed(self):
+        advisor = self._advisor()
+        plan = {"id": "p1", "risk_score": 2}
+
+        with mock.patch("core.advice_cache.time.time", return_value=1000.0):
+            advisor.analyze(plan, {})
+        with mock.patch("core.advice_cache.time.time", return_value=1059.0):
+            advisor.analyze(plan, {})
+        self.assertEqual(self.provider.calls, 1)
+
+        with mock.patch("core.advice_cache.time.time", return_value=1061.0):
+            advisor.analyze(plan, {})
+        self.assertEqual(self.provider.calls, 2)
+
+    def test_zero_ttl_disables_cache(self):
+        advisor = self._advisor(ttl_seconds=0)
+        for _ in range(2):
+            advisor.analyze({"id": "p1"}, {})
+
+        self.assertEqual(self.provider.calls, 2)
+        self.assertFalse(self.cache_file.exists())
+
+
+class _BatchProvider(_FakeProvider):
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+
+    def recommend_batch(self, plans: list, context: dict) -> list:
+        self.batches.append([plan["id"] for plan in plans])
+        if self.fail:
+            raise RuntimeError("provider down")
+        return [
+            None if plan["id"] == "empty" else {"suggested_action": "block", "confidence": 0.5}
+            for plan in plans
+        ]
+
+
+class AnalyzeBatchTests(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch("core.ai_advisor.log_decision")
+        self.log_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _records(self) -> list:
+        return [c.args[0] for c in self.log_mock.call_args_list]
+
+    def test_plans_are_packed_under_budget_and_logged_individually(self):
+        provider = _BatchProvider()
+        plans = [{"id": f"p{idx}", "risk_score": idx} for idx in range(4)] + [{"id": "empty"}]
+
+        with mock.patch.dict("os.environ", {"AI_BATCH_MAX_PLANS": "2"}):
+            results = AIAdvisor(provider).analyze_batch(plans, {"metrics": {}})
+
+        self.assertEqual(provider.batches, [["p0", "p1"], ["p2", "p3"], ["empty"]])
+        self.assertEqual([r["suggested_action"] if r else None for r in results], ["block"] * 4 + [None])
+        self.assertEqual(results[0]["provider"], "fake")
+
+        records = self._records()
+        self.assertEqual([r["plan_id"] for r in records], [p["id"] for p in plans])
+        self.assertEqual([r["status"] for r in records], ["success"] * 4 + ["no_recommendation"])
+        self.assertEqual(records[0]["batch_size"], 2)
+
+    def test_byte_budget_splits_large_plans(self):
+        provider = _BatchProvider()
+        plans = [{"id": "x" * 300}, {"id": "y" * 300}, {"id": "z"}]
+
+        with mock.patch.dict("os.environ", {"AI_BATCH_MAX_BYTES": "600"}):
+            AIAdvisor(provider).analyze_batch(plans, {})
+
+        # Um plano grande por lote; o pequeno cabe junto do segundo
+        self.assertEqual([len(batch) for batch in provider.batches], [1, 2])
+
+    def test_failed_batch_logs_each_plan(self):
+        results = AIAdvisor(_BatchProvider(fail=True)).analyze_batch([{"id": "a"}, {"id": "b"}], {})
+
+        self.assertEqual(results, [None, None])
+        self.assertEqual([(r["status"], r["cache"]) for r in self._records()], [("error", "off"), ("error", "off")])
+
+    def test_providers_without_batch_support_fall_back_to_analyze(self):
+        provider = _CountingProvider()
+        results = AIAdvisor(provider).analyze_batch([{"id": "a"}, {"id": "b"}], {})
+
+        self.assertEqual(provider.calls, 2)
+        self.assertEqual(len([r for r in results if r]), 2)
+
+
 if __name__ == "__main__":
     unittest.main()
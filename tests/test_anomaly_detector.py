@@ -0,0 +1,147 @@
+import json
+import random
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import core.observability as observability
+from core.anomaly_detector import AnomalyDetector, detector_from_env
+
+
+def _latency_event(rng, mean):
+    return {"component": "ai_advisor", "status": "success", "latency_ms": rng.gauss(mean, mean * 0.2)}
+
+
+class AnomalyDetectorTests(unittest.TestCase):
+    def test_stationary_stream_is_quiet(self):
+        rng = random.Random(1)
+        detector = AnomalyDetector()
+        anomalies = []
+        for _ in range(20000):
+            anomalies += detector.observe({
+                "component": "supervisor",
+                "risk_score": rng.randint(0, 4),
+                "allowed": rng.random() < 0.8,
+            })
+            anomalies += detector.observe(_latency_event(rng, 300))
+
+        self.assertEqual(anomalies, [])
+
+    def test_latency_shift_is_reported_once_per_cooldown(self):
+        rng = random.Random(2)
+        detector = AnomalyDetector(cooldown=1000)
+        for _ in range(2000):
+            self.assertEqual(detector.observe(_latency_event(rng, 300)), [])
+
+        anomalies = []
+        for _ in range(100):
+            anomalies += detector.observe(_latency_event(rng, 900))
+
+        self.assertEqual(len(anomalies), 1)
+        anomaly = anomalies[0]
+        self.assertEqual(anomaly["component"], "anomaly")
+        self.assertEqual(anomaly["source_component"], "ai_advisor")
+        self.assertEqual(anomaly["metric"], "latency_ms")
+        self.assertGreater(anomaly["recent"], anomaly["baseline"])
+        self.assertIn("p95", anomaly)
+
+    def test_error_rate_shift(self):
+        detector = AnomalyDetector()
+        for _ in range(1000):
+            detector.observe({"component": "reactive", "event": "processed"})
+
+        anomalies = []
+        for _ in range(100):
+            anomalies += detector.observe({"component": "reactive", "event": "invalid_plan"})
+
+        self.assertEqual([a["metric"] for a in anomalies], ["error_rate"])
+
+    def test_ignores_own_events(self):
+        detector = AnomalyDetector(warmup=0)
+        for _ in range(100):
+            self.assertEqual(detector.observe({"component": "anomaly", "latency_ms": 1e9}), [])
+
+    def test_can_be_disabled_from_env(self):
+        with mock.patch.dict("os.environ", {"ANOMALY_DETECTION": "0"}):
+            self.assertIsNone(detector_from_env())
+        with mock.patch.dict("os.environ", {"ANOMALY_Z_THRESHOLD": "6"}):
+            self.assertEqual(detector_from_env().z_threshold, 6.0)
+
+
+class PersistedStateTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.state_path = Path(self._tmp.name) / "anomaly_state.json"
+
+    def test_warmup_accumulates_across_short_runs(self):
+        rng = random.Random(3)
+        first = AnomalyDetector(state_path=self.state_path)
+        for _ in range(150):
+            first.observe(_latency_event(rng, 300))
+        first.save()
+
+        anomalies = []
+        second = AnomalyDetector(state_path=self.state_path)
+        for _ in range(60):
+            anomalies += second.observe(_latency_event(rng, 300))
+        for _ in range(100):
+            anomalies += second.observe(_latency_event(rng, 900))
+
+        self.assertEqual([a["metric"] for a in anomalies], ["latency_ms"])
+        self.assertGreater(anomalies[0]["events"], 200)
+
+    def test_state_with_more_observations_wins(self):
+        rng = random.Random(4)
+        short, long = AnomalyDetector(state_path=self.state_path), AnomalyDetector(state_path=self.state_path)
+        for _ in range(10):
+            short.observe(_latency_event(rng, 300))
+        for _ in range(50):
+            long.observe(_latency_event(rng, 300))
+
+        long.save()
+        short.save()
+
+        records = json.loads(self.state_path.read_text(encoding="utf-8"))
+        self.assertEqual([(r["metric"], r["count"]) for r in records if r["metric"] == "latency_ms"], [("latency_ms", 50)])
+        self.assertEqual(short._monitors[("ai_advisor", "latency_ms")].count, 50)
+
+    def test_corrupt_state_starts_fresh(self):
+        self.state_path.write_text('{"not": "a list"}', encoding="utf-8")
+        detector = AnomalyDetector(state_path=self.state_path)
+        self.assertEqual(detector.observe({"component": "supervisor", "allowed": True}), [])
+
+
+class DecisionLogAnomalyTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.log_path = Path(self._tmp.name) / "decisions.log"
+        for name, value in (
+            ("DECISION_LOG_PATH", str(self.log_path)),
+            ("_ANOMALY_DETECTOR", AnomalyDetector(warmup=20)),
+            ("_ANOMALY_DETECTOR_LOADED", True),
+            ("increment_metric", mock.Mock()),
+        ):
+            patcher = mock.patch.object(observability, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_anomalies_are_logged_with_the_stream(self):
+        with mock.patch.dict("os.environ", {"DECISION_LOG_ASYNC": "0"}):
+            observability.log_decisions([{"component": "curupira", "allowed": True}] * 100)
+            for _ in range(50):
+                observability.log_decision({"component": "curupira", "allowed": False})
+
+        records = [json.loads(line) for line in self.log_path.read_text(encoding="utf-8").splitlines()]
+        anomalies = [r for r in records if r["component"] == "anomaly"]
+
+        self.assertEqual(len(records), 151)
+        self.assertEqual(anomalies[0]["metric"], "block_rate")
+        self.assertIn("timestamp", anomalies[0])
+        observability.increment_metric.assert_called_once_with("anomaly_detected")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from core.ai_advisor import AIAdvisor
+from core.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class _FlakyProvider:
+    provider_name = "flaky"
+    model_name = "flaky-model"
+
+    def __init__(self):
+        self.timeout_seconds = 5.0
+        self.fail = True
+        self.timeouts = []
+
+    def recommend(self, plan: dict, context: dict, timeout_seconds: float | None = None) -> dict | None:
+        self.timeouts.append(timeout_seconds)
+        if self.fail:
+            raise TimeoutError("timed out")
+        return {"suggested_action": "review"}
+
+
+class CircuitBreakerTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.state_file = Path(self._tmp.name) / "ai_circuit_state.json"
+
+        patcher = mock.patch("core.circuit_breaker.time.time", return_value=1000.0)
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _breaker(self, key: str = "flaky:flaky-model") -> CircuitBreaker:
+        return CircuitBreaker(key, path=self.state_file, failure_threshold=3, open_seconds=30)
+
+    def test_trips_after_consecutive_failures_and_probes(self):
+        breaker = self._breaker()
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+
+        breaker.record_failure()
+        self.assertEqual(breaker.snapshot()["state"], OPEN)
+        self.assertFalse(breaker.allow())
+
+        self.clock.return_value = 1031.0
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.snapshot()["state"], HALF_OPEN)
+        self.assertFalse(breaker.allow())   # uma sonda por vez
+
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+
+        self.clock.return_value = 1062.0
+        self.assertTrue(breaker.allow())
+        breaker.record_success(0.2)
+        self.assertEqual(breaker.snapshot()["state"], CLOSED)
+        self.assertTrue(breaker.allow())
+
+    def test_state_is_shared_between_processes_and_scoped_by_key(self):
+        for _ in range(3):
+            self._breaker().record_failure()
+
+        # Nova instancia (outra invocaao da CLI) ve o circuito aberto
+        self.assertFalse(self._breaker().allow())
+        self.assertTrue(self._breaker("other:model").allow())
+
+    def test_adaptive_timeout_from_recent_latencies(self):
+        breaker = self._breaker()
+        self.assertEqual(breaker.timeout(5.0), 5.0)
+
+        for latency in [0.1] * 19 + [0.4]:
+            breaker.record_success(latency)
+        self.assertAlmostEqual(breaker.timeout(5.0), 0.8)
+        self.assertEqual(breaker.timeout(0.6), 0.6)
+
+        breaker.record_failure()
+        self.assertEqual(breaker.timeout(5.0), 5.0)
+
+    def test_corrupted_state_starts_closed(self):
+        self.state_file.write_text("{", encoding="utf-8")
+        self.assertTrue(self._breaker().allow())
+
+
+class AdvisorCircuitTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+
+        patcher = mock.patch("core.ai_advisor.log_decision")
+        self.log_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.provider = _FlakyProvider()
+        self.advisor = AIAdvisor(
+            self.provider,
+            breaker=CircuitBreaker(
+                "flaky:flaky-model",
+                path=Path(self._tmp.name) / "state.json",
+                failure_threshold=2,
+                open_seconds=60,
+            ),
+        )
+
+    def _statuses(self) -> list:
+        return [c.args[0]["status"] for c in self.log_mock.call_args_list]
+
+    def test_open_circuit_skips_provider(self):
+        for _ in range(4):
+            self.assertIsNone(self.advisor.analyze({"id": "p1"}, {}))
+
+        self.assertEqual(len(self.provider.timeouts), 2)
+        self.assertEqual(self._statuses(), ["error", "error", "circuit_open", "circuit_open"])
+
+    def test_adaptive_timeout_is_passed_to_provider(self):
+        self.provider.fail = False
+        for _ in range(15):
+            self.advisor.analyze({"id": "p1"}, {})
+
+        self.assertEqual(self.provider.timeouts[0], 5.0)
+        self.assertLess(self.provider.timeouts[-1], 5.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
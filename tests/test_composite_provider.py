@@ -0,0 +1,220 @@
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+from ai.config import AppConfig
+from core.ai_advisor import AIAdvisor
+from core.ai_providers import CompositeProvider, NullProvider, OpenAIProvider
+from core.ai_providers.base import arecommend
+
+
+class _AsyncProvider:
+    def __init__(self, name: str, delay: float = 0.0, result=None, error: Exception | None = None):
+        self.provider_name = name
+        self.model_name = f"{name}-model"
+        self.delay = delay
+        self.result = {"suggested_action": "review", "by": name} if result is None else result
+        self.error = error
+        self.calls = 0
+
+    def recommend(self, plan: dict, context: dict) -> dict | None:
+        return asyncio.run(self.arecommend(plan, context))
+
+    async def arecommend(self, plan: dict, context: dict) -> dict | None:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class _BlockingProvider:
+    provider_name = "blocking"
+    model_name = "blocking-model"
+
+    def recommend(self, plan: dict, context: dict) -> dict | None:
+        time.sleep(0.01)
+        return {"plan_id": plan["id"]}
+
+
+class _SleepingProvider:
+    model_name = "sleeping-model"
+
+    def __init__(self, name: str, delay: float):
+        self.provider_name = name
+        self.delay = delay
+
+    def recommend(self, plan: dict, context: dict) -> dict | None:
+        time.sleep(self.delay)
+        return {"suggested_action": "review", "by": self.provider_name}
+
+
+class _TimeoutProvider:
+    model_name = "timeout-model"
+
+    def __init__(self, name: str, timeout_seconds: float = 5.0, batch_error: Exception | None = None):
+        self.provider_name = name
+        self.timeout_seconds = timeout_seconds
+        self.batch_error = batch_error
+        self.timeouts = []
+        self.batches = []
+
+    def recommend(self, plan: dict, context: dict, timeout_seconds: float | None = None) -> dict | None:
+        self.timeouts.append(timeout_seconds)
+        return {"suggested_action": "review", "by": self.provider_name, "plan": plan["id"]}
+
+    def recommend_batch(self, plans: list, context: dict, timeout_seconds: float | None = None) -> list:
+        self.batches.append((len(plans), timeout_seconds))
+        if self.batch_error is not None:
+            raise self.batch_error
+        return [{"by": self.provider_name, "plan": plan["id"]} for plan in plans]
+
+
+def _config(provider: str) -> AppConfig:
+    return AppConfig(
+        log_level="INFO",
+        ai_provider=provider,
+        ai_api_key="key",
+        telegram_token="",
+        curupira_risk_threshold=0.4,
+        log_dir="logs",
+        data_dir="data",
+        supervisor_enabled=True,
+        curupira_enabled=True,
+        autonomy_reactive_enabled=False,
+    )
+
+
+class CompositeProviderTests(unittest.TestCase):
+    def _timed(self, provider):
+        started = time.monotonic()
+        result = provider.recommend({"id": "p1"}, {})
+        return result, time.monotonic() - started
+
+    def test_fast_primary_does_not_hedge(self):
+        primary, secondary = _AsyncProvider("a"), _AsyncProvider("b")
+        result, _ = self._timed(CompositeProvider([primary, secondary], hedge_delay_seconds=0.2))
+
+        self.assertEqual(result["by"], "a")
+        self.assertEqual(secondary.calls, 0)
+
+    def test_slow_primary_is_hedged_after_delay(self):
+        primary, secondary = _AsyncProvider("a", delay=2.0), _AsyncProvider("b")
+        result, elapsed = self._timed(CompositeProvider([primary, secondary], hedge_delay_seconds=0.1))
+
+        self.assertEqual(result["by"], "b")
+        self.assertLess(elapsed, 1.0)
+
+    def test_failure_falls_back_immediately(self):
+        primary = _AsyncProvider("a", error=RuntimeError("boom"))
+        empty = _AsyncProvider("b")
+        empty.result = None
+        fallback = _AsyncProvider("c")
+        result, elapsed = self._timed(CompositeProvider([primary, empty, fallback], hedge_delay_seconds=5.0))
+
+        self.assertEqual(result["by"], "c")
+        self.assertLess(elapsed, 1.0)
+
+    def test_single_provider_is_hedged_with_second_request(self):
+        provider = _AsyncProvider("a", delay=0.3)
+        result, _ = self._timed(CompositeProvider([provider], hedge_delay_seconds=0.05))
+
+        self.assertEqual(result["by"], "a")
+        self.assertEqual(provider.calls, 2)
+
+    def test_all_failures_raise_last_error(self):
+        providers = [_AsyncProvider("a", error=RuntimeError("a")), _AsyncProvider("b", error=RuntimeError("b"))]
+        with self.assertRaisesRegex(RuntimeError, "b"):
+            CompositeProvider(providers).recommend({"id": "p1"}, {})
+
+    def test_hedge_delay_follows_latency_percentile(self):
+        composite = CompositeProvider([_AsyncProvider("a", delay=0.01)], hedge_delay_seconds=3.0)
+        self.assertEqual(composite.hedge_delay(), 3.0)
+
+        for _ in range(25):
+            composite.recommend({"id": "p1"}, {})
+
+        self.assertLess(composite.hedge_delay(), 0.5)
+
+    def test_blocking_slow_primary_does_not_hold_sync_path(self):
+        composite = CompositeProvider(
+            [_SleepingProvider("slow", 3.0), _SleepingProvider("fallback", 0.1)],
+            hedge_delay_seconds=0.1,
+        )
+        result, elapsed = self._timed(composite)
+
+        self.assertEqual(result["by"], "fallback")
+        self.assertLess(elapsed, 1.0)
+
+    def test_blocking_slow_primary_does_not_hold_event_loop_shutdown(self):
+        composite = CompositeProvider(
+            [_SleepingProvider("slow", 3.0), _SleepingProvider("fallback", 0.1)],
+            hedge_delay_seconds=0.1,
+        )
+        started = time.monotonic()
+        result = asyncio.run(composite.arecommend({"id": "p1"}, {}))
+
+        self.assertEqual(result["by"], "fallback")
+        self.assertLess(time.monotonic() - started, 1.0)
+
+    def test_timeout_is_forwarded_to_providers_that_accept_it(self):
+        primary = _TimeoutProvider("a", timeout_seconds=7.0)
+        composite = CompositeProvider([primary, _SleepingProvider("b", 0.0)])
+
+        self.assertEqual(composite.timeout_seconds, 7.0)
+        self.assertEqual(composite.recommend({"id": "p1"}, {}, timeout_seconds=0.7)["by"], "a")
+        self.assertEqual(primary.timeouts, [0.7])
+        self.assertIsNone(CompositeProvider([_SleepingProvider("b", 0.0)]).timeout_seconds)
+
+    def test_batch_is_delegated_to_batching_primary(self):
+        primary, secondary = _TimeoutProvider("a"), _TimeoutProvider("b")
+        composite = CompositeProvider([primary, secondary])
+
+        results = composite.recommend_batch([{"id": "p1"}, {"id": "p2"}], {}, timeout_seconds=3.0)
+
+        self.assertEqual([r["plan"] for r in results], ["p1", "p2"])
+        self.assertEqual(primary.batches, [(2, 3.0)])
+        self.assertEqual(primary.timeouts + secondary.timeouts, [])
+
+    def test_batch_falls_back_to_per_plan_calls(self):
+        primary = _TimeoutProvider("a", batch_error=RuntimeError("batch"))
+        primary.recommend = mock.Mock(side_effect=RuntimeError("down"))
+        secondary = _TimeoutProvider("b")
+        composite = CompositeProvider([primary, secondary], hedge_delay_seconds=5.0)
+
+        results = composite.recommend_batch([{"id": "p1"}, {"id": "p2"}], {}, timeout_seconds=3.0)
+
+        self.assertEqual([(r["by"], r["plan"]) for r in results], [("b", "p1"), ("b", "p2")])
+        self.assertEqual(secondary.timeouts, [3.0, 3.0])
+
+        # Primario sem suporte a lotes: chamadas por plano desde o inicio
+        composite = CompositeProvider([_SleepingProvider("c", 0.0)])
+        self.assertEqual([r["by"] for r in composite.recommend_batch([{"id": "p1"}], {})], ["c"])
+
+    def test_sync_providers_get_async_wrapper(self):
+        self.assertEqual(asyncio.run(arecommend(_BlockingProvider(), {"id": "p1"}, {})), {"plan_id": "p1"})
+
+
+class ProviderSelectionTests(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch("core.ai_advisor.get_advice_cache", return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_unknown_or_missing_providers_fall_back_to_null(self):
+        for name in ("bogus", "openclaw", ""):
+            self.assertIsInstance(AIAdvisor.from_config(_config(name)).provider, NullProvider)
+
+    def test_provider_list_and_hedging(self):
+        advisor = AIAdvisor.from_config(_config("openai,openclaw"))
+        self.assertIsInstance(advisor.provider, OpenAIProvider)
+
+        with mock.patch.dict("os.environ", {"AI_HEDGE": "1"}):
+            advisor = AIAdvisor.from_config(_config("openai"))
+        self.assertIsInstance(advisor.provider, CompositeProvider)
+        self.assertEqual(advisor.provider.model_name, "openai:gpt-4o-mini")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import core.autonomy_supervisor as autonomy_supervisor
+import core.curupira_evaluator as curupira_evaluator
+import core.decision_cache as decision_cache
+from core.autonomy_supervisor import AutonomySupervisor
+from core.curupira_evaluator import CurupiraEvaluator
+from core.decision_cache import DecisionCache
+from core.plan_validator import load_plan_with_digest
+
+
+class DecisionCacheTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.cache_file = Path(self._tmp.name) / "decision_cache.json"
+
+        patcher = mock.patch.object(decision_cache, "increment_metric")
+        self.metric = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        for module in (autonomy_supervisor, curupira_evaluator):
+            for name in ("log_decision", "increment_metric"):
+                patcher = mock.patch.object(module, name)
+                patcher.start()
+                self.addCleanup(patcher.stop)
+
+    def _cache(self, max_entries: int = 8) -> DecisionCache:
+        return DecisionCache(self.cache_file, max_entries=max_entries)
+
+    def test_lru_evicts_least_recently_used(self):
+        cache = self._cache(max_entries=2)
+        cache.put("a", {"allowed": True})
+        cache.put("b", {"allowed": False})
+        cache.get("a")
+        cache.put("c", {"allowed": True})
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), {"allowed": True})
+        self.assertEqual(len(cache), 2)
+
+    def test_entries_survive_restart(self):
+        cache = self._cache()
+        cache.put("a", {"allowed": True})
+        cache.close()
+
+        self.assertEqual(self._cache().get("a"), {"allowed": True})
+
+    def test_puts_are_batched_until_flush_interval(self):
+        cache = DecisionCache(self.cache_file, max_entries=8, flush_interval=60)
+        cache.put("a", {"allowed": True})
+        cache.put("b", {"allowed": False})
+        self.assertFalse(self.cache_file.exists())
+
+        with mock.patch.object(decision_cache.time, "monotonic", return_value=time.monotonic() + 61):
+            cache.put("c", {"allowed": True})
+        self.assertEqual(len(json.loads(self.cache_file.read_text(encoding="utf-8"))), 3)
+
+    def test_flush_merges_entries_from_other_processes(self):
+        first, second = self._cache(max_entries=3), self._cache(max_entries=3)
+        first.put("a", {"allowed": True})
+        second.put("b", {"allowed": False})
+        second.put("c", {"allowed": False})
+
+        first.close()
+        second.close()
+
+        restarted = self._cache(max_entries=3)
+        self.assertEqual(restarted.get("a"), {"allowed": True})
+        self.assertEqual(restarted.get("c"), {"allowed": False})
+        self.assertEqual(len(restarted), 3)
+
+    def test_reads_do_not_trigger_writes(self):
+        cache = self._cache()
+        cache.put("a", {"allowed": True})
+        cache.put("b", {"allowed": False})
+        cache.flush()
+
+        with mock.patch.object(cache, "_write_merged", wraps=cache._write_merged) as write:
+            for _ in range(10):
+                cache.get("a")
+            cache.flush()
+        self.assertEqual(write.call_count, 0)
+
+        # A ordem LRU de get vai junto no proximo flush provocado por put
+        cache.put("c", {"allowed": True})
+        cache.flush()
+        keys = [key for key, _ in json.loads(self.cache_file.read_text(encoding="utf-8"))]
+        self.assertEqual(keys, ["b", "a", "c"])
+
+    def test_disk_write_runs_outside_the_entries_lock(self):
+        cache = self._cache()
+        cache.put("a", {"allowed": True})
+        held = []
+        write_merged = cache._write_merged
+
+        def _write(entries):
+            held.append(cache._lock.locked())
+            cache.put("late", {"allowed": False})
+            return write_merged(entries)
+
+        with mock.patch.object(cache, "_write_merged", side_effect=_write):
+            cache.flush()
+
+        self.assertEqual(held, [False])
+        self.assertEqual(cache.get("late"), {"allowed": False})
+        cache.flush()
+        self.assertEqual(len(json.loads(self.cache_file.read_text(encoding="utf-8"))), 2)
+
+    def test_corrupted_file_starts_empty(self):
+        self.cache_file.write_text("{", encoding="utf-8")
+        self.assertEqual(len(self._cache()), 0)
+
+    def test_wrong_shape_starts_empty(self):
+        for content in ("{}", "[1, 2]", '[["a"]]', '[["a", 1]]', "null"):
+            self.cache_file.write_text(content, encoding="utf-8")
+            self.assertEqual(len(self._cache()), 0)
+
+        self.cache_file.write_text('[["a", {"allowed": true}], ["b"]]', encoding="utf-8")
+        self.assertEqual(self._cache().get("a"), {"allowed": True})
+
+    def test_repeat_plan_skips_evaluation_and_counts_hits(self):
+        cache = self._cache()
+        supervisor = AutonomySupervisor(risk_threshold=0.4, cache=cache)
+
+        with mock.patch.object(AutonomySupervisor, "_evaluate", wraps=supervisor._evaluate) as evaluate:
+            first = supervisor.evaluate({"id": "p1", "risk_score": 1}, "sha")
+            second = supervisor.evaluate({"id": "p1", "risk_score": 1}, "sha")
+
+        self.assertEqual(evaluate.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(
+            [c.args[0] for c in self.metric.call_args_list],
+            ["decision_cache_miss", "decision_cache_hit"],
+        )
+        last = autonomy_supervisor.log_decision.call_args.args[0]
+        self.assertTrue(last["cached"])
+
+    def test_threshold_and_evaluator_are_part_of_the_key(self):
+        cache = self._cache()
+        plan = {"id": "p1", "risk_score": 3}
+
+        self.assertTrue(CurupiraEvaluator(threshold=0.4, cache=cache).evaluate(plan, "sha").allowed)
+        self.assertFalse(CurupiraEvaluator(threshold=0.3, cache=cache).evaluate(plan, "sha").allowed)
+        self.assertTrue(AutonomySupervisor(risk_threshold=0.3, cache=cache).evaluate(plan, "sha").allowed)
+        self.assertEqual(len(cache), 3)
+
+    def test_plan_digest_matches_file_bytes(self):
+        path = Path(self._tmp.name) / "plan.json"
+        path.write_text(json.dumps({"id": "p1"}), encoding="utf-8")
+
+        plan, digest = load_plan_with_digest(str(path))
+
+        self.assertEqual(plan, {"id": "p1"})
+        self.assertEqual(digest, hashlib.sha256(path.read_bytes()).hexdigest())
+
+
+if __name__ == "__main__":
+    unittest.main()
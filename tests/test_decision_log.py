@@ -0,0 +1,117 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from core.decision_log import (
+    BACKPRESSURE_DROP_OLDEST,
+    BACKPRESSURE_SPILL,
+    DecisionLogWriter,
+)
+
+
+class DecisionLogWriterTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.path = os.path.join(self._tmp.name, "logs", "decisions.log")
+
+    def _read_lines(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def test_flush_and_close_drain_all_events_in_order(self):
+        writer = DecisionLogWriter(self.path)
+
+        for idx in range(200):
+            writer.write(json.dumps({"n": idx}))
+
+        self.assertTrue(writer.flush(timeout=5))
+        self.assertEqual([r["n"] for r in self._read_lines()], list(range(200)))
+
+        writer.write(json.dumps({"n": 200}))
+        self.assertTrue(writer.close(timeout=5))
+        self.assertEqual(len(self._read_lines()), 201)
+
+    def test_events_are_group_committed(self):
+        writer = DecisionLogWriter(self.path)
+        release = threading.Event()
+        original = writer._write_batch
+        batches = []
+
+        def slow_batch(payload):
+            release.wait(5)
+            batches.append(payload.count("\n"))
+            original(payload)
+
+        with mock.patch.object(writer, "_write_batch", side_effect=slow_batch):
+            for idx in range(50):
+                writer.write(json.dumps({"n": idx}))
+            release.set()
+            self.assertTrue(writer.close(timeout=5))
+
+        self.assertEqual(sum(batches), 50)
+        self.assertLess(len(batches), 50)
+
+    def test_pending_lines_include_batch_being_written(self):
+        writer = DecisionLogWriter(self.path)
+        started = threading.Event()
+        release = threading.Event()
+        original = writer._write_batch
+
+        def slow_batch(payload):
+            started.set()
+            release.wait(5)
+            original(payload)
+
+        with mock.patch.object(writer, "_write_batch", side_effect=slow_batch):
+            writer.write(json.dumps({"n": 0}))
+            self.assertTrue(started.wait(5))
+            for idx in range(1, 4):
+                writer.write(json.dumps({"n": idx}))
+
+            self.assertEqual([json.loads(line)["n"] for line in writer.pending_lines(10)], [0, 1, 2, 3])
+            self.assertEqual([json.loads(line)["n"] for line in writer.pending_lines(2)], [2, 3])
+
+            release.set()
+            self.assertTrue(writer.flush(timeout=5))
+
+        self.assertEqual(writer.pending_lines(10), [])
+        self.assertTrue(writer.close(timeout=5))
+
+    def test_drop_oldest_discards_unwritten_events_when_full(self):
+        writer = DecisionLogWriter(self.path, max_queue=2, backpressure=BACKPRESSURE_DROP_OLDEST)
+
+        with writer._cond:
+            # Thread escritora nao consegue pegar o lock: fila enche
+            writer._thread = threading.current_thread()
+            for idx in range(5):
+                writer.write(json.dumps({"n": idx}))
+            writer._thread = None
+
+        self.assertEqual(writer.dropped, 3)
+        self.assertEqual(list(writer._buffer), ['{"n": 3}\n', '{"n": 4}\n'])
+
+    def test_spill_overflow_is_merged_into_main_log(self):
+        writer = DecisionLogWriter(self.path, max_queue=1, backpressure=BACKPRESSURE_SPILL)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        with writer._cond:
+            writer._thread = threading.current_thread()
+            for idx in range(4):
+                writer.write(json.dumps({"n": idx}))
+            writer._thread = None
+
+        self.assertTrue(os.path.exists(writer.spill_path))
+
+        writer.write(json.dumps({"n": 4}))
+        self.assertTrue(writer.close(timeout=5))
+
+        self.assertEqual(sorted(r["n"] for r in self._read_lines()), [0, 1, 2, 3, 4])
+        self.assertFalse(os.path.exists(writer.spill_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
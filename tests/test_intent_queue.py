@@ -0,0 +1,638 @@
+import json
+import multiprocessing
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import core.autonomy_reactive as autonomy_reactive
+import core.intent_queue as intent_queue
+import core.intent_queue_sqlite as intent_queue_sqlite
+from ai.config import AppConfig
+from core.ai_advisor import AIAdvisor
+from core.intent_queue import IntentQueue
+from core.intent_queue_sqlite import SQLiteIntentQueue, migrate_json_queue
+from core.queue_watcher import QueueWatcher
+
+
+class IntentQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        base = Path(self._tmp.name)
+        self.queue_file = base / "intents_queue.json"
+        self.journal_file = base / "intents_queue.journal"
+
+        for name, value in (
+            ("INTENT_QUEUE_FILE", self.queue_file),
+            ("INTENT_JOURNAL_FILE", self.journal_file),
+            ("INTENT_LOCK_FILE", base / "intents_queue.lock"),
+        ):
+            patcher = mock.patch.object(intent_queue, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class IntentJournalTests(IntentQueueTestCase):
+    def test_legacy_snapshot_is_loaded_and_left_untouched_by_enqueue(self):
+        legacy = [{"id": "intent_1", "plan_path": "a.json", "priority": 1, "status": "blocked"}]
+        self.queue_file.write_text(json.dumps(legacy, indent=2), encoding="utf-8")
+        before = self.queue_file.read_text(encoding="utf-8")
+
+        queue = IntentQueue()
+        queue.enqueue({"plan_path": "b.json", "priority": 3})
+
+        self.assertEqual(self.queue_file.read_text(encoding="utf-8"), before)
+        self.assertEqual([i["id"] for i in queue.load()], ["intent_2", "intent_1"])
+        self.assertEqual(len(self.journal_file.read_text(encoding="utf-8").splitlines()), 1)
+
+    def test_status_change_appends_small_record(self):
+        queue = IntentQueue()
+        queue.enqueue({"plan_path": "a.json"})
+
+        intents = queue.load()
+        intents[0]["status"] = "blocked"
+        queue.save(intents)
+
+        last = json.loads(self.journal_file.read_text(encoding="utf-8").splitlines()[-1])
+        self.assertEqual(last, {"op": "update", "id": "intent_1", "fields": {"status": "blocked"}})
+
+    def test_torn_trailing_record_is_isolated(self):
+        queue = IntentQueue()
+        queue.enqueue({"plan_path": "a.json"})
+
+        # Queda no meio de uma escrita: linha final sem "\n"
+        with open(self.journal_file, "ab") as f:
+            f.write(b'{"op": "put", "intent": {"id": "intent_9", "pl')
+
+        queue.enqueue({"plan_path": "b.json"})
+        self.assertEqual(queue.pending_count(), 2)
+
+        fresh = IntentQueue()
+        self.assertEqual([i["plan_path"] for i in fresh.load()], ["a.json", "b.json"])
+        self.assertEqual(fresh.corrupt_records, 1)
+        fresh.enqueue({"plan_path": "c.json"})
+        self.assertEqual(fresh.pending_count(), 3)
+
+    def test_other_instances_see_journal_tail(self):
+        writer = IntentQueue()
+        reader = IntentQueue()
+
+        writer.enqueue({"plan_path": "a.json"})
+        self.assertEqual(len(reader.load()), 1)
+
+        writer.enqueue({"plan_path": "b.json", "priority": 2})
+        dequeued = reader.dequeue()
+
+        self.assertEqual(dequeued["plan_path"], "b.json")
+        self.assertEqual(writer.load()[0]["status"], "processing")
+
+    def test_ordering_matches_stable_priority_sort(self):
+        queue = IntentQueue()
+        priorities = [1, 3, 2, 3, 1, 2]
+        for idx, priority in enumerate(priorities):
+            queue.enqueue({"plan_path": f"{idx}.json", "priority": priority})
+
+        expected = sorted(range(len(priorities)), key=lambda i: priorities[i], reverse=True)
+        self.assertEqual([i["plan_path"] for i in queue.load()], [f"{i}.json" for i in expected])
+
+    def test_compaction_rewrites_snapshot_and_empties_journal(self):
+        queue = IntentQueue()
+        # 6 registros: a compactaao so dispara depois do ultimo update
+        with mock.patch.object(intent_queue, "COMPACT_MIN_RECORDS", 6):
+            for idx in range(2):
+                queue.enqueue({"plan_path": f"{idx}.json"})
+            for _ in range(2):
+                intent = queue.dequeue()
+                queue.update(intent["id"], status="approved_for_dry_run")
+            queue.wait_for_compaction(5)
+
+        snapshot = json.loads(self.queue_file.read_text(encoding="utf-8"))
+        self.assertEqual([i["status"] for i in snapshot], ["approved_for_dry_run"] * 2)
+        self.assertLess(len(self.journal_file.read_bytes().splitlines()), 6)
+        self.assertEqual(IntentQueue().load(), snapshot)
+
+    def test_compaction_frequency_scales_with_snapshot_size(self):
+        queue = IntentQueue()
+        with mock.patch.object(IntentQueue, "compact", autospec=True, side_effect=IntentQueue.compact) as compact:
+            for idx in range(1000):
+                queue.enqueue({"plan_path": f"{idx}.json"})
+                intent = queue.dequeue(lease_owner="worker")
+                queue.finish(intent["id"], "worker", status="executed")
+                queue.wait_for_compaction(5)
+
+        # Snapshot cresce com a fila: compactaoes ficam cada vez mais raras
+        self.assertLessEqual(compact.call_count, 10)
+        self.assertEqual(IntentQueue().pending_count(), 0)
+        self.assertEqual(len(IntentQueue().load()), 1000)
+
+
+class IntentPriorityIndexTests(IntentQueueTestCase):
+    def test_dequeue_order_matches_legacy_scan(self):
+        queue = IntentQueue()
+        priorities = [1, 3, 2, 3, 1, 2, 5, 1]
+        for idx, priority in enumerate(priorities):
+            queue.enqueue({"plan_path": f"{idx}.json", "priority": priority})
+
+        # Ordem de referencia: primeiro "pending" da lista ordenada
+        expected = []
+        reference = queue.load()
+        for _ in priorities:
+            intent = next(i for i in reference if i["status"] == "pending")
+            intent["status"] = "processing"
+            expected.append(intent["plan_path"])
+
+        got = [queue.dequeue()["plan_path"] for _ in priorities]
+        self.assertEqual(got, expected)
+        self.assertIsNone(queue.dequeue())
+
+    def test_index_follows_status_and_priority_changes(self):
+        queue = IntentQueue()
+        for idx in range(3):
+            queue.enqueue({"plan_path": f"{idx}.json"})
+
+        queue.update("intent_1", status="blocked")
+        queue.update("intent_3", priority=9)
+        self.assertEqual(queue.pending_count(), 2)
+        self.assertEqual(queue.peek()["id"], "intent_3")
+
+        queue.update("intent_1", status="pending")
+        self.assertEqual([queue.dequeue()["id"] for _ in range(3)], ["intent_3", "intent_1", "intent_2"])
+        self.assertEqual(queue.pending_count(), 0)
+
+    def test_finished_intents_do_not_enter_the_index(self):
+        history = [
+            {"id": f"done_{idx}", "plan_path": "a.json", "priority": 1, "status": "approved_for_dry_run"}
+            for idx in range(500)
+        ]
+        self.queue_file.write_text(json.dumps(history), encoding="utf-8")
+
+        queue = IntentQueue()
+        queue.enqueue({"plan_path": "b.json"})
+
+        self.assertEqual(len(queue._pending_heap), 1)
+        self.assertEqual(queue.dequeue()["plan_path"], "b.json")
+
+
+class LeaseTests(IntentQueueTestCase):
+    def _queue(self):
+        return IntentQueue()
+
+    def test_claim_records_owner_and_expiry(self):
+        queue = self._queue()
+        queue.enqueue({"plan_path": "a.json"})
+
+        with mock.patch("time.time", return_value=1000.0):
+            intent = queue.dequeue(lease_owner="worker-a", lease_seconds=30)
+
+        self.assertEqual(intent["status"], "processing")
+        self.assertEqual(intent["lease_owner"], "worker-a")
+        self.assertEqual(intent["lease_expires_at"], 1030.0)
+
+    def test_expired_lease_returns_intent_to_pending(self):
+        queue = self._queue()
+        queue.enqueue({"plan_path": "a.json"})
+        queue.dequeue(lease_owner="worker-a", lease_seconds=0.01)
+
+        with mock.patch("time.time", return_value=intent_queue.time.time() + 1):
+            reclaimed = queue.dequeue(lease_owner="worker-b", lease_seconds=30)
+
+        self.assertEqual(reclaimed["id"], "intent_1")
+        self.assertEqual(reclaimed["lease_owner"], "worker-b")
+        self.assertEqual(reclaimed["lease_expirations"], 1)
+
+        # O consumidor original perdeu o lease: nao sobrescreve o resultado
+        self.assertFalse(queue.finish("intent_1", "worker-a", status="approved_for_dry_run"))
+        self.assertTrue(queue.finish("intent_1", "worker-b", status="blocked"))
+        self.assertEqual(queue.load()[0]["status"], "blocked")
+
+    def test_live_lease_is_not_reclaimed_and_can_be_renewed(self):
+        queue = self._queue()
+        queue.enqueue({"plan_path": "a.json"})
+        queue.dequeue(lease_owner="worker-a", lease_seconds=30)
+
+        self.assertIsNone(queue.dequeue(lease_owner="worker-b", lease_seconds=30))
+        self.assertEqual(queue.requeue_expired(), 0)
+        self.assertTrue(queue.renew_lease("intent_1", "worker-a", lease_seconds=60))
+        self.assertFalse(queue.renew_lease("intent_1", "worker-b", lease_seconds=60))
+
+    def test_legacy_processing_without_lease_is_kept(self):
+        queue = self._queue()
+        queue.enqueue({"plan_path": "a.json"})
+        queue.dequeue()
+
+        with mock.patch("time.time", return_value=intent_queue.time.time() + 10**6):
+            self.assertEqual(queue.requeue_expired(), 0)
+        self.assertEqual(queue.load()[0]["status"], "processing")
+
+
+class SQLiteLeaseTests(LeaseTests):
+    def _queue(self):
+        queue = SQLiteIntentQueue(Path(self._tmp.name) / "intents_queue.db")
+        self.addCleanup(queue.close)
+        return queue
+
+
+class SQLiteWithoutReturningLeaseTests(SQLiteLeaseTests):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(intent_queue_sqlite, "_SUPPORTS_RETURNING", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_claims_follow_priority_order(self):
+        queue = self._queue()
+        for idx, priority in enumerate([1, 3, 2]):
+            queue.enqueue({"plan_path": f"{idx}.json", "priority": priority})
+
+        claimed = [queue.dequeue(lease_owner="worker-a")["plan_path"] for _ in range(3)]
+
+        self.assertEqual(claimed, ["1.json", "2.json", "0.json"])
+        self.assertIsNone(queue.dequeue())
+
+
+def _claim_worker(base, owner, results):
+    with mock.patch.object(intent_queue, "INTENT_QUEUE_FILE", base / "intents_queue.json"), \
+            mock.patch.object(intent_queue, "INTENT_JOURNAL_FILE", base / "intents_queue.journal"), \
+            mock.patch.object(intent_queue, "INTENT_LOCK_FILE", base / "intents_queue.lock"):
+        queue = IntentQueue()
+        while True:
+            intent = queue.dequeue(lease_owner=owner, lease_seconds=60)
+            if intent is None:
+                return
+            results.put(intent["id"])
+            queue.finish(intent["id"], owner, status="approved_for_dry_run")
+
+
+class ConcurrentConsumerTests(IntentQueueTestCase):
+    def test_processes_never_claim_the_same_intent(self):
+        queue = IntentQueue()
+        for idx in range(40):
+            queue.enqueue({"plan_path": f"{idx}.json"})
+
+        ctx = multiprocessing.get_context("fork")
+        results = ctx.Queue()
+        base = Path(self._tmp.name)
+        workers = [
+            ctx.Process(target=_claim_worker, args=(base, f"worker-{n}", results))
+            for n in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+
+        claimed = [results.get(timeout=5) for _ in range(40)]
+        self.assertEqual(len(set(claimed)), 40)
+        self.assertEqual({i["status"] for i in queue.load()}, {"approved_for_dry_run"})
+
+
+class SQLiteIntentQueueTests(IntentQueueTestCase):
+    def setUp(self):
+        super().setUp()
+        self.db_path = Path(self._tmp.name) / "intents_queue.db"
+
+    def _queue(self) -> SQLiteIntentQueue:
+        queue = SQLiteIntentQueue(self.db_path)
+        self.addCleanup(queue.close)
+        return queue
+
+    def test_same_ordering_and_api_as_json_backend(self):
+        json_queue = IntentQueue()
+        sqlite_queue = self._queue()
+
+        for idx, priority in enumerate([1, 3, 2, 3, 1]):
+            for queue in (json_queue, sqlite_queue):
+                queue.enqueue({"plan_path": f"{idx}.json", "priority": priority})
+
+        self.assertEqual(sqlite_queue.load(), json_queue.load())
+
+        for _ in range(5):
+            self.assertEqual(sqlite_queue.dequeue(), json_queue.dequeue())
+        self.assertIsNone(sqlite_queue.dequeue())
+
+    def test_update_and_save_round_trip(self):
+        queue = self._queue()
+        queue.enqueue({"plan_path": "a.json"})
+        queue.enqueue({"plan_path": "b.json"})
+
+        queue.update("intent_1", status="blocked")
+        self.assertEqual(queue.status_counts(), {"blocked": 1, "pending": 1})
+
+        intents = queue.load()
+        intents[1]["status"] = "error"
+        queue.save(intents[1:])
+        self.assertEqual([(i["id"], i["status"]) for i in queue.load()], [("intent_2", "error")])
+
+    def test_save_beyond_sql_variable_limit(self):
+        queue = self._queue()
+        intents = [
+            {"id": f"intent_{idx}", "plan_path": "a.json", "priority": 1, "status": "pending"}
+            for idx in range(40000)
+        ]
+        queue.save(intents)
+        queue.save(intents[1:])
+
+        self.assertEqual(queue.pending_count(), 39999)
+        self.assertEqual(queue.peek()["id"], "intent_1")
+
+    def test_enqueue_and_pending_count_avoid_table_scans(self):
+        queue = self._queue()
+        queue.save([
+            {"id": f"intent_{idx}", "plan_path": "a.json", "priority": 1, "status": "done"}
+            for idx in range(1, 6)
+        ])
+        queue.save(queue.load()[2:])
+
+        statements = []
+        queue._conn.set_trace_callback(statements.append)
+        queue.enqueue({"plan_path": "b.json"})
+        queue._conn.set_trace_callback(None)
+
+        self.assertFalse([sql for sql in statements if "COUNT(*)" in sql])
+        self.assertEqual(queue.peek()["id"], "intent_6")
+
+        plan = queue._conn.execute(
+            "EXPLAIN QUERY PLAN SELECT COUNT(*) FROM intents WHERE status = 'pending'"
+        ).fetchall()
+        self.assertIn("COVERING INDEX", plan[0][-1])
+        self.assertEqual(queue.pending_count(), 1)
+
+    def test_claims_from_two_connections_never_overlap(self):
+        first = self._queue()
+        second = self._queue()
+        for idx in range(6):
+            first.enqueue({"plan_path": f"{idx}.json"})
+
+        claimed = []
+        for queue in (first, second, first, second, first, second):
+            claimed.append(queue.dequeue()["id"])
+
+        self.assertEqual(len(set(claimed)), 6)
+        self.assertIsNone(second.dequeue())
+
+    def test_migrator_copies_json_queue_once(self):
+        json_queue = IntentQueue()
+        for idx, priority in enumerate([1, 2, 1]):
+            json_queue.enqueue({"plan_path": f"{idx}.json", "priority": priority})
+
+        self.assertEqual(migrate_json_queue(self.db_path), 3)
+        self.assertEqual(migrate_json_queue(self.db_path), 0)
+        self.assertEqual(self._queue().load(), json_queue.load())
+
+
+class ReactiveTestCase(IntentQueueTestCase):
+    def setUp(self):
+        super().setUp()
+        for name in ("log_decision", "increment_metric"):
+            patcher = mock.patch.object(autonomy_reactive, name)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        config = AppConfig(
+            log_level="INFO",
+            ai_provider="none",
+            ai_api_key="",
+            telegram_token="",
+            curupira_risk_threshold=0.4,
+            log_dir="logs",
+            data_dir="data",
+            supervisor_enabled=False,
+            curupira_enabled=False,
+            autonomy_reactive_enabled=True,
+        )
+        self.reactive = autonomy_reactive.ReactiveAutonomy(config)
+        self.addCleanup(self.reactive.close)
+
+        plan_path = Path(self._tmp.name) / "plan.json"
+        plan_path.write_text(json.dumps({"id": "p1", "risk_score": 1}), encoding="utf-8")
+        self.plan_path = str(plan_path)
+
+    def _enqueue(self, count: int) -> None:
+        queue = IntentQueue()
+        for idx in range(count):
+            # Uma intent invalida a cada cinco
+            queue.enqueue({"plan_path": self.plan_path if idx % 5 else ""})
+
+
+class ReactiveDrainTests(ReactiveTestCase):
+    def test_drains_queue_with_worker_pool(self):
+        self._enqueue(20)
+        ready = []
+
+        summary = self.reactive.drain(workers=4, on_ready=lambda result: ready.append(result) or "dry_run_executed")
+
+        self.assertEqual(summary["processed"], 20)
+        self.assertEqual(summary["statuses"], {"dry_run_executed": 16, "invalid_intent": 4})
+        self.assertTrue(summary["queue_empty"])
+        self.assertEqual(len(ready), 16)
+        self.assertEqual(IntentQueue().pending_count(), 0)
+
+    def test_stops_at_max_intents_and_on_signal(self):
+        self._enqueue(10)
+
+        summary = self.reactive.drain(max_intents=3, workers=2)
+        self.assertEqual(summary["processed"], 3)
+        self.assertFalse(summary["queue_empty"])
+
+        summary = self.reactive.drain(workers=2, should_continue=lambda: False)
+        self.assertEqual(summary["processed"], 0)
+        self.assertEqual(IntentQueue().pending_count(), 7)
+
+    def test_advice_pool_follows_worker_count(self):
+        self.assertEqual(self.reactive._get_advice_pool()._max_workers, 4)
+
+        self.reactive.drain(workers=8)
+        self.assertEqual(self.reactive._get_advice_pool()._max_workers, 8)
+
+        self.reactive.drain(workers=2)
+        self.assertEqual(self.reactive._get_advice_pool()._max_workers, 8)
+
+    def test_close_cancels_queued_advice_without_waiting(self):
+        release = threading.Event()
+        with mock.patch.dict("os.environ", {"AI_ADVISOR_POOL_SIZE": "1"}):
+            pool = self.reactive._get_advice_pool()
+        running = pool.submit(release.wait, 5)
+        queued = pool.submit(lambda: "late")
+
+        started = time.monotonic()
+        self.reactive.close()
+        self.assertLess(time.monotonic() - started, 1.0)
+
+        self.assertTrue(queued.cancelled())
+        self.assertIsNone(self.reactive._advice_pool)
+        release.set()
+        self.assertTrue(running.result(5))
+        self.assertIsNot(self.reactive._get_advice_pool(), pool)
+
+    def test_batcher_uses_the_owners_current_pool(self):
+        self.reactive.ai_advisor = mock.Mock(provider=mock.Mock(recommend_batch=None))
+        with mock.patch.object(autonomy_reactive, "read_ai_batch_window_seconds", return_value=0.01):
+            batcher = self.reactive._make_advice_batcher(2)
+        batcher.advisor.analyze_batch.return_value = [None, None]
+
+        # Pool recriado (mais workers) depois da criaao do batcher
+        self.reactive._advice_workers = 16
+        current = self.reactive._get_advice_pool()
+
+        with mock.patch.object(current, "submit", wraps=current.submit) as submit, \
+                mock.patch.object(autonomy_reactive, "build_shared_context", return_value={}):
+            futures = [batcher.submit({"id": "p1"}), batcher.submit({"id": "p2"})]
+            self.assertEqual([f.result(5) for f in futures], [None, None])
+        self.assertEqual(submit.call_count, 1)
+
+    def test_advice_pool_size_from_env(self):
+        with mock.patch.dict("os.environ", {"AI_ADVISOR_POOL_SIZE": "12"}):
+            self.reactive.drain(workers=2)
+            self.assertEqual(self.reactive._get_advice_pool()._max_workers, 12)
+
+    def test_small_drains_skip_summary_record(self):
+        self._enqueue(3)
+
+        def _summaries() -> int:
+            calls = autonomy_reactive.log_decision.call_args_list
+            return sum(1 for c in calls if c.args[0].get("event") == "drain_summary")
+
+        self.reactive.drain(max_intents=2, summary_min_intents=3)
+        self.assertEqual(_summaries(), 0)
+
+        self.reactive.drain(summary_min_intents=1)
+        self.assertEqual(_summaries(), 1)
+
+
+class _SlowProvider:
+    provider_name = "fake"
+    model_name = "fake-model"
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def recommend(self, plan: dict, context: dict) -> dict | None:
+        del plan, context
+        time.sleep(self.delay)
+        return {
+            "suggested_action": "dry_run",
+            "risk_assessment": {"level": "low", "score": 1},
+            "confidence": 0.9,
+            "explanation": "ok",
+        }
+
+
+class ReactiveAdviceTests(ReactiveTestCase):
+    def setUp(self):
+        super().setUp()
+        for patcher in (
+            mock.patch("core.ai_advisor.log_decision"),
+            mock.patch.object(autonomy_reactive, "build_ai_context", return_value={}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _decision(self, delay: float, deadline: float) -> dict:
+        self.reactive.ai_advisor = AIAdvisor(provider=_SlowProvider(delay))
+        self.reactive.intent_deadline_seconds = deadline
+        IntentQueue().enqueue({"plan_path": self.plan_path})
+
+        started = time.monotonic()
+        result = self.reactive.process_next_intent()
+        self.elapsed = time.monotonic() - started
+
+        self.assertEqual(result["status"], "ready_for_dry_run")
+        records = [c.args[0] for c in autonomy_reactive.log_decision.call_args_list]
+        return next(r for r in records if r.get("event") == "approved_for_dry_run")
+
+    def test_advice_is_attached_when_it_arrives_in_time(self):
+        record = self._decision(delay=0.05, deadline=2)
+
+        self.assertEqual(record["ai_status"], "ok")
+        self.assertEqual(record["ai_recommendation"]["suggested_action"], "dry_run")
+
+    def test_late_advice_does_not_hold_the_decision(self):
+        record = self._decision(delay=0.5, deadline=0.05)
+
+        self.assertEqual(record["ai_status"], "late")
+        self.assertLess(self.elapsed, 0.4)
+
+        self.reactive._advice_pool.shutdown(wait=True)
+        late = autonomy_reactive.log_decision.call_args_list[-1].args[0]
+        self.assertEqual(late["event"], "ai_advice_late")
+        self.assertEqual(late["ai_status"], "ok")
+
+    def test_disabled_advisor_leaves_record_unchanged(self):
+        IntentQueue().enqueue({"plan_path": self.plan_path})
+        self.reactive.process_next_intent()
+
+        records = [c.args[0] for c in autonomy_reactive.log_decision.call_args_list]
+        self.assertNotIn("ai_status", records[-1])
+
+    def test_concurrent_workers_share_batched_requests(self):
+        batches = []
+
+        class _BatchProvider(_SlowProvider):
+            def recommend_batch(self, plans, context):
+                batches.append(len(plans))
+                return [self.recommend(plan, context) for plan in plans]
+
+        self.reactive.ai_advisor = AIAdvisor(provider=_BatchProvider(0))
+        self.reactive.intent_deadline_seconds = 2
+        queue = IntentQueue()
+        for _ in range(8):
+            queue.enqueue({"plan_path": self.plan_path})
+
+        with mock.patch.object(autonomy_reactive, "build_shared_context", return_value={}):
+            summary = self.reactive.drain(workers=4)
+
+        self.assertEqual(summary["statuses"], {"ready_for_dry_run": 8})
+        self.assertEqual(sum(batches), 8)
+        self.assertLess(len(batches), 8)
+
+        records = [c.args[0] for c in autonomy_reactive.log_decision.call_args_list]
+        approved = [r for r in records if r.get("event") == "approved_for_dry_run"]
+        self.assertTrue(all(r["ai_status"] == "ok" for r in approved))
+
+
+class QueueWatcherTests(IntentQueueTestCase):
+    def _assert_wakes_on_enqueue(self, queue, use_inotify):
+        watcher = QueueWatcher(queue.watch_paths(), poll_interval=0.01, use_inotify=use_inotify)
+        self.addCleanup(watcher.close)
+
+        self.assertFalse(watcher.wait(0.05))
+
+        timer = threading.Timer(0.05, queue.enqueue, args=({"plan_path": "a.json"},))
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        started = time.monotonic()
+        self.assertTrue(watcher.wait(5))
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(queue.pending_count(), 1)
+        return watcher
+
+    def test_inotify_wakes_on_journal_append(self):
+        watcher = self._assert_wakes_on_enqueue(IntentQueue(), use_inotify=None)
+        if watcher.mode != "inotify":
+            self.skipTest("inotify indisponivel")
+
+    def test_polling_fallback_wakes_on_journal_append(self):
+        watcher = self._assert_wakes_on_enqueue(IntentQueue(), use_inotify=False)
+        self.assertEqual(watcher.mode, "poll")
+
+    def test_sqlite_commit_wakes_watcher(self):
+        queue = SQLiteIntentQueue(Path(self._tmp.name) / "intents_queue.db")
+        self.addCleanup(queue.close)
+        self._assert_wakes_on_enqueue(queue, use_inotify=None)
+
+    def test_unrelated_files_do_not_wake_inotify(self):
+        watcher = QueueWatcher(IntentQueue().watch_paths(), use_inotify=True)
+        self.addCleanup(watcher.close)
+        if watcher.mode != "inotify":
+            self.skipTest("inotify indisponivel")
+
+        (Path(self._tmp.name) / "autonomy_metrics.json").write_text("{}", encoding="utf-8")
+        self.assertFalse(watcher.wait(0.1))
+
+
+if __name__ == "__main__":
+    unittest.main()
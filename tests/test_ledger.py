@@ -0,0 +1,526 @@
+import gzip
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import os
+
+import core.executor as executor
+import core.ledger_parallel as ledger_parallel
+import core.ledger_segments as ledger_segments
+import core.ledger_verify as ledger_verify
+from core.ledger_head import head_path_for, read_ledger_head
+from core.ledger_segments import export_entry_proof, load_manifest, seal_marker_path_for, segments_dir_for
+from core.ledger_merkle import (
+    MerkleIndex,
+    _split,
+    find_entry_index,
+    leaf_hash,
+    merkle_dir_for,
+    node_hash,
+    verify_inclusion,
+    verify_range,
+)
+
+
+def _report(idx: int) -> dict:
+    return {
+        "plan_id": f"plan_{idx}",
+        "mode": "dry-run",
+        "plan_sha256": "a" * 64,
+        "policy_sha256": "b" * 64,
+        "policy_version": "1",
+        "risk_score": 1,
+    }
+
+
+class LedgerTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.history_file = Path(self._tmp.name) / "history" / "execution_history.log"
+
+        for module in (executor, ledger_verify):
+            patcher = mock.patch.object(module, "HISTORY_FILE", self.history_file)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _append(self, count: int, start: int = 0) -> None:
+        for idx in range(start, start + count):
+            executor.append_history(_report(idx))
+
+    def _entries(self) -> list:
+        lines = self.history_file.read_text(encoding="utf-8").splitlines()
+        return [json.loads(line) for line in lines if line.strip()]
+
+
+class LedgerHeadTests(LedgerTestCase):
+    def test_sidecar_tracks_last_entry(self):
+        self._append(3)
+
+        head = json.loads(head_path_for(self.history_file).read_text(encoding="utf-8"))
+        entries = self._entries()
+
+        self.assertEqual(head["entries"], 3)
+        self.assertEqual(head["entry_hash"], entries[-1]["entry_hash"])
+        self.assertEqual(head["size"], self.history_file.stat().st_size)
+        self.assertEqual(entries[1]["previous_hash"], entries[0]["entry_hash"])
+        self.assertEqual(ledger_verify.verify_ledger()["entries"], 3)
+
+    def test_missing_sidecar_falls_back_to_backward_scan(self):
+        self._append(2)
+        head_path_for(self.history_file).unlink()
+
+        self.assertEqual(executor.get_last_history_hash(), self._entries()[-1]["entry_hash"])
+
+        self._append(1, start=2)
+        self.assertEqual(read_ledger_head(self.history_file)["entries"], 3)
+        self.assertTrue(ledger_verify.verify_ledger()["ok"])
+
+    def test_stale_sidecar_is_ignored(self):
+        self._append(2)
+        stale = head_path_for(self.history_file).read_text(encoding="utf-8")
+        self._append(1, start=2)
+        head_path_for(self.history_file).write_text(stale, encoding="utf-8")
+
+        self.assertEqual(executor.get_last_history_hash(), self._entries()[-1]["entry_hash"])
+
+
+    def test_concurrent_appends_keep_a_single_chain(self):
+        threads = [
+            threading.Thread(target=self._append, args=(10, n * 10))
+            for n in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        result = ledger_verify.verify_ledger(full=True)
+        self.assertTrue(result["ok"])
+        self.assertEqual(result["entries"], 40)
+        self.assertEqual(read_ledger_head(self.history_file)["entries"], 40)
+
+
+class LedgerCheckpointTests(LedgerTestCase):
+    def test_second_run_only_verifies_new_entries(self):
+        self._append(4)
+        first = ledger_verify.verify_ledger()
+        self.assertEqual(first["mode"], "full")
+        self.assertEqual(first["verified_entries"], 4)
+
+        self._append(2, start=4)
+        second = ledger_verify.verify_ledger()
+        self.assertEqual(second["mode"], "incremental")
+        self.assertEqual(second["entries"], 6)
+        self.assertEqual(second["verified_entries"], 2)
+
+        full = ledger_verify.verify_ledger(full=True)
+        self.assertEqual(full["mode"], "full")
+        self.assertEqual(full["verified_entries"], 6)
+
+    def test_tail_corruption_reports_absolute_line_number(self):
+        self._append(3)
+        ledger_verify.verify_ledger()
+
+        with open(self.history_file, "a", encoding="utf-8") as f:
+            f.write("{not json}\n")
+
+        with self.assertRaisesRegex(ledger_verify.LedgerIntegrityError, "^Line 4: invalid JSON"):
+            ledger_verify.verify_ledger()
+
+    def _tamper(self, index: int, risk_score: int) -> None:
+        lines = self.history_file.read_text(encoding="utf-8").splitlines()
+        entry = json.loads(lines[index])
+        entry["risk_score"] = risk_score
+        lines[index] = json.dumps(entry)
+        self.history_file.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    def test_changed_checkpoint_entry_falls_back_to_full_verification(self):
+        self._append(3)
+        ledger_verify.verify_ledger()
+        self._tamper(2, 5)
+
+        with self.assertRaisesRegex(ledger_verify.LedgerIntegrityError, "^Line 3: entry_hash mismatch"):
+            ledger_verify.verify_ledger()
+
+    def test_shifted_history_before_checkpoint_is_detected(self):
+        self._append(3)
+        ledger_verify.verify_ledger()
+        self._tamper(0, 15)
+
+        with self.assertRaisesRegex(ledger_verify.LedgerIntegrityError, "^Line 1: entry_hash mismatch"):
+            ledger_verify.verify_ledger()
+
+    def test_full_mode_detects_same_size_tamper_before_checkpoint(self):
+        self._append(3)
+        ledger_verify.verify_ledger()
+        self._tamper(0, 5)
+
+        with self.assertRaisesRegex(ledger_verify.LedgerIntegrityError, "^Line 1: entry_hash mismatch"):
+            ledger_verify.verify_ledger(full=True)
+
+
+class ParallelLedgerVerificationTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(ledger_parallel, "MIN_PARALLEL_BYTES", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _errors(self):
+        messages = []
+        for workers in (1, 3):
+            try:
+                ledger_verify.verify_ledger(full=True, workers=workers)
+                messages.append(None)
+            except ledger_verify.LedgerIntegrityError as e:
+                messages.append(str(e))
+        return messages
+
+    def test_chunks_cover_file_on_line_boundaries(self):
+        self._append(20)
+        size = self.history_file.stat().st_size
+        data = self.history_file.read_bytes()
+
+        chunks = ledger_parallel.split_chunks(self.history_file, size, 6)
+
+        self.assertEqual(chunks[0][0], 0)
+        self.assertEqual(chunks[-1][1], size)
+        for start, _end in chunks[1:]:
+            self.assertEqual(data[start - 1:start], b"\n")
+
+    def test_parallel_matches_sequential_result(self):
+        self._append(30)
+
+        result = ledger_verify.verify_ledger(full=True, workers=3)
+
+        self.assertEqual(result["entries"], 30)
+        self.assertEqual(ledger_verify.load_checkpoint()["entry_hash"], self._entries()[-1]["entry_hash"])
+
+    def test_parallel_reports_same_first_failure(self):
+        self._append(30)
+        lines = self.history_file.read_text(encoding="utf-8").splitlines()
+
+        # Quebra o encadeamento numa linha qualquer e corrompe uma posterior
+        entry = json.loads(lines[17])
+        entry["previous_hash"] = "0" * 64
+        lines[17] = json.dumps(entry)
+        lines[25] = "{broken"
+        self.history_file.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+        sequential, parallel = self._errors()
+        self.assertTrue(sequential.startswith("Line 18: previous_hash mismatch"))
+        self.assertEqual(parallel, sequential)
+
+    def test_parallel_reports_same_invalid_json_message(self):
+        self._append(12)
+        lines = self.history_file.read_text(encoding="utf-8").splitlines()
+        lines[9] = "{broken"
+        self.history_file.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+        sequential, parallel = self._errors()
+        self.assertTrue(sequential.startswith("Line 10: invalid JSON"))
+        self.assertEqual(parallel, sequential)
+
+
+def _naive_root(hashes: list) -> bytes:
+    if len(hashes) == 1:
+        return leaf_hash(hashes[0])
+    k = _split(len(hashes))
+    return node_hash(_naive_root(hashes[:k]), _naive_root(hashes[k:]))
+
+
+class LedgerMerkleTests(LedgerTestCase):
+    def test_incremental_root_matches_full_tree(self):
+        merkle = MerkleIndex(self.history_file)
+
+        for count in range(1, 12):
+            self._append(1, start=count)
+            hashes = [e["entry_hash"] for e in self._entries()]
+            self.assertEqual(merkle.size(), count)
+            self.assertEqual(merkle.root(), _naive_root(hashes).hex())
+
+    def test_inclusion_and_range_proofs_verify(self):
+        self._append(13)
+        merkle = MerkleIndex(self.history_file)
+        hashes = [e["entry_hash"] for e in self._entries()]
+        root = merkle.root()
+
+        for index, entry_hash in enumerate(hashes):
+            proof = merkle.inclusion_proof(index)
+            self.assertTrue(verify_inclusion(entry_hash, index, proof["size"], proof["proof"], root))
+            self.assertFalse(verify_inclusion("f" * 64, index, proof["size"], proof["proof"], root))
+
+        proof = merkle.range_proof(4, 9)
+        self.assertTrue(verify_range(hashes[4:10], 4, proof["size"], proof["proof"], root))
+        self.assertFalse(verify_range(hashes[3:9], 4, proof["size"], proof["proof"], root))
+
+    def test_entries_are_read_by_offset(self):
+        self._append(6)
+        merkle = MerkleIndex(self.history_file)
+
+        self.assertEqual(merkle.read_entries(2, 3), self._entries()[2:4])
+
+    def test_plan_lookup_uses_index_not_ledger(self):
+        self._append(6)
+        self._append(1, start=2)
+
+        with mock.patch.object(MerkleIndex, "rebuild") as rebuild:
+            self.assertEqual(find_entry_index(self.history_file, "plan_2"), 6)
+            self.assertEqual(find_entry_index(self.history_file, "plan_4"), 4)
+            self.assertIsNone(find_entry_index(self.history_file, "plan_missing"))
+        rebuild.assert_not_called()
+
+    def test_index_without_plan_keys_is_rebuilt(self):
+        self._append(3)
+        (merkle_dir_for(self.history_file) / "plan_keys.bin").unlink()
+
+        self.assertEqual(find_entry_index(self.history_file, "plan_1"), 1)
+
+    def test_sequential_appends_never_rebuild_the_index(self):
+        self._append(1)
+        with mock.patch.object(MerkleIndex, "rebuild", autospec=True, side_effect=MerkleIndex.rebuild) as rebuild:
+            self._append(50, start=1)
+
+        self.assertEqual(rebuild.call_count, 0)
+        hashes = [e["entry_hash"] for e in self._entries()]
+        self.assertEqual(MerkleIndex(self.history_file).root(), _naive_root(hashes).hex())
+
+    def test_consistency_checks_tail_leaf_against_ledger(self):
+        self._append(4)
+        merkle = MerkleIndex(self.history_file)
+        self.assertTrue(merkle.is_consistent())
+        original = self.history_file.read_text(encoding="utf-8")
+
+        lines = original.splitlines()
+        entry = json.loads(lines[-1])
+        entry["entry_hash"] = "f" * 64
+        lines[-1] = json.dumps(entry)
+        self.history_file.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        self.assertFalse(merkle.is_consistent())
+
+        self.history_file.write_text(original + json.dumps(entry) + "\n", encoding="utf-8")
+        self.assertFalse(merkle.is_consistent())
+
+    def test_missing_index_is_rebuilt_on_next_append(self):
+        self._append(5)
+        merkle = MerkleIndex(self.history_file)
+        shutil.rmtree(merkle_dir_for(self.history_file))
+
+        self._append(1, start=5)
+
+        hashes = [e["entry_hash"] for e in self._entries()]
+        self.assertEqual(merkle.size(), 6)
+        self.assertEqual(merkle.root(), _naive_root(hashes).hex())
+
+
+class LedgerSegmentTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.dict(os.environ, {"LEDGER_SEGMENT_MAX_ENTRIES": "4"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_active_segment_rotates_and_chain_continues(self):
+        self._append(10)
+
+        manifest = load_manifest(self.history_file)
+        active = self._entries()
+
+        self.assertEqual([r["entries"] for r in manifest], [4, 4])
+        self.assertEqual(manifest[1]["first_previous_hash"], manifest[0]["last_hash"])
+        self.assertEqual(len(active), 2)
+        self.assertEqual(active[0]["previous_hash"], manifest[1]["last_hash"])
+
+        with gzip.open(segments_dir_for(self.history_file) / manifest[0]["file"], "rt") as f:
+            footer = json.loads(f.read().splitlines()[-1])["segment_footer"]
+        self.assertEqual(footer["last_hash"], manifest[0]["last_hash"])
+
+        result = ledger_verify.verify_ledger()
+        self.assertEqual(result["entries"], 10)
+        self.assertEqual(result["active_entries"], 2)
+        self.assertEqual(ledger_verify.verify_ledger(full=True)["entries"], 10)
+
+    def test_full_verification_checks_sealed_segments_in_parallel(self):
+        self._append(14)
+
+        with mock.patch.object(
+            ledger_parallel, "verify_segments_parallel", wraps=ledger_parallel.verify_segments_parallel,
+        ) as parallel:
+            result = ledger_verify.verify_ledger(full=True, workers=3)
+
+        self.assertEqual(parallel.call_count, 1)
+        self.assertEqual(result["entries"], 14)
+
+        # Segmentos 2 e 3 corrompidos: paralelo reporta o primeiro, como o sequencial
+        manifest = load_manifest(self.history_file)
+        for record in manifest[1:]:
+            with open(segments_dir_for(self.history_file) / record["file"], "ab") as f:
+                f.write(b"\0")
+
+        messages = []
+        for workers in (1, 3):
+            with self.assertRaises(ledger_verify.LedgerIntegrityError) as ctx:
+                ledger_verify.verify_ledger(full=True, workers=workers)
+            messages.append(str(ctx.exception))
+        self.assertEqual(messages, ["Segment 2: archive sha256 mismatch"] * 2)
+
+    def test_seal_compresses_and_hashes_outside_history_lock(self):
+        held = []
+        file_sha256 = ledger_segments._file_sha256
+
+        def _sha256(path):
+            held.append(executor._HISTORY_LOCK.locked())
+            return file_sha256(path)
+
+        with mock.patch.object(ledger_segments, "_file_sha256", _sha256):
+            self._append(4)
+
+        self.assertEqual(held, [False])
+        record = load_manifest(self.history_file)[0]
+        self.assertTrue(record["file"].endswith(".gz"))
+        self.assertFalse((segments_dir_for(self.history_file) / record["file"][:-3]).exists())
+
+    def test_interrupted_archive_is_resumed(self):
+        with mock.patch.object(ledger_segments, "_file_sha256", side_effect=OSError("crash")):
+            with self.assertRaises(OSError):
+                self._append(4)
+
+        record = load_manifest(self.history_file)[0]
+        self.assertIsNone(record["sha256"])
+        self.assertEqual(self._entries(), [])
+        self.assertEqual(ledger_verify.verify_ledger(full=True)["entries"], 4)
+
+        record = load_manifest(self.history_file)[0]
+        self.assertTrue(record["file"].endswith(".gz"))
+        self.assertIsNotNone(record["sha256"])
+        self._append(2, start=4)
+        self.assertEqual(ledger_verify.verify_ledger(full=True)["entries"], 6)
+
+    def test_interrupted_seal_is_completed(self):
+        self._append(3)
+        with mock.patch.object(ledger_segments, "save_manifest", side_effect=OSError("crash")):
+            with self.assertRaises(OSError):
+                self._append(1, start=3)
+
+        self.assertTrue(seal_marker_path_for(self.history_file).exists())
+        self.assertEqual(load_manifest(self.history_file), [])
+        self.assertEqual(len(self._entries()), 4)
+
+        self.assertEqual(ledger_verify.verify_ledger()["entries"], 4)
+        self.assertFalse(seal_marker_path_for(self.history_file).exists())
+        self.assertEqual(self._entries(), [])
+
+        self._append(2, start=4)
+        self.assertEqual(ledger_verify.verify_ledger(full=True)["entries"], 6)
+
+    def test_interrupted_seal_is_completed_before_next_append(self):
+        self._append(3)
+        # Crash entre o manifesto e o esvaziamento do segmento ativo
+        with mock.patch.object(ledger_segments, "merkle_dir_for", side_effect=OSError("crash")):
+            with self.assertRaises(OSError):
+                self._append(1, start=3)
+
+        sealed = load_manifest(self.history_file)
+        self.assertEqual(len(sealed), 1)
+        self.assertEqual(len(self._entries()), 4)
+
+        self._append(1, start=4)
+
+        self.assertEqual(len(load_manifest(self.history_file)), 1)
+        self.assertEqual(self._entries()[0]["previous_hash"], sealed[0]["last_hash"])
+        self.assertEqual(ledger_verify.verify_ledger(full=True)["entries"], 5)
+
+    def test_seal_verifies_only_entries_after_checkpoint(self):
+        self._append(3)
+        ledger_verify.verify_ledger()
+
+        with mock.patch.object(ledger_verify, "verify_entry", wraps=ledger_verify.verify_entry) as verify_entry:
+            self._append(1, start=3)
+
+        self.assertEqual(verify_entry.call_count, 1)
+        self.assertEqual(load_manifest(self.history_file)[0]["entries"], 4)
+        self.assertEqual(ledger_verify.verify_ledger(full=True)["entries"], 4)
+
+    def test_seal_still_catches_tampering_after_checkpoint(self):
+        self._append(3)
+        ledger_verify.verify_ledger()
+        with mock.patch.object(executor, "maybe_seal_segment", return_value=None):
+            self._append(1, start=3)
+
+        lines = self.history_file.read_text(encoding="utf-8").splitlines()
+        entry = json.loads(lines[3])
+        entry["risk_score"] = 3
+        lines[3] = json.dumps(entry)
+        self.history_file.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+        with self.assertRaises(ledger_verify.LedgerIntegrityError):
+            ledger_segments.seal_active_segment(self.history_file)
+        self.assertEqual(load_manifest(self.history_file), [])
+
+    def test_proofs_resolve_across_sealed_segments(self):
+        self._append(10)
+        manifest = load_manifest(self.history_file)
+
+        sealed = export_entry_proof(self.history_file, "plan_5")
+        self.assertEqual(sealed["segment"], 2)
+        self.assertEqual(sealed["root"], manifest[1]["merkle_root"])
+        self.assertEqual(sealed["entry"]["plan_id"], "plan_5")
+        self.assertTrue(verify_inclusion(
+            sealed["entry"]["entry_hash"], sealed["lo"], sealed["size"], sealed["proof"], sealed["root"],
+        ))
+
+        active = export_entry_proof(self.history_file, "plan_9")
+        self.assertIsNone(active["segment"])
+        self.assertEqual(active["entry"]["plan_id"], "plan_9")
+
+        self.assertIsNone(export_entry_proof(self.history_file, "plan_missing"))
+
+    def test_missing_sealed_index_is_rebuilt_from_archive(self):
+        self._append(5)
+        record = load_manifest(self.history_file)[0]
+        shutil.rmtree(segments_dir_for(self.history_file) / "execution_history.000001.merkle")
+
+        proof = export_entry_proof(self.history_file, "plan_2")
+
+        self.assertEqual(proof["root"], record["merkle_root"])
+        self.assertEqual(proof["lo"], 2)
+
+    def test_recovery_keeps_sealed_history(self):
+        self._append(6)
+        self.history_file.write_text("{broken\n", encoding="utf-8")
+
+        with self.assertRaises(ledger_verify.LedgerIntegrityError):
+            ledger_verify.verify_ledger()
+
+        ledger_verify.recover_ledger()
+        self._append(1, start=6)
+
+        self.assertEqual(len(load_manifest(self.history_file)), 1)
+        self.assertEqual(ledger_verify.verify_ledger(full=True)["entries"], 6)
+
+    def test_tampered_sealed_segment_is_caught_by_full_audit(self):
+        self._append(5)
+        record = load_manifest(self.history_file)[0]
+        archive = segments_dir_for(self.history_file) / record["file"]
+
+        with gzip.open(archive, "rt") as f:
+            lines = f.read().splitlines()
+        entry = json.loads(lines[1])
+        entry["risk_score"] = 3
+        lines[1] = json.dumps(entry)
+        with gzip.open(archive, "wt") as f:
+            f.write("\n".join(lines) + "\n")
+
+        self.assertTrue(ledger_verify.verify_ledger()["ok"])
+        with self.assertRaisesRegex(ledger_verify.LedgerIntegrityError, "^Segment 1: archive sha256"):
+            ledger_verify.verify_ledger(full=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
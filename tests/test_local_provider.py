@@ -0,0 +1,100 @@
+import time
+import unittest
+from unittest import mock
+
+from ai.config import AppConfig, validate_config
+from core.ai_advisor import AIAdvisor, _sanitize_context, _sanitize_plan
+from core.ai_providers import CompositeProvider, LocalProvider
+
+
+def _config(provider: str, api_key: str = "") -> AppConfig:
+    return AppConfig(
+        log_level="INFO",
+        ai_provider=provider,
+        ai_api_key=api_key,
+        telegram_token="token",
+        curupira_risk_threshold=0.4,
+        log_dir="logs",
+        data_dir="data",
+        supervisor_enabled=True,
+        curupira_enabled=True,
+        autonomy_reactive_enabled=False,
+    )
+
+
+def _context(blocked: int = 0, allowed: int = 3) -> dict:
+    decisions = [{"component": "curupira", "allowed": False}] * blocked
+    decisions += [{"component": "curupira", "allowed": True}] * allowed
+    return {"last_decisions": decisions, "metrics": {"intents_blocked": 1, "intents_dry_run": 9}}
+
+
+class LocalProviderTests(unittest.TestCase):
+    def setUp(self):
+        self.provider = LocalProvider(risk_threshold=0.4)
+
+    def _action(self, plan: dict, context: dict | None = None) -> str:
+        sanitized = _sanitize_plan({"commands": ["echo ok"], **plan})
+        return self.provider.recommend(sanitized, context or _context())["suggested_action"]
+
+    def test_rule_table(self):
+        self.assertEqual(self._action({"risk_score": 1}), "dry_run")
+        self.assertEqual(self._action({"risk_score": 9}), "block")
+        self.assertEqual(self._action({"risk_score": 5}), "review")
+        self.assertEqual(self._action({}), "review")
+        self.assertEqual(self._action({"risk_score": "abc"}), "review")
+        self.assertEqual(self._action({"risk_score": 1, "commands": []}), "review")
+        self.assertEqual(self._action({"risk_score": 3}, _context(blocked=3, allowed=0)), "review")
+        self.assertEqual(self._action({"risk_score": 3}), "dry_run")
+
+    def test_threshold_follows_config(self):
+        provider = LocalProvider(risk_threshold=0.6)
+        result = provider.recommend({"risk_score": 5, "commands_count": 1}, {})
+        self.assertEqual(result["suggested_action"], "dry_run")
+
+    def test_output_survives_normalization_unchanged(self):
+        with mock.patch("core.ai_advisor.log_decision"):
+            result = AIAdvisor(self.provider).analyze({"id": "p1", "risk_score": 2, "commands": ["ls"]}, _context())
+
+        raw = self.provider.recommend(_sanitize_plan({"id": "p1", "risk_score": 2, "commands": ["ls"]}), _context())
+        self.assertEqual(result["suggested_action"], raw["suggested_action"])
+        self.assertEqual(result["risk_assessment"], raw["risk_assessment"])
+        self.assertEqual(result["confidence"], raw["confidence"])
+        self.assertEqual(result["explanation"], raw["explanation"])
+
+    def test_answers_in_microseconds(self):
+        plan = _sanitize_plan({"id": "p1", "risk_score": 3, "commands": ["ls"]})
+        context = _sanitize_context(_context())
+
+        started = time.perf_counter()
+        for _ in range(2000):
+            self.provider.recommend(plan, context)
+        per_call = (time.perf_counter() - started) / 2000
+
+        self.assertLess(per_call, 100e-6)
+
+
+class LocalProviderSelectionTests(unittest.TestCase):
+    def test_local_provider_runs_without_cache_or_breaker(self):
+        advisor = AIAdvisor.from_config(_config("local"))
+
+        self.assertIsInstance(advisor.provider, LocalProvider)
+        self.assertIsNone(advisor.cache)
+        self.assertIsNone(advisor.breaker)
+
+    def test_local_provider_as_remote_fallback(self):
+        with mock.patch("core.ai_advisor.get_advice_cache", return_value=None):
+            advisor = AIAdvisor.from_config(_config("openai,local", api_key="key"))
+
+        self.assertIsInstance(advisor.provider, CompositeProvider)
+        self.assertIsInstance(advisor.provider.providers[1], LocalProvider)
+
+    def test_config_does_not_require_key_for_local(self):
+        _, warnings = validate_config(_config("local"))
+        self.assertFalse(any(w.startswith("IA:") for w in warnings))
+
+        _, warnings = validate_config(_config("openai,local"))
+        self.assertIn("IA: PARCIAL (AI_API_KEY ausente para provider 'openai')", warnings)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,238 @@
+import json
+import multiprocessing
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import core.observability as observability
+from core.ai_advisor import build_ai_context
+from core.decision_log import DecisionLogWriter
+
+
+def _flush_worker(metrics_file, rounds):
+    with mock.patch.object(observability, "METRICS_FILE", metrics_file):
+        registry = observability.MetricsRegistry(flush_interval=0)
+        for _ in range(rounds):
+            registry.increment("intents_processed")
+            registry.flush()
+
+
+class MetricsRegistryTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.metrics_file = Path(self._tmp.name) / "autonomy_metrics.json"
+        patcher = mock.patch.object(observability, "METRICS_FILE", self.metrics_file)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self._tmp.cleanup)
+
+    def test_increments_stay_in_memory_until_flush(self):
+        registry = observability.MetricsRegistry(flush_interval=0)
+
+        for _ in range(5):
+            registry.increment("intents_processed")
+        registry.increment("reactive_blocked", 2)
+
+        self.assertFalse(self.metrics_file.exists())
+
+        registry.flush()
+
+        data = json.loads(self.metrics_file.read_text(encoding="utf-8"))
+        self.assertEqual(data, {"intents_processed": 5, "reactive_blocked": 2})
+        self.assertEqual(registry.pending(), {})
+
+    def test_flush_merges_with_values_written_by_other_processes(self):
+        self.metrics_file.write_text(
+            json.dumps({"intents_processed": 10, "broken": "x"}), encoding="utf-8"
+        )
+        registry = observability.MetricsRegistry(flush_interval=0)
+        registry.increment("intents_processed", 3)
+        registry.increment("broken")
+
+        registry.flush()
+
+        data = json.loads(self.metrics_file.read_text(encoding="utf-8"))
+        self.assertEqual(data, {"intents_processed": 13, "broken": 1})
+
+    def test_concurrent_process_flushes_do_not_lose_deltas(self):
+        ctx = multiprocessing.get_context("fork")
+        workers = [ctx.Process(target=_flush_worker, args=(self.metrics_file, 50)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+
+        data = json.loads(self.metrics_file.read_text(encoding="utf-8"))
+        self.assertEqual(data, {"intents_processed": 200})
+
+    def test_load_metrics_includes_pending_deltas(self):
+        self.metrics_file.write_text(json.dumps({"a": 1}), encoding="utf-8")
+        registry = observability.MetricsRegistry(flush_interval=0)
+        registry.increment("a")
+        registry.increment("b")
+
+        with mock.patch.object(observability, "_METRICS_REGISTRY", registry):
+            self.assertEqual(observability.load_metrics(), {"a": 2, "b": 1})
+
+        # Nada foi gravado apenas por leitura
+        self.assertEqual(json.loads(self.metrics_file.read_text(encoding="utf-8")), {"a": 1})
+
+
+class BatchedDecisionLogTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.log_path = Path(self._tmp.name) / "decisions.log"
+        for name, value in (
+            ("DECISION_LOG_PATH", str(self.log_path)),
+            ("_ANOMALY_DETECTOR", None),
+            ("_ANOMALY_DETECTOR_LOADED", True),
+        ):
+            patcher = mock.patch.object(observability, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_events_are_written_together(self):
+        with mock.patch.dict("os.environ", {"DECISION_LOG_ASYNC": "0"}):
+            observability.log_decisions([{"plan_id": "a"}, {"plan_id": "b"}])
+            observability.log_decisions([])
+
+        records = [json.loads(line) for line in self.log_path.read_text(encoding="utf-8").splitlines()]
+        self.assertEqual([r["plan_id"] for r in records], ["a", "b"])
+        self.assertEqual(records[0]["timestamp"], records[1]["timestamp"])
+
+
+class ContextSnapshotTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.log_path = Path(self._tmp.name) / "decisions.log"
+        self.metrics_file = Path(self._tmp.name) / "autonomy_metrics.json"
+        self.snapshot = observability.ContextSnapshot()
+
+        for name, value in (
+            ("DECISIONS_FILE", self.log_path),
+            ("DECISION_LOG_PATH", str(self.log_path)),
+            ("METRICS_FILE", self.metrics_file),
+            ("_CONTEXT_SNAPSHOT", self.snapshot),
+            ("_ANOMALY_DETECTOR", None),
+            ("_ANOMALY_DETECTOR_LOADED", True),
+        ):
+            patcher = mock.patch.object(observability, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _append(self, *records, raw: str = "") -> None:
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(r) + "\n" for r in records) + raw)
+
+    def _ids(self, limit: int = 3) -> list:
+        return [r["n"] for r in self.snapshot.last_decisions(limit)]
+
+    def test_reads_only_appended_lines(self):
+        self.assertEqual(self._ids(), [])
+        self._append(*({"n": n} for n in range(5)))
+        self.assertEqual(self._ids(), [2, 3, 4])
+
+        # Outro processo anexa, inclusive uma linha ainda incompleta
+        self._append({"n": 5}, raw='{"n": ')
+        with mock.patch.object(observability.json, "loads", wraps=json.loads) as loads:
+            self.assertEqual(self._ids(), [3, 4, 5])
+        self.assertEqual(loads.call_count, 1)
+
+        self._append(raw='6}\n')
+        self.assertEqual(self._ids(), [4, 5, 6])
+
+    def test_rotation_and_truncation_resync(self):
+        self._append({"n": 1}, {"n": 2})
+        self.assertEqual(self._ids(), [1, 2])
+
+        replacement = self.log_path.with_name("new.log")
+        replacement.write_text(json.dumps({"n": 9}) + "\n", encoding="utf-8")
+        replacement.replace(self.log_path)
+        self.assertEqual(self._ids(), [9])
+
+        self.log_path.write_text("", encoding="utf-8")
+        self.assertEqual(self._ids(), [])
+
+    def test_large_log_starts_from_tail(self):
+        with mock.patch.object(observability.ContextSnapshot, "TAIL_BYTES", 256):
+            self._append(*({"n": n, "pad": "x" * 40} for n in range(100)))
+            self.assertEqual(self._ids(), [97, 98, 99])
+
+            self._append(*({"n": n, "pad": "x" * 40} for n in range(100, 200)))
+            self.assertEqual(self._ids(), [197, 198, 199])
+
+    def test_large_limit_falls_back_to_tail_read(self):
+        self._append(*({"n": n, "pad": "x" * 40} for n in range(1000)))
+
+        with mock.patch.object(observability.ContextSnapshot, "MAX_DECISIONS", 10):
+            self.assertEqual(self._ids(150), list(range(850, 1000)))
+            records = observability._read_last_decisions(self.log_path, 150, block_size=512)
+
+        self.assertEqual([r["n"] for r in records], list(range(850, 1000)))
+        self.assertEqual(observability._read_last_decisions(self.log_path, 5000, block_size=512)[0]["n"], 0)
+
+    def test_load_last_decisions_sees_own_writes(self):
+        with mock.patch.dict("os.environ", {"DECISION_LOG_ASYNC": "0"}):
+            observability.log_decision({"component": "supervisor", "allowed": True})
+            observability.log_decisions([{"component": "curupira", "allowed": False}])
+
+        self.assertEqual(
+            [r["component"] for r in observability.load_last_decisions(3)],
+            ["supervisor", "curupira"],
+        )
+
+    def test_ai_context_does_not_wait_on_a_slow_writer(self):
+        writer = DecisionLogWriter(str(self.log_path))
+        release = threading.Event()
+        original = writer._write_batch
+
+        def slow_batch(payload):
+            release.wait(5)
+            original(payload)
+
+        self._append({"component": "old"})
+        with mock.patch.object(observability, "_DECISION_WRITER", writer), \
+                mock.patch.object(writer, "_write_batch", side_effect=slow_batch), \
+                mock.patch.dict("os.environ", {"DECISION_LOG_ASYNC": "1"}):
+            observability.log_decision({"component": "supervisor"})
+            observability.log_decision({"component": "curupira"})
+
+            started = time.monotonic()
+            context = build_ai_context({"id": "plan_1"})
+            elapsed = time.monotonic() - started
+
+            release.set()
+            self.assertTrue(writer.close(timeout=5))
+
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(
+            [r["component"] for r in context["last_decisions"]],
+            ["old", "supervisor", "curupira"],
+        )
+        # Depois de gravadas, as mesmas linhas nao aparecem duplicadas
+        self.assertEqual(
+            [r["component"] for r in observability.load_last_decisions(5)],
+            ["old", "supervisor", "curupira"],
+        )
+
+    def test_metrics_are_reparsed_only_when_the_file_changes(self):
+        self.assertEqual(self.snapshot.metrics(), {})
+
+        observability.save_metrics({"intents_processed": 1})
+        with mock.patch.object(observability.json, "load", wraps=json.load) as load:
+            self.assertEqual(self.snapshot.metrics(), {"intents_processed": 1})
+            self.snapshot.metrics()["intents_processed"] = 99
+            self.assertEqual(self.snapshot.metrics(), {"intents_processed": 1})
+        self.assertEqual(load.call_count, 1)
+
+        observability.save_metrics({"intents_processed": 2})
+        self.assertEqual(self.snapshot.metrics(), {"intents_processed": 2})
+
+
+if __name__ == "__main__":
+    unittest.main()
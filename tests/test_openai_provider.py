@@ -0,0 +1,168 @@
+import json
+import socket
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from core.ai_providers.http_pool import HTTPStatusError
+from core.ai_providers.openai_provider import OpenAIProvider
+
+
+RECOMMENDATION = {
+    "suggested_action": "review",
+    "risk_assessment": {"level": "low", "score": 0.1},
+    "confidence": 0.9,
+    "explanation": "ok",
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        server.requests.append((self.client_address, self.path, json.loads(self.rfile.read(length))))
+
+        if server.delay:
+            time.sleep(server.delay)
+
+        status = server.status
+        text = server.response_text or json.dumps(RECOMMENDATION)
+        body = json.dumps({
+            "output": [{"content": [{"type": "output_text", "text": text}]}]
+        }).encode("utf-8")
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if server.trickle:
+            # Cada byte chega dentro do timeout de socket, o corpo inteiro nao
+            for byte in body:
+                self.wfile.write(bytes([byte]))
+                self.wfile.flush()
+                time.sleep(server.trickle)
+        else:
+            self.wfile.write(body)
+
+        if server.drop_after_response:
+            # Fecha sem avisar (sem "Connection: close"): socket fica "stale"
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class OpenAIProviderPoolTests(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.daemon_threads = True
+        # Cliente que desiste por timeout gera BrokenPipe no servidor
+        self.server.handle_error = lambda request, client_address: None
+        self.server.requests = []
+        self.server.delay = 0
+        self.server.trickle = 0
+        self.server.status = 200
+        self.server.drop_after_response = False
+        self.server.response_text = None
+        thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def _provider(self, **kwargs) -> OpenAIProvider:
+        kwargs.setdefault("timeout_seconds", 2.0)
+        host, port = self.server.server_address
+        provider = OpenAIProvider(
+            api_key="test-key",
+            model="test-model",
+            base_url=f"http://{host}:{port}/v1",
+            **kwargs,
+        )
+        self.addCleanup(provider.close)
+        return provider
+
+    def _client_ports(self) -> set:
+        return {address[1] for address, _, _ in self.server.requests}
+
+    def test_requests_reuse_one_connection(self):
+        provider = self._provider()
+
+        for _ in range(3):
+            self.assertEqual(provider.recommend({"id": "p1"}, {}), RECOMMENDATION)
+
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len(self._client_ports()), 1)
+        self.assertEqual(self.server.requests[0][1], "/v1/responses")
+        self.assertEqual(self.server.requests[0][2]["model"], "test-model")
+
+    def test_stale_connection_is_replaced_transparently(self):
+        provider = self._provider()
+        self.server.drop_after_response = True
+
+        provider.recommend({"id": "p1"}, {})
+        time.sleep(0.05)
+        self.assertEqual(provider.recommend({"id": "p1"}, {}), RECOMMENDATION)
+
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(len(self._client_ports()), 2)
+
+    def test_deadline_bounds_slow_responses(self):
+        provider = self._provider(timeout_seconds=0.3)
+        self.server.delay = 1.0
+
+        started = time.monotonic()
+        with self.assertRaises((socket.timeout, TimeoutError)):
+            provider.recommend({"id": "p1"}, {})
+        self.assertLess(time.monotonic() - started, 0.9)
+
+    def test_deadline_bounds_trickled_bodies(self):
+        provider = self._provider(timeout_seconds=0.5)
+        self.server.trickle = 0.05
+
+        started = time.monotonic()
+        with self.assertRaises((socket.timeout, TimeoutError)):
+            provider.recommend({"id": "p1"}, {})
+        self.assertLess(time.monotonic() - started, 1.0)
+
+    def test_error_status_raises_and_keeps_connection(self):
+        provider = self._provider()
+        self.server.status = 500
+
+        with self.assertRaises(HTTPStatusError) as ctx:
+            provider.recommend({"id": "p1"}, {})
+        self.assertEqual(ctx.exception.status, 500)
+
+        self.server.status = 200
+        provider.recommend({"id": "p1"}, {})
+        self.assertEqual(len(self._client_ports()), 1)
+
+    def test_pool_size_bounds_idle_connections(self):
+        provider = self._provider(pool_size=0)
+
+        for _ in range(2):
+            provider.recommend({"id": "p1"}, {})
+
+        self.assertEqual(len(self._client_ports()), 2)
+
+    def test_batch_response_is_matched_by_plan_id(self):
+        provider = self._provider()
+        self.server.response_text = json.dumps({
+            "recommendations": [
+                {"plan_id": "b", "suggested_action": "block"},
+                {"plan_id": "a", "suggested_action": "review"},
+            ]
+        })
+
+        results = provider.recommend_batch([{"id": "a"}, {"id": "b"}, {"id": "c"}], {"metrics": {}})
+
+        self.assertEqual([r["suggested_action"] if r else None for r in results], ["review", "block", None])
+        sent = self.server.requests[0][2]
+        self.assertEqual(len(sent["input"]), 2)
+        self.assertEqual(len(json.loads(sent["input"][1]["content"][0]["text"])["plans"]), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
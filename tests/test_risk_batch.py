@@ -0,0 +1,68 @@
+import unittest
+from unittest import mock
+
+import core.autonomy_supervisor as autonomy_supervisor
+import core.curupira_evaluator as curupira_evaluator
+import core.risk_batch as risk_batch
+from core.autonomy_supervisor import AutonomySupervisor
+from core.curupira_evaluator import CurupiraEvaluator
+
+
+PLANS = [
+    {"id": "low", "risk_score": 1},
+    {"id": "edge", "risk_score": 4},
+    {"id": "curupira_edge", "risk_score": 3.2},
+    {"id": "high", "risk_score": 9},
+    {"id": "string", "risk_score": "2"},
+    {"id": "bool", "risk_score": True},
+    {"id": "missing"},
+    {"id": "none", "risk_score": None},
+    {"id": "garbage", "risk_score": "abc"},
+    {"id": "negative", "risk_score": -5},
+]
+
+
+class BatchEvaluationTests(unittest.TestCase):
+    def setUp(self):
+        self.logged = {}
+        for module in (autonomy_supervisor, curupira_evaluator):
+            patchers = {
+                name: mock.patch.object(module, name)
+                for name in ("log_decision", "log_decisions", "increment_metric")
+            }
+            self.logged[module] = {name: patcher.start() for name, patcher in patchers.items()}
+            for patcher in patchers.values():
+                self.addCleanup(patcher.stop)
+
+    def _assert_matches_single(self, evaluator):
+        expected = [evaluator.evaluate(plan) for plan in PLANS]
+        self.assertEqual(evaluator.evaluate_batch(PLANS), expected)
+
+    def test_batch_matches_single_evaluation(self):
+        for threshold in (0.0, 0.3, 0.4, 1.0):
+            self._assert_matches_single(AutonomySupervisor(risk_threshold=threshold))
+            self._assert_matches_single(CurupiraEvaluator(threshold=threshold))
+
+    def test_pure_python_fallback_matches(self):
+        with mock.patch.object(risk_batch, "np", None):
+            self._assert_matches_single(AutonomySupervisor(risk_threshold=0.4))
+            self._assert_matches_single(CurupiraEvaluator(threshold=0.4))
+
+    def test_batch_is_logged_in_one_write_with_aggregated_metrics(self):
+        AutonomySupervisor(risk_threshold=0.4).evaluate_batch(PLANS)
+
+        mocks = self.logged[autonomy_supervisor]
+        mocks["log_decisions"].assert_called_once()
+        events = mocks["log_decisions"].call_args.args[0]
+        self.assertEqual([e["plan_id"] for e in events], [p["id"] for p in PLANS])
+        mocks["log_decision"].assert_not_called()
+
+        allowed = sum(e["allowed"] for e in events)
+        mocks["increment_metric"].assert_has_calls([
+            mock.call("supervisor_allowed", allowed),
+            mock.call("supervisor_blocked", len(PLANS) - allowed),
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
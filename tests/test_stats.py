@@ -0,0 +1,27 @@
+import random
+import unittest
+
+from core.stats import P2Quantile
+
+
+class P2QuantileTests(unittest.TestCase):
+    def test_tracks_exact_quantile(self):
+        rng = random.Random(7)
+        values = [rng.expovariate(1 / 300) for _ in range(20000)]
+        estimator = P2Quantile(0.95)
+        for value in values:
+            estimator.update(value)
+
+        exact = sorted(values)[int(0.95 * len(values))]
+        self.assertAlmostEqual(estimator.value(), exact, delta=exact * 0.05)
+
+    def test_few_samples(self):
+        estimator = P2Quantile(0.5)
+        self.assertIsNone(estimator.value())
+        for value in (3, 1, 2):
+            estimator.update(value)
+        self.assertEqual(estimator.value(), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
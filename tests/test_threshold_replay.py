@@ -0,0 +1,102 @@
+import json
+import random
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import ai.threshold_replay as threshold_replay
+import core.autonomy_supervisor as autonomy_supervisor
+import core.curupira_evaluator as curupira_evaluator
+from core.autonomy_supervisor import AutonomySupervisor
+from core.curupira_evaluator import CurupiraEvaluator
+
+
+SCORES = [0, 1, 2, 3, 3.2, 4, 5, 8, 10, -1, "2", "abc", None, "nan"]
+
+
+class ThresholdReplayTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        base = Path(self._tmp.name)
+        self.log_path = base / "decisions.log"
+        self.results_dir = base / "results"
+        self.results_dir.mkdir()
+
+        for module in (autonomy_supervisor, curupira_evaluator):
+            for name in ("log_decision", "increment_metric"):
+                patcher = mock.patch.object(module, name)
+                patcher.start()
+                self.addCleanup(patcher.stop)
+
+        rng = random.Random(7)
+        self.records = []
+        for idx in range(400):
+            # Avaliadores sempre registram risk_score (None quando ausente no plano)
+            self.records.append({
+                "component": rng.choice(["supervisor", "curupira", "reactive"]),
+                "plan_id": f"p{idx}",
+                "risk_score": rng.choice(SCORES),
+                "allowed": rng.random() > 0.5,
+            })
+
+        lines = [json.dumps(r) for r in self.records] + ["not json", ""]
+        self.log_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+        self.reports = [{"plan_id": f"r{idx}", "risk_score": score} for idx, score in enumerate(SCORES)]
+        for report in self.reports:
+            path = self.results_dir / f"{report['plan_id']}_result.json"
+            path.write_text(json.dumps(report), encoding="utf-8")
+
+    def _expected(self, threshold: float) -> dict:
+        evaluators = {
+            "supervisor": AutonomySupervisor(risk_threshold=threshold),
+            "curupira": CurupiraEvaluator(threshold=threshold),
+        }
+        expected = {"threshold": threshold}
+
+        for name, evaluator in evaluators.items():
+            summary = {"allowed": 0, "blocked": 0, "newly_allowed": 0, "newly_blocked": 0}
+            for record in self.records:
+                if record["component"] != name:
+                    continue
+                allowed = evaluator.evaluate(record).allowed
+                summary["allowed" if allowed else "blocked"] += 1
+                if allowed and not record["allowed"]:
+                    summary["newly_allowed"] += 1
+                if record["allowed"] and not allowed:
+                    summary["newly_blocked"] += 1
+            expected[name] = summary
+
+        pipeline = [
+            all(e.evaluate(r).allowed for e in evaluators.values())
+            for r in self.reports
+        ]
+        expected["results"] = {"allowed": sum(pipeline), "blocked": len(pipeline) - sum(pipeline)}
+        return expected
+
+    def test_sweep_matches_evaluators(self):
+        thresholds = threshold_replay.parse_thresholds("-0.2:1:0.04") + [0.32, 0.4]
+        groups = threshold_replay.load_history(self.log_path, self.results_dir, batch_size=16)
+
+        rows = threshold_replay.replay(groups, thresholds)
+
+        self.assertEqual(rows, [self._expected(t) for t in thresholds])
+
+    def test_pure_python_fallback_matches(self):
+        thresholds = [0.0, 0.25, 0.4, 1.0]
+        groups = threshold_replay.load_history(self.log_path, self.results_dir)
+
+        with mock.patch.object(threshold_replay, "np", None):
+            rows = threshold_replay.replay(groups, thresholds)
+
+        self.assertEqual(rows, [self._expected(t) for t in thresholds])
+
+    def test_parse_thresholds(self):
+        self.assertEqual(threshold_replay.parse_thresholds("0:0.2:0.1"), [0.0, 0.1, 0.2])
+        self.assertEqual(threshold_replay.parse_thresholds("0.3, 0.5"), [0.3, 0.5])
+
+
+if __name__ == "__main__":
+    unittest.main()